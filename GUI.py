@@ -1,13 +1,12 @@
 #import key libraries
-import pandas as pd
 import tkinter as tk
 from tkinter import *
-from tkinter import ttk,Tk,Label,Button,Entry,OptionMenu,messagebox
+from tkinter import ttk,Tk,Label,Button,Entry,OptionMenu,messagebox,filedialog
 from tkcalendar import DateEntry
 import datetime as dt
-import math
-import numpy as np
-import csv
+import os
+import queue
+import threading
 
 #set essential formatting code
 dateformat = "%m/%d/%Y"
@@ -16,9 +15,13 @@ dateformat = "%m/%d/%Y"
 import IndLoss
 from IndLoss import AssessRev
 from IndLoss import ServType
-from IndLoss import ServInfo
-from IndLoss import StatusInfo
 from IndLoss import StatusRoute
+from IndLoss import RagCategories
+from ResultStore import ResultStore,StorePath
+import ScoreCSV
+
+#set how often, in milliseconds, the window checks for progress from a caseload being scored
+PollInterval = 100
 
 #create the class for the TkInter GUI
 class InputGUI:
@@ -36,11 +39,18 @@ class InputGUI:
     To also provide a generate RAG button that will produce the risk score for the individual.
 
     Contact Date and Birth date need to be entered as parsable date formats, or an error message will be generated
+
+    A caseload csv can also be scored with the Load caseload file button. Scoring runs on a background thread, sending
+    progress back through a queue that the window checks every PollInterval milliseconds, so the window stays responsive.
+    The results are written to a csv and the results store, and the RAG counts are shown in a table. Scoring can be cancelled.
        """
     def __init__(self,main):
 
         #main window with title
         self.main = main
+        self.last_contact = None
+        self.job = None
+        self.job_queue = queue.Queue()
         main.title("Loss of Independence Risk Tool")
 
         #commands to extract the relevant data
@@ -63,10 +73,7 @@ class InputGUI:
             cd = con_date.get_date()
         
         def age_calc():
-            dob_val = pd.to_datetime(dob.get_date(),dayfirst=True)
-            doc_val = pd.to_datetime(con_date.get_date(),dayfirst=True)
-            age = (doc_val - dob_val).days
-            age = math.floor(age/365)
+            age = IndLoss.age_years(dob.get_date(),con_date.get_date())
             lbl_age.config(text = age)
         
         #method to run full RAG calculation
@@ -83,10 +90,11 @@ class InputGUI:
             contactData = [pers_val.get(),con_date.get(),dob.get(),cb_status.get(),cb_curr.get(),cb_new.get()]
             try:
                 contact=AssessRev(contactData[0],contactData[1],contactData[2],contactData[3],contactData[4],contactData[5])
-            except:
-                err_val="Please ensure all fields have been completed correctly, and that a suitable option has been selected from all dropdowns"
+            except ValueError as err:
+                err_val=f"{err}\n\nPlease ensure all fields have been completed correctly, and that a suitable option has been selected from all dropdowns"
                 #add a pop up to show the error value
                 messagebox.showinfo(title="Incorrect information provided",message=err_val)
+                return
             #run the core methods from AssessRev class
             contact.update_AgeFac()
             contact.update_StatusFac()
@@ -94,16 +102,13 @@ class InputGUI:
             contact.update_ServChange()
             #run the update RAG method from AssessRev class
             contact.update_Rag()
-            if contact.Rag <=1:
-                txt_rag = "Green"
-            elif contact.Rag >3:
-                txt_rag = "Red"
-            else:
-                txt_rag = "Amber"
+            txt_rag = IndLoss.rag_category(contact.Rag)
+            #keep the scored contact for export
+            self.last_contact = contact
             #create confirmation labels
             pers_info=(f"Person ID: {contact.PersonId}")
-            contact_info=(f"Contact Date: {contact.ContactDate.strftime("%d/%m/%Y")}")
-            dob_info = (f"Date of Birth: {contact.BirthDate.strftime("%d/%m/%Y")}")
+            contact_info=(f"Contact Date: {contact.ContactDate.strftime('%d/%m/%Y')}")
+            dob_info = (f"Date of Birth: {contact.BirthDate.strftime('%d/%m/%Y')}")
             stat_info=(f"Status: {contact.Status}")
             curr_info=(f"Current Service: {contact.CurrentServ}")
             new_info=(f"Recommended Service: {contact.NewServ}")
@@ -111,10 +116,7 @@ class InputGUI:
             rag_info=(f"RAG: {txt_rag}")
             lbl_rag.config(text=rag_info)
             #calculate age
-            dob_val = pd.to_datetime(dob.get_date(),dayfirst=True)
-            doc_val = pd.to_datetime(con_date.get_date(),dayfirst=True)
-            age = (doc_val - dob_val).days
-            age = math.floor(age/365)
+            age = IndLoss.age_years(contact.BirthDate,contact.ContactDate)
             age=(f"Age: {age}")
             lbl_age.config(text = age)
             #assign info label values
@@ -128,31 +130,16 @@ class InputGUI:
         
         def export_rag():
             """
-            Exports the calculated RAG output to a text file
+            Exports the calculated RAG, factors and category to the results store (ResultStore.StorePath)
             """
-            #get the info
-            e_rag=lbl_rag.cget("text")
-            e_per=lbl_Person.cget("text")
-            e_cont=lbl_cont.cget("text")
-            e_dob=lbl_dob.cget("text")
-            e_age=lbl_age_con.cget("text")
-            e_status=lbl_stat.cget("text")
-            e_curr=lbl_curr.cget("text")
-            e_new=lbl_new.cget("text")
-            #create the text file name
-            fName=(f"{pers_val.get()}-{con_date.get_date()}.txt")
-            #write to text file, appending rows
-            with open(fName,"a",encoding="utf-8") as f:
-                f.write(f"{e_rag}\n")
-                f.write(f"{e_per}\n")
-                f.write(f"{e_cont}\n")
-                f.write(f"{e_dob}\n")
-                f.write(f"{e_age}\n")
-                f.write(f"{e_status}\n")
-                f.write(f"{e_curr}\n")
-                f.write(f"{e_new}\n")
-            with open(fName,"r",encoding="utf-8") as f:
-                print(f.read())
+            contact = self.last_contact
+            if contact is None:
+                messagebox.showinfo(title="No RAG to export",message="Please calculate a RAG before exporting")
+                return
+            with ResultStore(StorePath) as store:
+                store.add(contact)
+                saved = store.person(contact.PersonId)
+            messagebox.showinfo(title="RAG exported",message=f"{lbl_rag.cget('text')} saved for Person ID {contact.PersonId}.\n{len(saved)} RAG(s) stored for this person in {StorePath}")
 
         def clear_data():
             """
@@ -165,6 +152,7 @@ class InputGUI:
             cb_new.set("Please select the recommended service")
             cb_curr.set("Please select the current service")
             cb_status.set("Please select the persons current status")
+            self.last_contact = None
             lbl_rag.config(text=" ")
             lbl_Person.config(text=" ")
             lbl_cont.config(text=" ")
@@ -174,6 +162,96 @@ class InputGUI:
             lbl_curr.config(text=" ")
             lbl_new.config(text=" ")
 
+        #commands to score a caseload file in the background
+        def count_rows(path):
+            with open(path,"rb") as f:
+                return max(0,sum(buf.count(b"\n") for buf in iter(lambda: f.read(2**20),b""))-1)
+
+        def score_file(inPath,outPath,cancel,jobQueue):
+            """
+            Runs on the background thread. Scores the file and puts (message type, value) tuples on the queue
+            The thread never touches the widgets; the window reads the queue in poll_job
+            """
+            try:
+                jobQueue.put(("total",count_rows(inPath)))
+                stats = ScoreCSV.score_csv(inPath,outPath,rejectsPath=os.path.splitext(outPath)[0]+"_rejects.csv",storePath=StorePath,
+                                           progress=lambda stats: jobQueue.put(("progress",stats)),cancel=cancel)
+                jobQueue.put(("done",stats))
+            except Exception as err:
+                jobQueue.put(("error",str(err)))
+
+        def load_file():
+            """
+            This is the method attached to the Load caseload file button
+            Asks for the caseload csv and where to save the results, then starts scoring on a background thread
+            """
+            if self.job is not None:
+                return
+            inPath = filedialog.askopenfilename(title="Select caseload file",filetypes=[("CSV files","*.csv"),("All files","*.*")])
+            if not inPath:
+                return
+            outPath = filedialog.asksaveasfilename(title="Save scored caseload as",defaultextension=".csv",
+                                                   initialfile=os.path.splitext(os.path.basename(inPath))[0]+"_scored.csv")
+            if not outPath:
+                return
+            cancel = threading.Event()
+            self.job = (threading.Thread(target=score_file,args=(inPath,outPath,cancel,self.job_queue),daemon=True),cancel)
+            self.load_button.config(state="disabled")
+            self.cancel_button.config(state="normal")
+            progress_bar.config(value=0,maximum=1)
+            lbl_batch.config(text=f"Scoring {os.path.basename(inPath)}...")
+            show_counts({})
+            self.job[0].start()
+            main.after(PollInterval,poll_job)
+
+        def cancel_job():
+            """
+            Asks the background scoring to stop after the chunk it is working on
+            """
+            if self.job is not None:
+                self.job[1].set()
+                lbl_batch.config(text="Cancelling...")
+
+        def show_counts(stats):
+            scored = stats.get("scored",0)
+            for cat in RagCategories:
+                n = stats.get(cat,0)
+                tbl_counts.item(cat,values=(cat,f"{n:,}",f"{n/scored:.1%}" if scored else ""))
+            tbl_counts.item("Rejected",values=("Rejected",f"{stats.get('rejected',0):,}",""))
+
+        def poll_job():
+            """
+            Reads every message waiting on the queue and updates the progress bar, counts table and status text
+            Checks again after PollInterval milliseconds until the background scoring has finished
+            """
+            finished = False
+            while True:
+                try:
+                    kind,value = self.job_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind=="total":
+                    progress_bar.config(maximum=max(value,1))
+                elif kind=="progress":
+                    progress_bar.config(value=value["rows"])
+                    show_counts(value)
+                    if not self.job[1].is_set():
+                        lbl_batch.config(text=ScoreCSV.format_stats(value))
+                elif kind=="done":
+                    show_counts(value)
+                    lbl_batch.config(text=("Cancelled: " if value["cancelled"] else "Finished: ")+ScoreCSV.format_stats(value))
+                    finished = True
+                else:
+                    lbl_batch.config(text="Caseload could not be scored")
+                    messagebox.showinfo(title="Caseload could not be scored",message=value)
+                    finished = True
+            if finished:
+                self.job = None
+                self.load_button.config(state="normal")
+                self.cancel_button.config(state="disabled")
+            else:
+                main.after(PollInterval,poll_job)
+
         #create a frame to group the data entry together
         self.frame_entry = ttk.Frame(main)
         self.frame_entry.config(padding=(20,10))
@@ -189,13 +267,18 @@ class InputGUI:
         self.frame_output.config(padding=(20,10))
         self.frame_output.grid(row=2,column=1,columnspan=2)
 
+        #create a frame for caseload file scoring
+        self.frame_batch=ttk.Frame(main)
+        self.frame_batch.config(padding=(20,10))
+        self.frame_batch.grid(row=4,column=1,columnspan=2)
+
         #create a frame for the instructions
         self.frame_inst=ttk.Frame(main)
         self.frame_inst.config(padding=(20,10))
         self.frame_inst.grid(row=1,column=2,columnspan=1)         
           
         #Instructions box
-        lbl_inst = Label(self.frame_inst,wraplength=400,justify="left",text="Instructions for completion:\n\n1. Person ID: Please enter the person ID number as recorded in the care management system.\n\n2. Date of Birth / Contact date: Please use the drop down calendar or enter the date directly in the format dd/mm/yyyy\n\n3: Status: Please select the current status of the person based on their current location or source of referral\n\n4: Current Service: Please select the service that is being reviewed.  If the person is new to ASC please select None.\n\n5: New Service: Please select the service that is being recommended following the review\n\nOnce all the data cells have been completed, please click the Calculate RAG button to generate the RAG rating for the person and record it in the care management system against the review\n\nOnce the RAG has been calculated and is displayed, you can use the Export RAG button to produce a copy of the RAG as a downloadable text file.\n\nPlease use the Clear Data button to wipe all information ready for the next RAG to be calculated")
+        lbl_inst = Label(self.frame_inst,wraplength=400,justify="left",text="Instructions for completion:\n\n1. Person ID: Please enter the person ID number as recorded in the care management system.\n\n2. Date of Birth / Contact date: Please use the drop down calendar or enter the date directly in the format dd/mm/yyyy\n\n3: Status: Please select the current status of the person based on their current location or source of referral\n\n4: Current Service: Please select the service that is being reviewed.  If the person is new to ASC please select None.\n\n5: New Service: Please select the service that is being recommended following the review\n\nOnce all the data cells have been completed, please click the Calculate RAG button to generate the RAG rating for the person and record it in the care management system against the review\n\nOnce the RAG has been calculated and is displayed, you can use the Export RAG button to save the RAG to the results database.\n\nPlease use the Clear Data button to wipe all information ready for the next RAG to be calculated\n\nTo score a whole caseload, use the Load caseload file button to select a csv with PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ columns.  The window can still be used while the file is scored, and the Cancel button stops scoring.")
         lbl_inst.pack()
 
         #Entry box - Person ID
@@ -250,6 +333,27 @@ class InputGUI:
         self.clear_button = Button(self.frame_button,text="Clear data",command=clear_data)
         self.clear_button.grid(row=1,column=3)
 
+        #Button - load caseload file
+        self.load_button = Button(self.frame_button,text="Load caseload file",command=load_file)
+        self.load_button.grid(row=2,column=1)
+
+        #Button - cancel caseload scoring
+        self.cancel_button = Button(self.frame_button,text="Cancel",command=cancel_job,state="disabled")
+        self.cancel_button.grid(row=2,column=2)
+
+        #Output - caseload progress, status and RAG counts
+        progress_bar = ttk.Progressbar(self.frame_batch,orient="horizontal",length=400,mode="determinate")
+        progress_bar.grid(row=0,column=1)
+        lbl_batch = Label(self.frame_batch,text=" ",justify="left")
+        lbl_batch.grid(row=1,column=1)
+        tbl_counts = ttk.Treeview(self.frame_batch,columns=("RAG","Count","Percent"),show="headings",height=4)
+        for col in ("RAG","Count","Percent"):
+            tbl_counts.heading(col,text=col)
+            tbl_counts.column(col,width=120,anchor="center")
+        for cat in RagCategories+["Rejected"]:
+            tbl_counts.insert("","end",iid=cat,values=(cat,"",""))
+        tbl_counts.grid(row=2,column=1)
+
         #Output Labels
         lbl_rag = Label(self.frame_output,font=("Helvetica",26,"bold"),text=" ")
         lbl_rag.grid(row=0, column=1)
@@ -277,6 +381,11 @@ class InputGUI:
         
     pass
 
-root=Tk()
-my_gui = InputGUI(root)
-root.mainloop()
\ No newline at end of file
+#create the entry point, so importing this module does not open the window
+def main():
+    root=Tk()
+    my_gui = InputGUI(root)
+    root.mainloop()
+
+if __name__=="__main__":
+    main()
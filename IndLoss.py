@@ -1,38 +1,387 @@
 #import key libraries
-import pandas as pd
+#pandas and numpy are imported inside the batch and dataframe functions, so single record scoring only needs the standard library
 import datetime as dt
-import math
-import numpy as np
+import bisect
+import collections
+import functools
+import hashlib
+import json
 
 
 #set essential formatting code
 dateformat = "%m/%d/%Y"
 
+#set the accepted date formats, tried in order, and the number of parsed dates to remember
+DateFormats = ["%d/%m/%Y","%Y-%m-%d","%d-%m-%Y","%d/%m/%Y %H:%M:%S","%Y-%m-%d %H:%M:%S"]
+DateCacheSize = 65536
+
+#create cached parser, as birth and contact dates repeat heavily across a caseload
+@functools.lru_cache(maxsize=DateCacheSize)
+def _parse_date_text(text,formats):
+    for fmt in formats:
+        try:
+            return dt.datetime.strptime(text,fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"{text} is not a valid date")
+
+def parse_date(value,formats=None):
+    """
+    Converts a date entry to a datetime.date using the first matching format in DateFormats
+
+    :param value: A date string, or an existing date/datetime which is returned as a date
+    :param formats: Optional list of formats to use in place of DateFormats
+
+    Error handling:
+        Entries that do not match any format generate a value error
+    """
+    return _parse_date(value,formats)
+
+def _parse_date(value,formats):
+    #called directly by parse_dates, so entries it fails to parse are not counted as rejections when instrumented
+    if isinstance(value,dt.datetime):
+        return value.date()
+    if isinstance(value,dt.date):
+        return value
+    return _parse_date_text(str(value).strip(),tuple(DateFormats if formats is None else formats))
+
+def _column_array(values,dtype=None):
+    #one dimensional array with one entry per row, even where entries are themselves sequences, e.g. lists from json
+    import numpy as np
+    try:
+        arr = np.asarray(values,dtype=dtype)
+    except ValueError:
+        arr = None
+    if arr is not None and (arr.ndim<=1 or isinstance(values,np.ndarray)):
+        return arr.ravel()
+    out = np.empty(len(values),dtype=object)
+    for i,val in enumerate(values):
+        out[i] = val
+    return out
+
+def parse_dates(values,formats=None):
+    """
+    Converts a sequence of date entries to a numpy datetime64[D] array, with NaT for entries that cannot be parsed
+    Entries in dd/mm/yyyy layout are converted with array operations, anything else goes through parse_date
+
+    :param values: A list, array or series of date entries
+    :param formats: Optional list of formats to use in place of DateFormats
+    """
+    import numpy as np
+    formats = DateFormats if formats is None else formats
+    arr = _column_array(values)
+    if arr.dtype.kind=="M":
+        return arr.astype("datetime64[D]")
+    out = np.full(len(arr),np.datetime64("NaT"),dtype="datetime64[D]")
+    done = np.zeros(len(arr),dtype=bool)
+    if len(arr) and formats and formats[0]=="%d/%m/%Y":
+        #read the characters of each entry, an 11th character means the entry is too long
+        text = arr if arr.dtype.kind=="U" else np.array([v if isinstance(v,str) else "" for v in arr.tolist()],dtype="U11")
+        chars = text.astype("U11").view(np.uint32).reshape(len(arr),11).astype(np.int64)
+        digits = chars[:,[0,1,3,4,6,7,8,9]]-48
+        layout = (chars[:,2]==47)&(chars[:,5]==47)&(chars[:,10]==0)&((digits>=0)&(digits<=9)).all(axis=1)
+        day = digits[:,0]*10+digits[:,1]
+        month = digits[:,2]*10+digits[:,3]
+        year = digits[:,4]*1000+digits[:,5]*100+digits[:,6]*10+digits[:,7]
+        layout &= (month>=1)&(month<=12)&(day>=1)&(year>=1)
+        monthStart = np.where(layout,(year-1970)*12+month-1,0).astype("datetime64[M]")
+        dates = monthStart.astype("datetime64[D]")+np.where(layout,day-1,0)
+        #reject days past the end of the month, e.g. 31/02
+        layout &= dates.astype("datetime64[M]")==monthStart
+        out[layout] = dates[layout]
+        done = layout
+    for i in np.flatnonzero(~done):
+        try:
+            out[i] = _parse_date(arr[i],formats)
+        except ValueError:
+            pass
+    return out
+
+#create functions to calculate age in whole years, allowing for leap years
+def age_years(BirthDate,ContactDate):
+    """
+    Returns the age in whole years on ContactDate of a person born on BirthDate
+    A birthday on 29 February is reached on 1 March in non-leap years
+    """
+    return ContactDate.year-BirthDate.year-((ContactDate.month,ContactDate.day)<(BirthDate.month,BirthDate.day))
+
+def age_years_array(BirthDate,ContactDate):
+    """
+    Returns an integer array of ages in whole years from datetime64[D] arrays of birth and contact dates
+    """
+    import numpy as np
+    dob = np.asarray(BirthDate,dtype="datetime64[D]")
+    doc = np.asarray(ContactDate,dtype="datetime64[D]")
+    def year_month_day(d):
+        y = d.astype("datetime64[Y]")
+        m = d.astype("datetime64[M]")
+        month = (m-y.astype("datetime64[M]")).astype(np.int64)
+        day = (d-m.astype("datetime64[D]")).astype(np.int64)
+        return y.astype(np.int64),month*32+day
+    dobYear,dobDay = year_month_day(dob)
+    docYear,docDay = year_month_day(doc)
+    return docYear-dobYear-(docDay<dobDay)
+
+
 #create a dataframe of each service variety, intensity level and risk factor modifier
 #create lists
 ServType = ["None","Equipment","Day Support","Direct Payment","Homecare: Low","Homecare: Mid","Homecare: High"]
 ServIntens = [1,2,3,4,5,6,7]
 ServModify = [0.2,0.6,0.8,1,1.1,1.3,1.5]
 Header = ["Service","Intensity","RiskModifier"]
-#combine lists to array
-ServInfo = np.array((ServType))
-servLen = len(ServInfo)
-ServInfo=ServInfo.reshape(servLen,1)
-ServInfo = np.hstack((ServInfo,np.array((ServIntens)).reshape(servLen,1),np.array((ServModify)).reshape(servLen,1)))
-#convert array to dataframe
-ServInfo = pd.DataFrame(ServInfo,columns = Header)
-ServInfo = ServInfo.set_index("Service")
 
 #create dataframe of key setting info
 StatusRoute = ["Transition","Community","Hospital Discharge","Existing Service"]
 StatusModify = [1.2,1.2,1.5,1]
 StatusHeader = ["Entry","Modifier"]
-#combine lists to array
-StatusLen = len(StatusRoute)
-StatusInfo = np.array((StatusRoute)).reshape(StatusLen,1)
-StatusInfo = np.hstack((StatusInfo,np.array((StatusModify)).reshape(StatusLen,1)))
-#convert to dataframe
-StatusInfo = pd.DataFrame(StatusInfo,columns = StatusHeader).set_index("Entry")
+
+#create the ServInfo and StatusInfo dataframes when first used, rather than importing pandas at start up
+def __getattr__(name):
+    if name=="ServInfo":
+        import pandas as pd
+        info = pd.DataFrame({Header[0]:ServType,Header[1]:ServIntens,Header[2]:[float(v) for v in ServModify]}).set_index("Service")
+    elif name=="StatusInfo":
+        import pandas as pd
+        info = pd.DataFrame({StatusHeader[0]:StatusRoute,StatusHeader[1]:[float(v) for v in StatusModify]}).set_index("Entry")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = info
+    return info
+
+#create lists of age bands and service change bands
+#breaks are the lowest value in each band after the first, so a value's band is the number of breaks <= the value
+AgeBreaks = [66,76,86]
+AgeModify = [0.8,1,1.2,1.5]
+ChangeBreaks = [-2,-1,0,1,2,3]
+ChangeModify = [0.25,0.5,0.75,1,1.5,1.75,2]
+
+#create integer codes for each service and status, given by position in the lists
+ServCode = {serv:code for code,serv in enumerate(ServType)}
+StatusCode = {stat:code for code,stat in enumerate(StatusRoute)}
+
+
+#create a read only numpy array property, built from the modifier lists when first used
+def _array_property(name,dtype):
+    def build(self):
+        import numpy as np
+        arr = np.asarray(self._lists[name],dtype=dtype)
+        arr.flags.writeable = False
+        return arr
+    build.__doc__ = f"numpy {dtype} array of {name}, created when first used"
+    return functools.cached_property(build)
+
+#create a class holding the modifier lists compiled to numeric lookup tables
+class ModifierTables:
+    """
+    Numeric lookup tables compiled once from the risk modifier lists, including every possible rag score
+    Single record lookups use plain python lists; the numpy array attributes are only created when first used
+
+    Attributes:
+        ServIntens: Integer array of service intensity, indexed by service code (position in ServType)
+        ServModify: Float array of service risk modifier, indexed by service code
+        StatusModify: Float array of status risk modifier, indexed by status code (position in StatusRoute)
+        AgeBreaks: Integer array of the lowest age in each age band after the first
+        AgeModify: Float array of age risk modifier, indexed by age band
+        ChangeBreaks: Integer array of the lowest intensity change in each change band after the first
+        ChangeModify: Float array of service change risk modifier, indexed by change band
+        ChangeBand: Integer array of change band, indexed by [CurrentServ code, NewServ code]
+        RagCube: Float array of rag score, indexed by [age band, status code, CurrentServ code, NewServ code]
+        Version: Short hash of the modifier lists, which changes whenever any list changes
+
+    Methods:
+        age_band() - returns the age band for an age in whole years
+        change_band() - returns the change band for a change in service intensity
+        age_factor(), serv_factor(), change_factor(), status_factor() - return a single risk modifier
+        rag() - returns the rag score for an age and Status, CurrentServ and NewServ entries
+        to_dict() - returns the modifier lists, which can be passed back to ModifierTables(**lists)
+
+    Error handling:
+        Lists of the wrong length or unsorted breaks generate a value error
+    """
+    #create initialisation method, defaulting to the module modifier lists
+    def __init__(self,ServIntens=ServIntens,ServModify=ServModify,StatusModify=StatusModify,AgeBreaks=AgeBreaks,AgeModify=AgeModify,ChangeBreaks=ChangeBreaks,ChangeModify=ChangeModify):
+        """
+        Docstring for __init__
+
+        :param self: Defines instance of class
+        :param ServIntens: Intensity of each service in ServType order
+        :param ServModify: Risk modifier of each service in ServType order
+        :param StatusModify: Risk modifier of each status in StatusRoute order
+        :param AgeBreaks: Lowest age in each age band after the first, ascending
+        :param AgeModify: Risk modifier of each age band, one more than AgeBreaks
+        :param ChangeBreaks: Lowest intensity change in each change band after the first, ascending
+        :param ChangeModify: Risk modifier of each change band, one more than ChangeBreaks
+        """
+        self._lists = {"ServIntens":[int(v) for v in ServIntens],
+                       "ServModify":[float(v) for v in ServModify],
+                       "StatusModify":[float(v) for v in StatusModify],
+                       "AgeBreaks":[int(v) for v in AgeBreaks],
+                       "AgeModify":[float(v) for v in AgeModify],
+                       "ChangeBreaks":[int(v) for v in ChangeBreaks],
+                       "ChangeModify":[float(v) for v in ChangeModify]}
+        lists = self._lists
+        if len(lists["ServIntens"])!=len(ServType) or len(lists["ServModify"])!=len(ServType):
+            raise ValueError(f"Service lists must have {len(ServType)} entries.")
+        if len(lists["StatusModify"])!=len(StatusRoute):
+            raise ValueError(f"Status list must have {len(StatusRoute)} entries.")
+        for name in ("Age","Change"):
+            breaks,modify = lists[name+"Breaks"],lists[name+"Modify"]
+            if len(modify)!=len(breaks)+1:
+                raise ValueError(f"{name} modifiers must have one more entry than {name} breaks.")
+            if any(b<=a for a,b in zip(breaks,breaks[1:])):
+                raise ValueError(f"{name} breaks must be in ascending order.")
+        #change band for every current and new service pair
+        intens = lists["ServIntens"]
+        self._changeBand = [[self.change_band(new-curr) for new in intens] for curr in intens]
+        #rag for every age band, status, current and new service, multiplied in the same order as update_Rag
+        servMod,ageMod,changeMod,statusMod = lists["ServModify"],lists["AgeModify"],lists["ChangeModify"],lists["StatusModify"]
+        self._ragCube = [[[[1.0*servMod[n]*ageMod[a]*changeMod[self._changeBand[c][n]]*statusMod[s] for n in range(len(ServType))]
+                           for c in range(len(ServType))] for s in range(len(StatusRoute))] for a in range(len(ageMod))]
+        self.Version = hashlib.sha256(json.dumps(self.to_dict(),sort_keys=True).encode()).hexdigest()[:16]
+
+    #create numpy versions of the lists for batch scoring
+    ServIntens = _array_property("ServIntens","int64")
+    ServModify = _array_property("ServModify","float64")
+    StatusModify = _array_property("StatusModify","float64")
+    AgeBreaks = _array_property("AgeBreaks","int64")
+    AgeModify = _array_property("AgeModify","float64")
+    ChangeBreaks = _array_property("ChangeBreaks","int64")
+    ChangeModify = _array_property("ChangeModify","float64")
+
+    @functools.cached_property
+    def ChangeBand(self):
+        """
+        numpy int64 array of change band, indexed by [CurrentServ code, NewServ code]
+        """
+        import numpy as np
+        arr = np.asarray(self._changeBand,dtype=np.int64)
+        arr.flags.writeable = False
+        return arr
+
+    @functools.cached_property
+    def RagCube(self):
+        """
+        numpy float64 array of rag score, indexed by [age band, status code, CurrentServ code, NewServ code]
+        """
+        import numpy as np
+        arr = np.asarray(self._ragCube,dtype=np.float64)
+        arr.flags.writeable = False
+        return arr
+
+    #create method to return the modifier lists
+    def to_dict(self):
+        """
+        Returns a dictionary of the modifier lists keyed by parameter name
+        """
+        return {name:list(values) for name,values in self._lists.items()}
+
+    #create methods to find the band for a single value
+    def age_band(self,age):
+        """
+        Returns the age band for an age in whole years
+        """
+        return bisect.bisect_right(self._lists["AgeBreaks"],age)
+
+    def change_band(self,change):
+        """
+        Returns the change band for a change in service intensity (new minus current)
+        """
+        return bisect.bisect_right(self._lists["ChangeBreaks"],change)
+
+    #create methods to look up a single risk modifier
+    def age_factor(self,age):
+        """
+        Returns the age risk modifier for an age in whole years
+        """
+        return self._lists["AgeModify"][self.age_band(age)]
+
+    def serv_factor(self,NewServ):
+        """
+        Returns the service risk modifier for a valid NewServ entry
+        """
+        return self._lists["ServModify"][ServCode[NewServ]]
+
+    def change_factor(self,CurrentServ,NewServ):
+        """
+        Returns the service change risk modifier for valid CurrentServ and NewServ entries
+        """
+        return self._lists["ChangeModify"][self._changeBand[ServCode[CurrentServ]][ServCode[NewServ]]]
+
+    def status_factor(self,Status):
+        """
+        Returns the status risk modifier for a valid Status entry
+        """
+        return self._lists["StatusModify"][StatusCode[Status]]
+
+    #create method to look up a rag score directly from the rag cube
+    def rag(self,age,Status,CurrentServ,NewServ):
+        """
+        Returns the rag score for an age in whole years and valid Status, CurrentServ and NewServ entries
+        """
+        return self._ragCube[self.age_band(age)][StatusCode[Status]][ServCode[CurrentServ]][ServCode[NewServ]]
+
+#compile the default tables used by AssessRev and the batch scoring functions
+Tables = ModifierTables()
+
+#set the number of distinct scored inputs to remember
+ScoreCacheSize = 65536
+
+#create an immutable result holding every factor of a single score
+class RagScore(collections.namedtuple("RagScore",["ContactDate","BirthDate","Status","CurrentServ","NewServ","Age",
+                                                  "AgeFac","ServFac","ServChange","StatusFac","Rag","RagCategory"])):
+    """
+    The result of score(): the validated inputs, age in whole years, each risk modifier, the rag and its category
+    Results are tuples with no per instance dictionary, so they cannot be changed and can be shared between callers and threads
+    """
+    __slots__ = ()
+
+#create the scoring function, free of side effects so results can be cached and shared
+def _score(ContactDate,BirthDate,Status,CurrentServ,NewServ,tables):
+    try:
+        ContactDate = parse_date(ContactDate)
+    except ValueError:
+        raise ValueError("Contact Date is not valid")
+    try:
+        BirthDate = parse_date(BirthDate)
+    except ValueError:
+        raise ValueError("Birth Date is not a valid date")
+    if not (Status in StatusRoute):
+        raise ValueError(f"{Status} not a valid status.")
+    if not (CurrentServ in ServType):
+        raise ValueError(f"{CurrentServ} is not a valid service type.")
+    if not (NewServ in ServType):
+        raise ValueError(f"{NewServ} is not a valid service type.")
+    age = age_years(BirthDate,ContactDate)
+    rag = tables.rag(age,Status,CurrentServ,NewServ)
+    return RagScore(ContactDate,BirthDate,Status,CurrentServ,NewServ,age,tables.age_factor(age),tables.serv_factor(NewServ),
+                    tables.change_factor(CurrentServ,NewServ),tables.status_factor(Status),rag,rag_category(rag))
+
+_score_cached = functools.lru_cache(maxsize=ScoreCacheSize)(_score)
+
+def score(ContactDate,BirthDate,Status,CurrentServ,NewServ,tables=None):
+    """
+    Scores a single contact without creating or changing any object, returning a RagScore
+    Calls with the same entries and tables return the same cached result, and the function is safe to call from several threads
+
+    :param ContactDate: The date the contact was completed
+    :param BirthDate: The individuals date of birth
+    :param Status: The current setting of the person (Transition,Community,Hospital Discharge,Existing Service)
+    :param CurrentServ: The service being reviewed.  If new to ASC, select 'None'
+    :param NewServ: The service being recommended as a result of the review/assessment
+    :param tables: ModifierTables to score with. Default is Tables
+
+    Error handling:
+        Invalid entries generate the same value errors as AssessRev
+    """
+    tables = Tables if tables is None else tables
+    try:
+        return _score_cached(ContactDate,BirthDate,Status,CurrentServ,NewServ,tables)
+    except TypeError:
+        #entries that cannot be cached (e.g. lists) are scored directly, which rejects them with a value error
+        return _score(ContactDate,BirthDate,Status,CurrentServ,NewServ,tables)
+
+score.cache_info = _score_cached.cache_info
+score.cache_clear = _score_cached.cache_clear
 
 
 #Create a new class for entering person info and generating RAG
@@ -59,6 +408,9 @@ class AssessRev:
         update_ServChange() - allows the default ServChange created at initiation to be replaced with a calculated version
         update_StatusFac() - allows the default StatusFac created at initiation to be replaced with a calculated version
         update_Rag() - Replaces the default RAG with one calculated from the risk factors
+        score() - returns the RagScore of the contact, with every factor, without changing the instance
+
+    Each update_ method takes its value from score(), so updating repeatedly, or from several threads, gives the same result
 
     Error handling:
         Entry of incorrect data types will generate a different value error depending on where the error is
@@ -92,12 +444,12 @@ class AssessRev:
         else:
             raise ValueError("Please enter a person ID")
         try:
-            self.ContactDate = pd.to_datetime(ContactDate,dayfirst=True)
-        except:
+            self.ContactDate = parse_date(ContactDate)
+        except ValueError:
             raise ValueError("Contact Date is not valid")
         try:
-            self.BirthDate = pd.to_datetime(BirthDate,dayfirst=True)
-        except:
+            self.BirthDate = parse_date(BirthDate)
+        except ValueError:
             raise ValueError("Birth Date is not a valid date")
         if not (Status in AssessRev.STATUS_TYPES):
             raise ValueError(f"{Status} not a valid status.")
@@ -117,25 +469,21 @@ class AssessRev:
         self.StatusFac = StatusFac
         self.Rag = Rag
 
+    #create method to score the contact without changing it
+    def score(self,tables=None):
+        """
+        Returns the RagScore of the contact from the module score function
+        No additional attributes are required
+        """
+        return score(self.ContactDate,self.BirthDate,self.Status,self.CurrentServ,self.NewServ,tables)
+
     #create method to update AgeFac
     def update_AgeFac(self):
         """
         This method allows the replacement of the default AgeFac with a calculated value based on ageband
         No additional attributes are required
         """
-        dob = pd.to_datetime(self.BirthDate)
-        doc = pd.to_datetime(self.ContactDate)
-        ageCalc = (doc-dob).days
-        ageCalc = math.floor(ageCalc/365)
-        if ageCalc >85:
-            newAgeFac = 1.5
-        elif ageCalc >75:
-            newAgeFac = 1.2
-        elif ageCalc >65:
-            newAgeFac = 1
-        else:
-            newAgeFac = 0.8
-        self.AgeFac=newAgeFac
+        self.AgeFac = self.score().AgeFac
     
     #create method to update ServFac
     def update_ServFac(self):
@@ -143,8 +491,7 @@ class AssessRev:
         This method allows the replacement of the existing ServFac of an AssessRev instance with a new value
         No additional attributes are required
         """
-        newServFac = ServInfo.at[self.NewServ,"RiskModifier"]
-        self.ServFac = newServFac
+        self.ServFac = self.score().ServFac
 
     #create method to update ServChange
     def update_ServChange(self):
@@ -152,24 +499,7 @@ class AssessRev:
         This method allows the replacement of the existing ServChange of an AssessRev instance with a new value
         No additional attributes are required
         """
-        currVal = ServInfo.at[self.CurrentServ,"Intensity"]
-        newVal = ServInfo.at[self.NewServ,"Intensity"]
-        change = int(newVal)-int(currVal)
-        if change > 2:
-            changeFac = 2
-        elif change > 1:
-            changeFac = 1.75
-        elif change > 0:
-            changeFac = 1.5
-        elif change == 0:
-            changeFac = 1
-        elif change < -2:
-            changeFac = 0.25
-        elif change < -1:
-            changeFac = 0.5
-        else:
-            changeFac = 0.75
-        self.ServChange = changeFac
+        self.ServChange = self.score().ServChange
 
     #add a new function to update the modification factor associated with entry route
     def update_StatusFac(self):
@@ -177,16 +507,16 @@ class AssessRev:
         This method updates the StatusFac parameter of an existing AssessRev instance
         No additional attributes required
         """
-        StatusMod = StatusInfo.at[self.Status,"Modifier"]
-        self.StatusFac = StatusMod
+        self.StatusFac = self.score().StatusFac
 
     #add function to recalculate RAG based on risk factors
     def update_Rag(self):
         """
         This method calculates the RAG based on risk factors of an existing AssessRev instance
+        The RAG is the product of the current factors, so calling it again does not compound the score
         No additional attributes required
         """
-        newRag = float(self.Rag)*float(self.ServFac)*float(self.AgeFac)*float(self.ServChange)*float(self.StatusFac)
+        newRag = 1.0*float(self.ServFac)*float(self.AgeFac)*float(self.ServChange)*float(self.StatusFac)
         self.Rag = newRag
     
     #add class methods to provide details of valid Service and Status types
@@ -205,3 +535,166 @@ class AssessRev:
         return cls.STATUS_TYPES
     
     pass
+
+
+#set the thresholds used to convert a rag score into a red/amber/green category
+RagCategories = ["Green","Amber","Red"]
+
+def rag_category(rag):
+    """
+    Converts a rag score to a single red/amber/green category (<=1 = Green, >3 = Red, else Amber)
+
+    :param rag: A calculated rag score
+    """
+    if rag <=1:
+        return "Green"
+    elif rag >3:
+        return "Red"
+    else:
+        return "Amber"
+
+
+#set the columns required for batch scoring and the calculated columns
+FrameColumns = ["PersonId","ContactDate","BirthDate","Status","CurrentServ","NewServ"]
+ScoreColumns = ["AgeFac","ServFac","ServChange","StatusFac","Rag"]
+
+#create function to validate and encode whole columns of contact details
+def _lookup_codes(values,lookup):
+    #code of each entry from a dictionary of entries to codes, -1 for entries not in it
+    import numpy as np
+    values = values.tolist()
+    try:
+        return np.fromiter((lookup.get(v,-1) for v in values),dtype=np.int8,count=len(values))
+    except TypeError:
+        #unhashable entries, e.g. lists, cannot be valid
+        return np.fromiter((lookup.get(v,-1) if getattr(type(v),"__hash__",None) else -1 for v in values),dtype=np.int8,count=len(values))
+
+def _missing(values):
+    #true for None, NaN and, if pandas is in use, pd.NA and NaT, checked entry by entry so no comparison has to be a plain bool
+    import sys
+    import numpy as np
+    if "pandas" in sys.modules:
+        return np.asarray(sys.modules["pandas"].isna(values),dtype=bool)
+    return np.fromiter((v is None or (isinstance(v,float) and v!=v) for v in values.tolist()),dtype=bool,count=len(values))
+
+def validate_columns(PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ):
+    """
+    Checks every entry of columns of contact details at once, rather than stopping at the first invalid entry
+    Membership of StatusRoute and ServType is checked by looking up each entry's code, with -1 for entries not found
+
+    :param PersonId, ContactDate, BirthDate, Status, CurrentServ, NewServ: Sequences of entries as for encode_columns
+    Returns (encoded, valid, errors):
+        encoded - tuple of the six converted arrays for every row, with NaT for invalid dates and -1 for invalid codes
+        valid - boolean array, true for rows with no invalid entries
+        errors - dictionary of Row, Field and Reason arrays with an entry for each invalid entry, in row then FrameColumns order,
+                 the reasons matching the value errors of AssessRev
+    """
+    import numpy as np
+    ids = _column_array(PersonId,dtype=object)
+    missing = _missing(ids)
+    ids = ids.astype(str)
+    doc = parse_dates(ContactDate)
+    dob = parse_dates(BirthDate)
+    values = [_column_array(col,dtype=object) for col in (Status,CurrentServ,NewServ)]
+    codes = [_lookup_codes(val,lookup) for val,lookup in zip(values,(StatusCode,ServCode,ServCode))]
+    bad = [missing|(np.char.str_len(ids)==0),np.isnat(doc),np.isnat(dob)]+[code<0 for code in codes]
+    #build the report field by field, then put it in row order
+    rows = []
+    fields = []
+    reasons = []
+    for field,mask,reason in zip(FrameColumns,bad,["Please enter a person ID","Contact Date is not valid","Birth Date is not a valid date",
+                                                    "{} not a valid status.","{} is not a valid service type.","{} is not a valid service type."]):
+        pos = np.flatnonzero(mask)
+        rows.append(pos)
+        fields.append(np.full(len(pos),field,dtype=object))
+        if "{}" in reason:
+            reasons.append(np.array([reason.format(v) for v in values[FrameColumns.index(field)-3][pos].tolist()],dtype=object))
+        else:
+            reasons.append(np.full(len(pos),reason,dtype=object))
+    rows = np.concatenate(rows)
+    order = np.argsort(rows,kind="stable")
+    errors = {"Row":rows[order],"Field":np.concatenate(fields)[order],"Reason":np.concatenate(reasons)[order]}
+    valid = ~np.logical_or.reduce(bad)
+    return (ids.astype(object),doc,dob,*codes),valid,errors
+
+def encode_columns(PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ):
+    """
+    Validates columns of contact details and converts them to arrays ready for batch scoring
+
+    :param PersonId: Sequence of unique identifiers, converted to strings
+    :param ContactDate: Sequence of contact dates, converted to datetime64[D]
+    :param BirthDate: Sequence of birth dates, converted to datetime64[D]
+    :param Status: Sequence of StatusRoute entries, converted to int8 status codes
+    :param CurrentServ: Sequence of ServType entries, converted to int8 service codes
+    :param NewServ: Sequence of ServType entries, converted to int8 service codes
+    Returns a tuple of the six converted arrays in the same order
+
+    Error handling:
+        Invalid entries raise a value error naming the first column at fault, matching AssessRev
+        Use validate_columns to find every invalid entry instead
+    """
+    encoded,valid,errors = validate_columns(PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ)
+    if not valid.all():
+        for field in FrameColumns:
+            pos = (errors["Field"]==field).nonzero()[0]
+            if len(pos):
+                raise ValueError(errors["Reason"][pos[0]])
+    return encoded
+
+#create function to score encoded columns from the compiled tables
+def score_codes(BirthDate,ContactDate,Status,CurrentServ,NewServ,tables=None):
+    """
+    Looks up every factor and the rag for encoded columns, as returned by encode_columns
+
+    :param BirthDate: datetime64[D] array of birth dates
+    :param ContactDate: datetime64[D] array of contact dates
+    :param Status: Array of status codes
+    :param CurrentServ: Array of service codes
+    :param NewServ: Array of service codes
+    :param tables: ModifierTables to score with. Default is Tables
+    Returns a dictionary of AgeBand, ChangeBand, AgeFac, ServFac, ServChange, StatusFac and Rag arrays
+    """
+    import numpy as np
+    tables = Tables if tables is None else tables
+    ageBand = np.searchsorted(tables.AgeBreaks,age_years_array(BirthDate,ContactDate),side="right").astype(np.int8)
+    changeBand = tables.ChangeBand[CurrentServ,NewServ].astype(np.int8)
+    return {"AgeBand":ageBand,
+            "ChangeBand":changeBand,
+            "AgeFac":tables.AgeModify[ageBand],
+            "ServFac":tables.ServModify[NewServ],
+            "ServChange":tables.ChangeModify[changeBand],
+            "StatusFac":tables.StatusModify[Status],
+            "Rag":tables.RagCube[ageBand,Status,CurrentServ,NewServ]}
+
+def rag_categories(rag):
+    """
+    Converts an array of rag scores to an array of red/amber/green categories, using the same thresholds as rag_category
+    """
+    import numpy as np
+    rag = np.asarray(rag)
+    return np.where(rag<=1,"Green",np.where(rag>3,"Red","Amber"))
+
+#create function to score a whole dataframe of contacts using column operations
+def score_frame(df):
+    """
+    Scores every contact in a dataframe in one pass, without creating an AssessRev instance per row.
+    Returns the same factors and rag as running the AssessRev update methods on each row.
+
+    :param df: A dataframe with the columns PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ
+    Returns a new dataframe of the input columns plus AgeFac, ServFac, ServChange, StatusFac, Rag and RagCategory
+
+    Error handling:
+        Missing columns or invalid entries raise a value error naming the first column at fault
+    """
+    missing = [col for col in FrameColumns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    out = df[FrameColumns].copy()
+    ids,doc,dob,statusCode,currCode,newCode = encode_columns(*(out[col] for col in FrameColumns))
+    scores = score_codes(dob,doc,statusCode,currCode,newCode)
+    out["ContactDate"] = doc
+    out["BirthDate"] = dob
+    for col in ScoreColumns:
+        out[col] = scores[col]
+    out["RagCategory"] = rag_categories(scores["Rag"])
+    return out
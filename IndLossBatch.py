@@ -0,0 +1,378 @@
+#import key libraries
+import collections
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ServType,StatusRoute,FrameColumns,ScoreColumns
+
+#set the columns held by a batch, with the type of each
+CodeColumns = ["Status","CurrentServ","NewServ"]
+BatchColumns = {"PersonId":object,
+                "ContactDate":"datetime64[D]",
+                "BirthDate":"datetime64[D]",
+                "Status":np.int8,
+                "CurrentServ":np.int8,
+                "NewServ":np.int8,
+                "AgeBand":np.int8,
+                "ChangeBand":np.int8,
+                "AgeFac":np.float64,
+                "ServFac":np.float64,
+                "ServChange":np.float64,
+                "StatusFac":np.float64,
+                "Rag":np.float64}
+
+
+#create a lightweight view of one row of a batch
+class AssessmentRow:
+    """
+    A read only view of a single row of an AssessmentBatch, with the same attribute names as AssessRev
+
+    Attributes:
+        PersonId, ContactDate, BirthDate, Status, CurrentServ, NewServ, AgeFac, ServFac, ServChange, StatusFac, Rag
+        Dates are returned as datetime.date and Status/CurrentServ/NewServ as their text entries
+    """
+    __slots__ = ("_batch","_index")
+
+    def __init__(self,batch,index):
+        self._batch = batch
+        self._index = index
+
+    @property
+    def PersonId(self):
+        return self._batch.PersonId[self._index]
+
+    @property
+    def ContactDate(self):
+        return self._batch.ContactDate[self._index].astype(object)
+
+    @property
+    def BirthDate(self):
+        return self._batch.BirthDate[self._index].astype(object)
+
+    @property
+    def Status(self):
+        return StatusRoute[self._batch.Status[self._index]]
+
+    @property
+    def CurrentServ(self):
+        return ServType[self._batch.CurrentServ[self._index]]
+
+    @property
+    def NewServ(self):
+        return ServType[self._batch.NewServ[self._index]]
+
+    @property
+    def AgeFac(self):
+        return float(self._batch.AgeFac[self._index])
+
+    @property
+    def ServFac(self):
+        return float(self._batch.ServFac[self._index])
+
+    @property
+    def ServChange(self):
+        return float(self._batch.ServChange[self._index])
+
+    @property
+    def StatusFac(self):
+        return float(self._batch.StatusFac[self._index])
+
+    @property
+    def Rag(self):
+        return float(self._batch.Rag[self._index])
+
+    def __repr__(self):
+        return f"AssessmentRow(PersonId={self.PersonId!r}, Rag={self.Rag!r})"
+
+
+#create a columnar container for many assessments
+class AssessmentBatch:
+    """
+    Holds many assessments as one numpy array per attribute rather than one AssessRev instance per row
+
+    Attributes:
+        PersonId: Object array of person id strings
+        ContactDate: datetime64[D] array of contact dates
+        BirthDate: datetime64[D] array of birth dates
+        Status: int8 array of status codes (position in AssessRev.STATUS_TYPES)
+        CurrentServ: int8 array of service codes (position in AssessRev.SERV_TYPES)
+        NewServ: int8 array of service codes (position in AssessRev.SERV_TYPES)
+        AgeBand: int8 array of age band codes. -1 until scored
+        ChangeBand: int8 array of service change band codes. -1 until scored
+        AgeFac, ServFac, ServChange, StatusFac, Rag: float64 arrays of calculated values. Default is 1 until scored
+
+    Methods:
+        from_records() - creates a batch from an iterable of (PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ)
+        from_frame() - creates a batch from a dataframe with the FrameColumns, carrying over any ScoreColumns present
+        concat() - joins several batches into one
+        score() - calculates the factors and rag for every row
+        append() - adds the rows of another batch to the end of this one
+        filter() - returns a new batch of the rows where a mask is true
+        to_frame() - converts the batch to a dataframe with text Status and service columns
+
+    Indexing with an integer returns an AssessmentRow, indexing with a slice, mask or integer array returns an AssessmentBatch
+    Slices share memory with the original batch
+
+    Error handling:
+        Columns of different lengths generate a value error, invalid entries raise the same value errors as AssessRev
+    """
+    #create initialisation method from encoded arrays
+    def __init__(self,PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ,AgeBand=None,ChangeBand=None,AgeFac=None,ServFac=None,ServChange=None,StatusFac=None,Rag=None):
+        """
+        Docstring for __init__
+
+        :param self: Defines instance of class
+        :param PersonId: Sequence of person ids
+        :param ContactDate: datetime64[D] array of contact dates
+        :param BirthDate: datetime64[D] array of birth dates
+        :param Status: Array of status codes
+        :param CurrentServ: Array of service codes
+        :param NewServ: Array of service codes
+        :param AgeBand: Array of age band codes. Default is -1
+        :param ChangeBand: Array of service change band codes. Default is -1
+        :param AgeFac, ServFac, ServChange, StatusFac, Rag: Arrays of calculated values. Default is 1
+
+        Use from_records or from_frame to create a batch from text entries
+        """
+        n = len(PersonId)
+        defaults = {"AgeBand":-1,"ChangeBand":-1,"AgeFac":1,"ServFac":1,"ServChange":1,"StatusFac":1,"Rag":1}
+        values = {"PersonId":PersonId,"ContactDate":ContactDate,"BirthDate":BirthDate,"Status":Status,"CurrentServ":CurrentServ,"NewServ":NewServ,
+                  "AgeBand":AgeBand,"ChangeBand":ChangeBand,"AgeFac":AgeFac,"ServFac":ServFac,"ServChange":ServChange,"StatusFac":StatusFac,"Rag":Rag}
+        for col,dtype in BatchColumns.items():
+            val = values[col]
+            if val is None:
+                val = np.full(n,defaults[col],dtype=dtype)
+            else:
+                val = np.asarray(val,dtype=dtype)
+            if val.shape!=(n,):
+                raise ValueError(f"{col} has {len(val)} rows, expected {n}.")
+            setattr(self,col,val)
+
+    #create methods to build a batch from text entries
+    @classmethod
+    def from_records(cls,records):
+        """
+        Returns an unscored batch from an iterable of (PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ) tuples
+        """
+        records = list(records)
+        columns = list(zip(*records)) if records else [[]]*len(FrameColumns)
+        return cls(*IndLoss.encode_columns(*columns))
+
+    @classmethod
+    def from_frame(cls,df):
+        """
+        Returns a batch from a dataframe with the columns in FrameColumns
+        Any AgeBand, ChangeBand, AgeFac, ServFac, ServChange, StatusFac or Rag columns are carried over
+        """
+        missing = [col for col in FrameColumns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        scored = {col:df[col].to_numpy() for col in ["AgeBand","ChangeBand"]+ScoreColumns if col in df.columns}
+        return cls(*IndLoss.encode_columns(*(df[col] for col in FrameColumns)),**scored)
+
+    @classmethod
+    def concat(cls,batches):
+        """
+        Returns a single batch containing the rows of each batch in turn
+        """
+        batches = list(batches)
+        if not batches:
+            return cls.from_records([])
+        return cls(**{col:np.concatenate([getattr(b,col) for b in batches]) for col in BatchColumns})
+
+    #create method to score every row
+    def score(self,tables=None):
+        """
+        Replaces the factors and rag of every row with values calculated from the modifier tables
+        Returns the batch so calls can be chained
+
+        :param tables: ModifierTables to score with. Default is IndLoss.Tables
+        """
+        scores = IndLoss.score_codes(self.BirthDate,self.ContactDate,self.Status,self.CurrentServ,self.NewServ,tables)
+        for col,val in scores.items():
+            getattr(self,col)[:] = val
+        return self
+
+    #create methods to combine and select rows
+    def append(self,other):
+        """
+        Adds the rows of another batch to the end of this batch
+        """
+        for col in BatchColumns:
+            setattr(self,col,np.concatenate([getattr(self,col),getattr(other,col)]))
+
+    def filter(self,mask):
+        """
+        Returns a new batch of the rows where mask is true
+        """
+        return self[np.asarray(mask,dtype=bool)]
+
+    def __len__(self):
+        return len(self.PersonId)
+
+    def __getitem__(self,key):
+        if isinstance(key,(int,np.integer)):
+            if key<0:
+                key += len(self)
+            if not 0<=key<len(self):
+                raise IndexError("batch index out of range")
+            return AssessmentRow(self,key)
+        return AssessmentBatch(**{col:getattr(self,col)[key] for col in BatchColumns})
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield AssessmentRow(self,i)
+
+    def __repr__(self):
+        return f"AssessmentBatch({len(self)} rows)"
+
+    #create method to convert to a dataframe
+    def to_frame(self):
+        """
+        Returns a dataframe of the batch, with Status, CurrentServ and NewServ as categorical text columns
+        The dataframe can be converted back with from_frame
+        """
+        import pandas as pd
+        data = {}
+        for col in BatchColumns:
+            val = getattr(self,col)
+            if col=="Status":
+                val = pd.Categorical.from_codes(val,categories=StatusRoute)
+            elif col in CodeColumns:
+                val = pd.Categorical.from_codes(val,categories=ServType)
+            data[col] = val
+        return pd.DataFrame(data)
+
+    #create method to report memory use
+    def nbytes(self):
+        """
+        Returns the bytes used by the column arrays, not counting the person id strings themselves
+        """
+        return sum(getattr(self,col).nbytes for col in BatchColumns)
+
+
+#create functions to validate, encode and score one chunk of rows
+def validate_records(records):
+    """
+    Validates every row of an iterable of (PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ) records in one pass
+    Returns (unscored AssessmentBatch of the valid rows, boolean mask of the valid rows, error report)
+    The error report is a dictionary of Row, Field and Reason arrays, as returned by IndLoss.validate_columns
+    """
+    records = list(records)
+    columns = list(zip(*records)) if records else [[]]*len(FrameColumns)
+    encoded,valid,errors = IndLoss.validate_columns(*columns)
+    if valid.all():
+        return AssessmentBatch(*encoded),valid,errors
+    return AssessmentBatch(*(col[valid] for col in encoded)),valid,errors
+
+def encode_rows(rows):
+    """
+    Validates and encodes a list of rows holding the FrameColumns in order, without scoring them
+    Returns (unscored AssessmentBatch, positions of the valid rows in the list, list of (position, reason) for rejected rows)
+    Each rejected row is reported with its first invalid entry, as AssessRev would
+    """
+    batch,valid,errors = validate_records(rows)
+    first = np.ones(len(errors["Row"]),dtype=bool)
+    first[1:] = errors["Row"][1:]!=errors["Row"][:-1]
+    return batch,np.flatnonzero(valid).tolist(),list(zip(errors["Row"][first].tolist(),errors["Reason"][first].tolist()))
+
+def score_rows(rows,tables=None):
+    """
+    Scores a list of rows holding the FrameColumns in order
+    Returns (scored AssessmentBatch, positions of the scored rows in the list, list of (position, reason) for rejected rows)
+    """
+    batch,valid,rejects = encode_rows(rows)
+    return batch.score(tables),valid,rejects
+
+
+#set the default number of rows sent to a worker process at a time
+PartitionSize = 100000
+
+#modifier tables held by each worker process, set once when the worker starts
+_workerTables = None
+
+def _init_worker(tables):
+    global _workerTables
+    _workerTables = tables
+
+def _run_with_tables(func,item):
+    return func(item,_workerTables)
+
+#create function to run a scoring function over many items in a process pool
+def parallel_map(func,items,workers=None,tables=None,inflight=None):
+    """
+    Yields func(item,tables) for each item, in the same order as items, running the calls in a pool of worker processes
+    The tables are sent to each worker once when it starts rather than with every item
+
+    :param func: A module level function taking (item,tables)
+    :param items: Iterable of items, read lazily
+    :param workers: Number of worker processes. Default is the number of cpus. 1 runs in the current process
+    :param tables: ModifierTables to score with. Default is IndLoss.Tables
+    :param inflight: Most items queued at once, to bound memory. Default is twice the number of workers
+    """
+    workers = workers or os.cpu_count() or 1
+    tables = IndLoss.Tables if tables is None else tables
+    if workers==1:
+        for item in items:
+            yield func(item,tables)
+        return
+    inflight = inflight or 2*workers
+    with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(tables,)) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(_run_with_tables,func,item))
+            if len(pending)>=inflight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _score_columns(columns,tables):
+    return AssessmentBatch(*IndLoss.encode_columns(*columns)).score(tables)
+
+def _score_batch(batch,tables):
+    return batch.score(tables)
+
+#create function to score a caseload across several processes
+def score_parallel(data,workers=None,chunksize=PartitionSize,tables=None):
+    """
+    Scores a caseload in partitions of chunksize rows across a pool of worker processes
+    Returns a new scored AssessmentBatch with rows in the same order as the input; an AssessmentBatch given is not changed
+
+    Each partition is pickled to a worker and its result pickled back, work done in this process of about 0.5us a row,
+    against about 1.2us a row to validate and score text columns in a worker. With enough cpus text input is therefore
+    scored at most about 2-2.5x faster than with workers=1, and only once partitions are large enough (tens of thousands of rows)
+    for the pool start up to be repaid. An encoded AssessmentBatch scores in about 0.3us a row, less than the cost of sending it,
+    so is best scored with workers=1. On a single cpu any workers above 1 is slower
+    Caseloads held in files are better scored with ScoreCSV.score_csv or Snapshot.score_snapshot, whose workers read their own
+    partitions, leaving this process about 0.3us a row of work (writing results) against about 8us a row done in the workers
+
+    :param data: An AssessmentBatch, a dataframe with the FrameColumns, or a list of (PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ) tuples
+    :param workers: Number of worker processes. Default is the number of cpus
+    :param chunksize: Number of rows in each partition
+    :param tables: ModifierTables to score with. Default is IndLoss.Tables
+
+    Error handling:
+        Invalid entries raise the same value errors as AssessRev
+    """
+    if isinstance(data,AssessmentBatch):
+        #index with positions rather than slices, so each partition is a copy and scoring never writes to the caller's batch
+        parts = (data[np.arange(i,min(i+chunksize,len(data)))] for i in range(0,len(data),chunksize))
+        func = _score_batch
+    else:
+        if hasattr(data,"columns"):
+            missing = [col for col in FrameColumns if col not in data.columns]
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(missing)}")
+            columns = [data[col].to_numpy() for col in FrameColumns]
+        else:
+            data = list(data)
+            columns = [np.asarray(col,dtype=object) for col in zip(*data)] if data else [np.empty(0,dtype=object)]*len(FrameColumns)
+        parts = ([col[i:i+chunksize] for col in columns] for i in range(0,len(columns[0]),chunksize))
+        func = _score_columns
+    scored = list(parallel_map(func,parts,workers,tables))
+    if not scored:
+        return AssessmentBatch.from_records([])
+    return AssessmentBatch.concat(scored)
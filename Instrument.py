@@ -0,0 +1,242 @@
+"""
+Opt-in timing counters for the IndLoss scoring code
+
+Usage:
+    import Instrument
+    Instrument.enable()
+    ... score records ...
+    print(Instrument.dump_json())
+    Instrument.disable()
+
+While disabled the scoring functions are the original, unwrapped functions, so there is no overhead.
+enable() replaces each function in Targets with a wrapper that records call counts, timings and rejections
+(value errors raised, or for stages in Reports the rows in the error report returned), and disable() puts the originals back.
+Timings include any instrumented functions called inside, e.g. score_frame includes encode_columns.
+Counters are kept per process, so partitions scored in score_parallel worker processes are not counted.
+"""
+#import key libraries
+import collections
+import contextlib
+import functools
+import importlib
+import json
+import math
+import threading
+import time
+
+#set the functions to instrument as (module, attribute path, stage name, function returning rows handled or None)
+Targets = [("IndLoss","AssessRev.__init__","construct",None),
+           ("IndLoss","AssessRev.update_AgeFac","update_AgeFac",None),
+           ("IndLoss","AssessRev.update_ServFac","update_ServFac",None),
+           ("IndLoss","AssessRev.update_ServChange","update_ServChange",None),
+           ("IndLoss","AssessRev.update_StatusFac","update_StatusFac",None),
+           ("IndLoss","AssessRev.update_Rag","update_Rag",None),
+           ("IndLoss","score","score",None),
+           ("IndLoss","parse_date","parse_date",None),
+           ("IndLoss","parse_dates","parse_dates",lambda args,kwargs: len(args[0])),
+           ("IndLoss","validate_columns","validate_columns",lambda args,kwargs: len(args[0])),
+           ("IndLoss","encode_columns","encode_columns",lambda args,kwargs: len(args[0])),
+           ("IndLoss","score_codes","score_codes",lambda args,kwargs: len(args[0])),
+           ("IndLoss","score_frame","score_frame",lambda args,kwargs: len(args[0])),
+           ("IndLossBatch","AssessmentBatch.score","batch_score",lambda args,kwargs: len(args[0])),
+           ("IndLossBatch","score_parallel","score_parallel",lambda args,kwargs: len(args[0])),
+           ("IndLossBatch","score_rows","score_rows",lambda args,kwargs: len(args[0]))]
+
+#set the stages that report rejected rows in an error report rather than raising, with a function returning the report
+#from the result. The report is a dictionary of Row, Field and Reason arrays, as returned by IndLoss.validate_columns
+Reports = {"validate_columns":lambda result: result[2]}
+
+#set the number of recent call times kept per stage for percentiles, and the number of distinct rejection reasons counted
+SampleSize = 10000
+MaxReasons = 100
+OtherReasons = "Other reasons"
+
+_lock = threading.Lock()
+_stats = {}
+_originals = {}
+
+
+#create class to hold the counters of one stage
+class StageStats:
+    """
+    Counters for one instrumented stage
+
+    Attributes:
+        calls: Number of calls
+        rejected: Number of calls that raised a value error, plus rows rejected in error reports
+        rows: Number of rows handled by batch stages
+        fields: Count of invalid entries in error reports by field
+        total: Total seconds across all calls
+        samples: Seconds taken by the most recent SampleSize calls
+        reasons: Count of rejections by error message, up to MaxReasons distinct messages with the rest counted as OtherReasons
+    """
+    __slots__ = ("calls","rejected","rows","total","samples","reasons","fields")
+
+    def __init__(self):
+        self.calls = 0
+        self.rejected = 0
+        self.rows = 0
+        self.total = 0.0
+        self.samples = collections.deque(maxlen=SampleSize)
+        self.reasons = collections.Counter()
+        self.fields = collections.Counter()
+
+    def to_dict(self):
+        """
+        Returns the counters with mean and percentile latencies in microseconds
+        """
+        ordered = sorted(self.samples)
+        def pct(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered)-1,max(0,math.ceil(p/100*len(ordered))-1))]*1e6
+        out = {"calls":self.calls,"rejected":self.rejected,"total_seconds":self.total,
+               "mean_us":self.total/self.calls*1e6 if self.calls else 0.0,
+               "p50_us":pct(50),"p90_us":pct(90),"p99_us":pct(99),"max_us":ordered[-1]*1e6 if ordered else 0.0}
+        if self.rows:
+            out["rows"] = self.rows
+            out["rows_per_sec"] = self.rows/self.total if self.total else 0.0
+        if self.reasons:
+            out["reasons"] = dict(self.reasons)
+        if self.fields:
+            out["fields"] = dict(self.fields)
+        return out
+
+#create functions to record calls
+def _add_reason(stats,reason,count=1):
+    #messages include the entry rejected, so cap the distinct messages kept in long running processes
+    if reason not in stats.reasons and len(stats.reasons)>=MaxReasons:
+        reason = OtherReasons
+    stats.reasons[reason] += count
+
+def record(stage,seconds,rows=None,error=None,report=None):
+    """
+    Adds one call to the counters of a stage
+
+    :param stage: Name of the stage
+    :param seconds: Time taken by the call
+    :param rows: Optional number of rows handled
+    :param error: Optional error raised, counted as a rejection
+    :param report: Optional error report of the rows rejected by the call, a dictionary of Row, Field and Reason arrays.
+                   Each rejected row is counted as a rejection, with its invalid entries counted by field and reason
+    """
+    if report is not None and len(report["Row"]):
+        rejected = len(set(report["Row"].tolist()))
+        fields = collections.Counter(report["Field"].tolist())
+        reasons = collections.Counter(report["Reason"].tolist())
+    else:
+        rejected,fields,reasons = 0,{},{}
+    with _lock:
+        stats = _stats.get(stage)
+        if stats is None:
+            stats = _stats[stage] = StageStats()
+        stats.calls += 1
+        stats.total += seconds
+        stats.samples.append(seconds)
+        if rows:
+            stats.rows += rows
+        if error is not None:
+            stats.rejected += 1
+            _add_reason(stats,str(error))
+        stats.rejected += rejected
+        stats.fields.update(fields)
+        for reason,count in reasons.items():
+            _add_reason(stats,reason,count)
+
+@contextlib.contextmanager
+def stage(name,rows=None):
+    """
+    Context manager that records the time taken by its block as a call to stage name, only while enabled
+    A value error raised inside the block is counted as a rejection and raised again
+    """
+    if not _originals:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except ValueError as err:
+        record(name,time.perf_counter()-start,rows,err)
+        raise
+    record(name,time.perf_counter()-start,rows)
+
+def _wrap(func,name,size,report=None):
+    @functools.wraps(func)
+    def wrapper(*args,**kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args,**kwargs)
+        except ValueError as err:
+            record(name,time.perf_counter()-start,None,err)
+            raise
+        elapsed = time.perf_counter()-start
+        rows = None
+        if size is not None:
+            try:
+                rows = size(args,kwargs)
+            except TypeError:
+                pass
+        record(name,elapsed,rows,report=report(result) if report is not None else None)
+        return result
+    return wrapper
+
+#create functions to switch instrumentation on and off
+def enable():
+    """
+    Wraps every function in Targets with timing counters. Modules that cannot be imported are skipped
+    """
+    with _lock:
+        if _originals:
+            return
+        for moduleName,path,name,size in Targets:
+            try:
+                module = importlib.import_module(moduleName)
+            except ImportError:
+                continue
+            *parents,attr = path.split(".")
+            owner = module
+            for parent in parents:
+                owner = getattr(owner,parent)
+            func = owner.__dict__[attr] if isinstance(owner,type) else getattr(owner,attr)
+            _originals[(owner,attr)] = func
+            setattr(owner,attr,_wrap(func,name,size,Reports.get(name)))
+
+def disable():
+    """
+    Restores the original, unwrapped functions. Counters are kept until reset
+    """
+    with _lock:
+        for (owner,attr),func in _originals.items():
+            setattr(owner,attr,func)
+        _originals.clear()
+
+def is_enabled():
+    """
+    Returns True while instrumentation is enabled
+    """
+    return bool(_originals)
+
+#create functions to read and clear the counters
+def snapshot():
+    """
+    Returns a dictionary of the counters of every stage called so far, keyed by stage name
+    """
+    with _lock:
+        return {name:stats.to_dict() for name,stats in sorted(_stats.items())}
+
+def reset():
+    """
+    Clears all counters
+    """
+    with _lock:
+        _stats.clear()
+
+def dump_json(path=None):
+    """
+    Returns the snapshot as a json string, also writing it to path if given
+    """
+    text = json.dumps({"enabled":is_enabled(),"stages":snapshot()},indent=2)
+    if path:
+        with open(path,"w",encoding="utf-8") as f:
+            f.write(text)
+    return text
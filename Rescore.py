@@ -0,0 +1,110 @@
+#import key libraries
+import json
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ModifierTables
+from IndLossBatch import AssessmentBatch,BatchColumns
+
+
+#create functions to save and load scored batches with the tables used to score them
+def save_scores(path,batch,tables=None):
+    """
+    Saves a scored batch to a numpy .npz file, with the modifier lists and version it was scored with
+
+    :param path: Path of the file to write. numpy adds .npz if not already present
+    :param batch: Scored AssessmentBatch
+    :param tables: ModifierTables the batch was scored with. Default is IndLoss.Tables
+    """
+    tables = IndLoss.Tables if tables is None else tables
+    cols = {col:getattr(batch,col) for col in BatchColumns}
+    cols["PersonId"] = cols["PersonId"].astype(str)
+    np.savez(path,Version=np.array(tables.Version),Tables=np.array(json.dumps(tables.to_dict())),**cols)
+
+def load_scores(path):
+    """
+    Loads a file written by save_scores
+    Returns (AssessmentBatch, ModifierTables the batch was scored with)
+
+    Error handling:
+        A file whose version does not match its modifier lists generates a value error
+    """
+    with np.load(path) as data:
+        tables = ModifierTables(**json.loads(str(data["Tables"])))
+        if str(data["Version"])!=tables.Version:
+            raise ValueError(f"{path} version does not match its modifier tables.")
+        cols = {col:data[col] for col in BatchColumns}
+    cols["PersonId"] = cols["PersonId"].astype(object)
+    return AssessmentBatch(**cols),tables
+
+#create function to update a scored batch for new modifier tables
+def rescore(batch,oldTables,newTables):
+    """
+    Updates a batch scored with oldTables so it matches scoring with newTables
+    Only the factors whose lists changed are recalculated, and only for rows using a changed entry
+    The batch is updated in place
+
+    :param batch: AssessmentBatch scored with oldTables
+    :param oldTables: ModifierTables the batch was scored with
+    :param newTables: ModifierTables to rescore with
+    Returns a dictionary of the number of rows updated for each factor and in total, and the new version
+    """
+    n = len(batch)
+    changed = np.zeros(n,dtype=bool)
+    report = {"Version":newTables.Version}
+    #service factor depends on NewServ only
+    servChanged = newTables.ServModify!=oldTables.ServModify
+    rows = servChanged[batch.NewServ] if servChanged.any() else np.zeros(n,dtype=bool)
+    batch.ServFac[rows] = newTables.ServModify[batch.NewServ[rows]]
+    report["ServFac"] = int(rows.sum())
+    changed |= rows
+    #status factor depends on Status only
+    statusChanged = newTables.StatusModify!=oldTables.StatusModify
+    rows = statusChanged[batch.Status] if statusChanged.any() else np.zeros(n,dtype=bool)
+    batch.StatusFac[rows] = newTables.StatusModify[batch.Status[rows]]
+    report["StatusFac"] = int(rows.sum())
+    changed |= rows
+    #change factor depends on the current and new service pair, through intensity and the change bands
+    pairChanged = (newTables.ChangeBand!=oldTables.ChangeBand)|(newTables.ChangeModify[newTables.ChangeBand]!=oldTables.ChangeModify[oldTables.ChangeBand])
+    rows = pairChanged[batch.CurrentServ,batch.NewServ] if pairChanged.any() else np.zeros(n,dtype=bool)
+    batch.ChangeBand[rows] = newTables.ChangeBand[batch.CurrentServ[rows],batch.NewServ[rows]]
+    batch.ServChange[rows] = newTables.ChangeModify[batch.ChangeBand[rows]]
+    report["ServChange"] = int(rows.sum())
+    changed |= rows
+    #age factor needs ages recalculating only if the age bands moved
+    if not np.array_equal(newTables.AgeBreaks,oldTables.AgeBreaks):
+        ageBand = np.searchsorted(newTables.AgeBreaks,IndLoss.age_years_array(batch.BirthDate,batch.ContactDate),side="right").astype(np.int8)
+        ageFac = newTables.AgeModify[ageBand]
+        rows = (ageBand!=batch.AgeBand)|(ageFac!=batch.AgeFac)
+        batch.AgeBand[rows] = ageBand[rows]
+        batch.AgeFac[rows] = ageFac[rows]
+    else:
+        ageChanged = newTables.AgeModify!=oldTables.AgeModify
+        rows = ageChanged[batch.AgeBand] if ageChanged.any() else np.zeros(n,dtype=bool)
+        batch.AgeFac[rows] = newTables.AgeModify[batch.AgeBand[rows]]
+    report["AgeFac"] = int(rows.sum())
+    changed |= rows
+    #multiply in the same order as update_Rag so the results match a full rescore
+    batch.Rag[changed] = 1.0*batch.ServFac[changed]*batch.AgeFac[changed]*batch.ServChange[changed]*batch.StatusFac[changed]
+    report["Rag"] = int(changed.sum())
+    return report
+
+def rescore_file(path,newTables,outPath=None):
+    """
+    Loads a file written by save_scores, rescores it for newTables and saves it with the new version
+    Returns the report from rescore, or a report of no rows updated if the file already has the new version
+
+    :param path: Path of the scored file
+    :param newTables: ModifierTables to rescore with
+    :param outPath: Path to save to. Default is to overwrite path
+    """
+    batch,oldTables = load_scores(path)
+    if oldTables.Version==newTables.Version:
+        report = {"Version":newTables.Version,"ServFac":0,"StatusFac":0,"ServChange":0,"AgeFac":0,"Rag":0}
+        if outPath is None:
+            return report
+    else:
+        report = rescore(batch,oldTables,newTables)
+    save_scores(path if outPath is None else outPath,batch,newTables)
+    return report
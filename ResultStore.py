@@ -0,0 +1,158 @@
+#import key libraries
+import datetime as dt
+import sqlite3
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ServType,StatusRoute
+
+#set the default database file and the stored columns
+StorePath = "rag_results.db"
+StoreColumns = ["PersonId","ContactDate","BirthDate","Status","CurrentServ","NewServ","AgeFac","ServFac","ServChange","StatusFac","Rag","RagCategory","TablesVersion","ScoredAt"]
+
+Schema = """
+CREATE TABLE IF NOT EXISTS results (
+    Id INTEGER PRIMARY KEY,
+    PersonId TEXT NOT NULL,
+    ContactDate TEXT NOT NULL,
+    BirthDate TEXT NOT NULL,
+    Status TEXT NOT NULL,
+    CurrentServ TEXT NOT NULL,
+    NewServ TEXT NOT NULL,
+    AgeFac REAL NOT NULL,
+    ServFac REAL NOT NULL,
+    ServChange REAL NOT NULL,
+    StatusFac REAL NOT NULL,
+    Rag REAL NOT NULL,
+    RagCategory TEXT NOT NULL,
+    TablesVersion TEXT NOT NULL,
+    ScoredAt TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_contact ON results (ContactDate);
+"""
+#one result per scored input and tables version, so storing a caseload again replaces its earlier results while
+#a person's second contact on the same day is kept. The earlier key on PersonId, ContactDate and TablesVersion is replaced
+KeySchema = """
+DROP INDEX IF EXISTS results_key;
+DELETE FROM results WHERE Id NOT IN (SELECT MAX(Id) FROM results GROUP BY PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ,TablesVersion);
+CREATE UNIQUE INDEX results_input ON results (PersonId, ContactDate, BirthDate, Status, CurrentServ, NewServ, TablesVersion);
+"""
+
+
+#create a class to hold scored results in sqlite
+class ResultStore:
+    """
+    A sqlite database of scored RAG results, indexed by PersonId and ContactDate
+    Each scored input (person, contact date, birth date, status and services) is held once for each tables version;
+    storing it again replaces the earlier result, while other contacts of the person on the same day are kept
+    Dates are stored as yyyy-mm-dd text so they sort and compare in date order
+
+    Attributes:
+        path: Path of the database file, or ":memory:"
+        conn: The sqlite3 connection
+
+    Methods:
+        add() - stores one scored AssessRev
+        add_batch() - stores every row of a scored AssessmentBatch in one transaction
+        add_rows() - stores rows of StoreColumns values in one transaction
+        person() - returns every result for a person in contact date order
+        latest() - returns the most recent result for a person scored with a tables version
+        between() - returns results with contact dates in a range
+        count() - returns the number of stored results
+        close() - closes the database
+
+    Can be used as a context manager, closing the database at the end of the block
+    """
+    def __init__(self,path=StorePath):
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        if self.path!=":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(Schema)
+        if not self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='results_input'").fetchone():
+            #databases made before the key was added keep only their latest copy of each result
+            with self.conn:
+                self.conn.executescript(KeySchema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self.conn.close()
+
+    #create methods to store results
+    def add_rows(self,rows):
+        """
+        Stores an iterable of rows, each holding the StoreColumns values in order, in a single transaction
+        A row with the same scored input and TablesVersion as a stored result replaces it
+        Returns the number of rows stored
+        """
+        with self.conn:
+            cur = self.conn.executemany(f"INSERT OR REPLACE INTO results ({','.join(StoreColumns)}) VALUES ({','.join('?'*len(StoreColumns))})",rows)
+        return cur.rowcount
+
+    def add(self,contact,tables=None):
+        """
+        Stores one AssessRev after its update methods have been run
+        Returns the number of rows stored
+        """
+        tables = IndLoss.Tables if tables is None else tables
+        return self.add_rows([(contact.PersonId,contact.ContactDate.isoformat(),contact.BirthDate.isoformat(),contact.Status,contact.CurrentServ,contact.NewServ,
+                               float(contact.AgeFac),float(contact.ServFac),float(contact.ServChange),float(contact.StatusFac),float(contact.Rag),
+                               IndLoss.rag_category(contact.Rag),tables.Version,dt.datetime.now().isoformat(timespec="seconds"))])
+
+    def add_batch(self,batch,tables=None):
+        """
+        Stores every row of a scored AssessmentBatch in a single transaction
+        Returns the number of rows stored
+        """
+        tables = IndLoss.Tables if tables is None else tables
+        n = len(batch)
+        columns = [batch.PersonId.tolist(),batch.ContactDate.astype(str).tolist(),batch.BirthDate.astype(str).tolist(),
+                   [StatusRoute[c] for c in batch.Status.tolist()],[ServType[c] for c in batch.CurrentServ.tolist()],[ServType[c] for c in batch.NewServ.tolist()],
+                   batch.AgeFac.tolist(),batch.ServFac.tolist(),batch.ServChange.tolist(),batch.StatusFac.tolist(),batch.Rag.tolist(),
+                   IndLoss.rag_categories(batch.Rag).tolist(),[tables.Version]*n,[dt.datetime.now().isoformat(timespec="seconds")]*n]
+        return self.add_rows(zip(*columns))
+
+    #create methods to look up results
+    def _select(self,where,params):
+        rows = self.conn.execute(f"SELECT {','.join(StoreColumns)} FROM results WHERE {where}",params).fetchall()
+        return [dict(row) for row in rows]
+
+    def person(self,PersonId):
+        """
+        Returns a list of every result for a person as dictionaries, in contact date order
+        """
+        return self._select("PersonId=? ORDER BY ContactDate,Id",(PersonId,))
+
+    def latest(self,PersonId,tables=None):
+        """
+        Returns the most recent result for a person as a dictionary, or None if there are none
+        Of several contacts on the latest date the last stored is returned
+
+        :param tables: ModifierTables whose results are searched. Default is IndLoss.Tables
+        """
+        tables = IndLoss.Tables if tables is None else tables
+        rows = self._select("PersonId=? AND TablesVersion=? ORDER BY ContactDate DESC,Id DESC LIMIT 1",(PersonId,tables.Version))
+        return rows[0] if rows else None
+
+    def between(self,start,end):
+        """
+        Returns a list of results with contact dates from start to end inclusive, in contact date order
+        start and end can be dates or any entry accepted by IndLoss.parse_date
+        """
+        return self._select("ContactDate BETWEEN ? AND ? ORDER BY ContactDate,Id",(IndLoss.parse_date(start).isoformat(),IndLoss.parse_date(end).isoformat()))
+
+    def count(self):
+        """
+        Returns the number of stored results
+        """
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
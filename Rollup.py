@@ -0,0 +1,260 @@
+#import key libraries
+import json
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ServType,StatusRoute,RagCategories
+
+#set the dimensions of the rollup, in axis order
+Dimensions = ["Month","Status","CurrentServ","NewServ","AgeBand"]
+
+#set the default first and last contact dates held; the month axis is dense, so a mistyped year would otherwise
+#allocate every month back to it
+WindowStart = "01/01/2000"
+WindowEnd = "31/12/2099"
+
+
+#create function to name the age bands from the band breaks
+def age_band_labels(tables=None):
+    """
+    Returns a label for each age band of the modifier tables, e.g. ["<66","66-75","76-85","86+"]
+    """
+    tables = IndLoss.Tables if tables is None else tables
+    breaks = tables._lists["AgeBreaks"]
+    return [f"<{breaks[0]}"]+[f"{lo}-{hi-1}" for lo,hi in zip(breaks,breaks[1:])]+[f"{breaks[-1]}+"]
+
+#create a class to hold pre-aggregated rag counts and sums
+class RagRollup:
+    """
+    Red/amber/green counts and rag sums for every combination of contact month, Status, CurrentServ, NewServ and age band,
+    held as two numpy arrays so reports can be read without rescoring or grouping the underlying rows
+
+    Attributes:
+        Counts: int64 array of shape (months, statuses, services, services, age bands, 3), the last axis Green, Amber, Red
+        Sums: float64 array of the rag totals, shaped as Counts without the last axis
+        FirstMonth: datetime64[M] of the first month held, or None while empty
+        AgeBands: Labels of the age bands, from the modifier tables
+        Version: Version of the modifier tables the rolled up rows were scored with
+        Window: datetime64[M] array of the first and last months that can be held
+        Outside: Number of rows left out as their contact month is outside the window
+
+    Methods:
+        add() - adds the rows of a scored AssessmentBatch
+        subtract() - removes the rows of a scored AssessmentBatch added before
+        months() - returns the months held
+        query() - returns the counts, mean rag and rows for a selection
+        to_frame() - returns a dataframe of counts and mean rag grouped by chosen dimensions
+        save() - saves the rollup to a .npz file
+        load() - loads a rollup saved by save
+
+    Selections are given as keyword arguments for Status, CurrentServ, NewServ and AgeBand, each a single entry or a list of
+    entries (text or code), plus start and end dates for the months. Dimensions not given are totalled over
+
+    Rows with contact months outside the window are left out, rather than growing the month axis to reach them, and
+    returned by add and subtract so they can be reported
+
+    Error handling:
+        Entries that are not in StatusRoute, ServType or the age band labels generate a value error
+        Adding or removing rows scored with other modifier tables than the rollup's generates a value error
+        A window that ends before it starts generates a value error
+    """
+    def __init__(self,tables=None,start=WindowStart,end=WindowEnd):
+        """
+        Docstring for __init__
+
+        :param self: Defines instance of class
+        :param tables: ModifierTables the rows are scored with. Default is IndLoss.Tables
+        :param start: First contact date that can be held; its whole month is included. Default is WindowStart
+        :param end: Last contact date that can be held; its whole month is included. Default is WindowEnd
+        """
+        tables = IndLoss.Tables if tables is None else tables
+        self.Window = np.array([IndLoss.parse_date(start),IndLoss.parse_date(end)],dtype="datetime64[M]")
+        if self.Window[1]<self.Window[0]:
+            raise ValueError(f"The rollup window ends ({end}) before it starts ({start}).")
+        self.Outside = 0
+        self.AgeBands = age_band_labels(tables)
+        self.Version = tables.Version
+        self.FirstMonth = None
+        self.Counts = np.zeros((0,len(StatusRoute),len(ServType),len(ServType),len(self.AgeBands),len(RagCategories)),dtype=np.int64)
+        self.Sums = np.zeros(self.Counts.shape[:-1],dtype=np.float64)
+
+    #create methods to update the rollup
+    def _grow(self,first,last):
+        #widen the month axis so it covers first to last
+        if self.FirstMonth is None:
+            start = first
+            end = last
+        else:
+            current = self.FirstMonth.astype(np.int64)
+            start = min(first,current)
+            end = max(last,current+len(self.Counts)-1)
+            if start==current and end==current+len(self.Counts)-1:
+                return
+        before = 0 if self.FirstMonth is None else int(self.FirstMonth.astype(np.int64)-start)
+        after = end-start+1-before-len(self.Counts)
+        self.Counts = np.pad(self.Counts,[(before,after)]+[(0,0)]*(self.Counts.ndim-1))
+        self.Sums = np.pad(self.Sums,[(before,after)]+[(0,0)]*(self.Sums.ndim-1))
+        self.FirstMonth = np.datetime64(int(start),"M")
+
+    def _update(self,batch,sign,version):
+        if version is not None and version!=self.Version:
+            raise ValueError(f"Rows scored with tables {version} cannot be combined with a rollup of tables {self.Version}.")
+        if len(batch)==0:
+            return np.zeros(0,dtype=np.intp)
+        months = batch.ContactDate.astype("datetime64[M]").astype(np.int64)
+        window = self.Window.astype(np.int64)
+        inside = (months>=window[0])&(months<=window[1])
+        outside = np.flatnonzero(~inside)
+        self.Outside += sign*len(outside)
+        if len(outside):
+            batch = batch.filter(inside)
+            months = months[inside]
+            if len(batch)==0:
+                return outside
+        self._grow(int(months.min()),int(months.max()))
+        cell = np.ravel_multi_index((months-self.FirstMonth.astype(np.int64),batch.Status,batch.CurrentServ,batch.NewServ,batch.AgeBand),self.Sums.shape)
+        cat = (batch.Rag>1).astype(np.int64)+(batch.Rag>3)
+        #count only across the months the batch touches, which are one block of cells as Month is the first axis
+        lo = int(cell.min())
+        hi = int(cell.max())+1
+        counts = self.Counts.reshape(-1)
+        counts[lo*len(RagCategories):hi*len(RagCategories)] += sign*np.bincount((cell-lo)*len(RagCategories)+cat,minlength=(hi-lo)*len(RagCategories))
+        sums = self.Sums.reshape(-1)
+        sums[lo:hi] += sign*np.bincount(cell-lo,weights=batch.Rag,minlength=hi-lo)
+        return outside
+
+    def add(self,batch,version=None):
+        """
+        Adds the rows of a batch scored with the rollup's modifier tables
+        Returns the positions in the batch of rows left out as their contact month is outside the window
+
+        :param version: Version of the tables the batch was scored with, checked against the rollup's if given
+        """
+        return self._update(batch,1,version)
+
+    def subtract(self,batch,version=None):
+        """
+        Removes the rows of a batch added before, e.g. the old scores of rows about to be rescored
+        Returns the positions in the batch of rows outside the window, which were never added
+
+        :param version: Version of the tables the batch was scored with, checked against the rollup's if given
+        """
+        return self._update(batch,-1,version)
+
+    def months(self):
+        """
+        Returns a datetime64[M] array of the months held, in order
+        """
+        if self.FirstMonth is None:
+            return np.array([],dtype="datetime64[M]")
+        return self.FirstMonth+np.arange(len(self.Counts))
+
+    #create methods to read the rollup
+    def _index(self,dim,value):
+        #convert a selection for one dimension to a list of positions along its axis
+        if dim=="Month":
+            start,end = value
+            months = self.months()
+            lo = 0 if start is None else int(np.searchsorted(months,np.datetime64(IndLoss.parse_date(start),"M")))
+            hi = len(months) if end is None else int(np.searchsorted(months,np.datetime64(IndLoss.parse_date(end),"M"),side="right"))
+            return np.arange(lo,hi)
+        labels = {"Status":StatusRoute,"CurrentServ":ServType,"NewServ":ServType,"AgeBand":self.AgeBands}[dim]
+        out = []
+        for val in (value if isinstance(value,(list,tuple)) else [value]):
+            if isinstance(val,(int,np.integer)) and 0<=val<len(labels):
+                out.append(int(val))
+            elif val in labels:
+                out.append(labels.index(val))
+            else:
+                raise ValueError(f"{val} is not a valid {dim} entry.")
+        return np.array(out,dtype=np.intp)
+
+    def _select(self,by=(),start=None,end=None,**filters):
+        #returns the counts and sums totalled over every dimension not in by, with the labels along each by axis
+        unknown = [dim for dim in filters if dim not in Dimensions[1:]]+[dim for dim in by if dim not in Dimensions]
+        if unknown:
+            raise ValueError(f"{', '.join(unknown)} is not a rollup dimension.")
+        counts = self.Counts
+        sums = self.Sums
+        labels = {"Month":np.array([str(m) for m in self.months()],dtype=object),"Status":np.array(StatusRoute,dtype=object),
+                  "CurrentServ":np.array(ServType,dtype=object),"NewServ":np.array(ServType,dtype=object),"AgeBand":np.array(self.AgeBands,dtype=object)}
+        for axis,dim in enumerate(Dimensions):
+            if dim=="Month" and (start is not None or end is not None):
+                idx = self._index(dim,(start,end))
+            elif dim in filters and filters[dim] is not None:
+                idx = self._index(dim,filters[dim])
+            else:
+                continue
+            counts = np.take(counts,idx,axis=axis)
+            sums = np.take(sums,idx,axis=axis)
+            labels[dim] = labels[dim][idx]
+        keep = sorted(Dimensions.index(dim) for dim in by)
+        drop = tuple(axis for axis in range(len(Dimensions)) if axis not in keep)
+        counts = counts.sum(axis=drop)
+        sums = sums.sum(axis=drop)
+        #put the kept axes in the order they were asked for
+        order = [keep.index(Dimensions.index(dim)) for dim in by]
+        return counts.transpose(order+[len(order)]),sums.transpose(order),[labels[dim] for dim in by]
+
+    def query(self,start=None,end=None,**filters):
+        """
+        Returns a dictionary of the number of rows, rows per category and mean rag for a selection
+
+        :param start: Optional first contact date; its whole month is included
+        :param end: Optional last contact date; its whole month is included
+        :param filters: Optional Status, CurrentServ, NewServ and AgeBand entries, e.g. Status="Community"
+        """
+        counts,total,labels = self._select((),start,end,**filters)
+        out = {"Rows":int(counts.sum())}
+        out.update({cat:int(n) for cat,n in zip(RagCategories,counts)})
+        out["MeanRag"] = float(total)/out["Rows"] if out["Rows"] else float("nan")
+        return out
+
+    def to_frame(self,by=("Status",),start=None,end=None,**filters):
+        """
+        Returns a dataframe with a row for each combination of the by dimensions holding any rows,
+        with columns for the dimensions, Rows, Green, Amber, Red and MeanRag
+
+        :param by: Dimensions to group by, from Dimensions
+        :param start, end, filters: Selection as in query
+        """
+        import pandas as pd
+        by = list(by)
+        counts,sums,labels = self._select(by,start,end,**filters)
+        cells = counts.reshape(-1,len(RagCategories))
+        rows = cells.sum(axis=1)
+        keep = rows>0
+        data = {dim:labels[i][pos] for i,(dim,pos) in enumerate(zip(by,np.unravel_index(np.flatnonzero(keep),counts.shape[:-1])))}
+        data["Rows"] = rows[keep]
+        for i,cat in enumerate(RagCategories):
+            data[cat] = cells[keep,i]
+        data["MeanRag"] = sums.reshape(-1)[keep]/rows[keep]
+        return pd.DataFrame(data)
+
+    #create methods to save and load the rollup
+    def save(self,path):
+        """
+        Saves the rollup to a numpy .npz file. numpy adds .npz if not already present
+        """
+        meta = {"AgeBands":self.AgeBands,"Version":self.Version,"FirstMonth":None if self.FirstMonth is None else str(self.FirstMonth),
+                "Window":[str(m) for m in self.Window],"Outside":self.Outside}
+        np.savez(path,Meta=np.array(json.dumps(meta)),Counts=self.Counts,Sums=self.Sums)
+
+    @classmethod
+    def load(cls,path):
+        """
+        Returns a rollup saved by save
+        """
+        rollup = cls.__new__(cls)
+        with np.load(path) as data:
+            meta = json.loads(str(data["Meta"]))
+            rollup.Counts = data["Counts"]
+            rollup.Sums = data["Sums"]
+        rollup.AgeBands = meta["AgeBands"]
+        rollup.Version = meta["Version"]
+        rollup.FirstMonth = None if meta["FirstMonth"] is None else np.datetime64(meta["FirstMonth"],"M")
+        #rollups saved before the window was added hold the default window
+        rollup.Window = np.array(meta.get("Window",[IndLoss.parse_date(WindowStart),IndLoss.parse_date(WindowEnd)]),dtype="datetime64[M]")
+        rollup.Outside = meta.get("Outside",0)
+        return rollup
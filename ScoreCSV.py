@@ -0,0 +1,329 @@
+"""
+Command line tool to score a caseload csv file in fixed size chunks, streaming the results to a csv or jsonl file
+
+Usage:
+    python ScoreCSV.py caseload.csv scored.csv [--format csv|jsonl] [--chunk-size 50000] [--workers 4] [--rejects rejects.csv] [--store results.db] [--rollup rollup.npz] [--delta index.npz] [--worklist worklist.csv] [--top 20] [--group-by Status] [--metrics metrics.json]
+
+The input needs a header row including PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ.
+Only one chunk (or two per worker with --workers) is held in memory at a time, so memory use does not grow with the size of the input.
+With --workers each worker reads, scores and formats its own byte range of the input, so this process only writes the results.
+Rows that fail validation are counted and, if requested, written to a rejects file with the reason.
+"""
+#import key libraries
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+import Instrument
+from IndLoss import FrameColumns,ScoreColumns,ServType,StatusRoute
+import IndLossBatch
+from IndLossBatch import parallel_map
+from ResultStore import ResultStore
+from Rollup import RagRollup
+from Delta import DeltaIndex,DeltaTracker
+from Worklist import Worklist,GroupColumns
+
+#set the default chunk size and output columns
+ChunkSize = 50000
+OutputColumns = FrameColumns+ScoreColumns+["RagCategory"]
+RejectColumns = ["Row","Reason"]+FrameColumns
+
+
+#create function to read a csv in chunks of rows
+def _column_positions(header):
+    #position of each of the FrameColumns in a header row, and the fewest entries a row needs to hold them all
+    missing = [col for col in FrameColumns if col not in header]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    pos = [header.index(col) for col in FrameColumns]
+    return pos,max(pos)+1
+
+def _frame_rows(lines,pos,width):
+    #the FrameColumns entries of each csv line, padding short lines with blank entries
+    rows = []
+    for line in lines:
+        if len(line)<width:
+            line = line+[""]*(width-len(line))
+        rows.append([line[p] for p in pos])
+    return rows
+
+def read_chunks(f,chunksize=ChunkSize):
+    """
+    Yields (first row number, list of rows) from an open csv file, each row holding the FrameColumns in order
+    Row numbers count data rows from 1, not including the header
+
+    Error handling:
+        A header missing any of the FrameColumns generates a value error
+    """
+    reader = csv.reader(f)
+    header = next(reader,None)
+    if header is None:
+        return
+    pos,width = _column_positions(header)
+    start = 1
+    rows = []
+    for line in reader:
+        if len(line)<width:
+            line = line+[""]*(width-len(line))
+        rows.append([line[p] for p in pos])
+        if len(rows)>=chunksize:
+            yield start,rows
+            start += len(rows)
+            rows = []
+    if rows:
+        yield start,rows
+
+#create functions to split a csv into byte ranges that worker processes read and score themselves
+def csv_ranges(path,chunksize=ChunkSize,sample=1000):
+    """
+    Returns (header, list of (start, end) byte ranges) of a csv file, each range holding whole lines, about chunksize rows
+    The ranges are found by seeking ahead and reading on to the next line end, estimating the bytes in chunksize rows from
+    the first sample lines, so the file is not parsed here. Returns (None, []) for an empty file
+
+    Line breaks inside quoted entries are not allowed for, as a range could start inside one; the worker scoring a range
+    checks its quotes are balanced
+    """
+    with open(path,"rb") as f:
+        first = f.readline()
+        if not first:
+            return None,[]
+        header = next(csv.reader([first.decode("utf-8")]))
+        dataStart = f.tell()
+        lines = [f.readline() for _ in range(sample)]
+        size = os.fstat(f.fileno()).st_size
+        lines = [line for line in lines if line]
+        step = max(1,chunksize*sum(map(len,lines))//max(len(lines),1))
+        ranges = []
+        start = dataStart
+        while start<size:
+            f.seek(min(start+step,size)-1)
+            f.readline()
+            end = f.tell()
+            ranges.append((start,end))
+            start = end
+    return header,ranges
+
+def _score_range(part,tables):
+    #worker function: read, score and format the lines of one byte range, returning the text to write
+    path,start,end,pos,width,fmt = part
+    with open(path,"rb") as f:
+        f.seek(start)
+        text = f.read(end-start).decode("utf-8")
+    if text.count('"')%2:
+        raise ValueError(f"Bytes {start} to {end} of {path} split a quoted entry. Score files with line breaks inside entries with one worker.")
+    rows = _frame_rows(csv.reader(io.StringIO(text,newline="")),pos,width)
+    batch,valid,rejects = IndLossBatch.score_rows(rows,tables)
+    out = io.StringIO()
+    ResultWriter(out,fmt,header=False).write([rows[i] for i in valid] if rejects else rows,batch)
+    return len(rows),batch,valid,[(i,reason,rows[i]) for i,reason in rejects],out.getvalue()
+
+def batch_entries(batch,positions):
+    """
+    Returns the FrameColumns text of rows of a scored batch, with dates as dd/mm/yyyy
+    """
+    positions = np.asarray(positions,dtype=np.intp)
+    return [list(row) for row in zip(batch.PersonId[positions].tolist(),
+                                     [d.strftime("%d/%m/%Y") for d in batch.ContactDate[positions].tolist()],
+                                     [d.strftime("%d/%m/%Y") for d in batch.BirthDate[positions].tolist()],
+                                     [StatusRoute[c] for c in batch.Status[positions].tolist()],
+                                     [ServType[c] for c in batch.CurrentServ[positions].tolist()],
+                                     [ServType[c] for c in batch.NewServ[positions].tolist()])]
+
+#create class to write scored rows as csv or jsonl
+class ResultWriter:
+    """
+    Writes scored rows to an open text file as csv (with a header) or as one json object per line
+
+    Methods:
+        write() - writes the scored rows of one chunk
+    """
+    def __init__(self,f,fmt="csv",header=True):
+        if fmt not in ("csv","jsonl"):
+            raise ValueError(f"{fmt} is not a valid output format.")
+        self.f = f
+        self.fmt = fmt
+        if fmt=="csv":
+            self.writer = csv.writer(f,lineterminator="\n")
+            if header:
+                self.writer.writerow(OutputColumns)
+
+    def write(self,rows,batch):
+        """
+        Writes the input text of each row followed by its factors, rag and category from the scored batch
+        """
+        scores = [getattr(batch,col).tolist() for col in ScoreColumns]
+        cats = IndLoss.rag_categories(batch.Rag).tolist()
+        if self.fmt=="csv":
+            self.writer.writerows(row+list(vals) for row,vals in zip(rows,zip(*scores,cats)))
+        else:
+            for row,vals in zip(rows,zip(*scores,cats)):
+                self.f.write(json.dumps(dict(zip(OutputColumns,row+list(vals))))+"\n")
+
+#create function to run the full scoring of a file
+def score_csv(inPath,outPath,fmt=None,chunksize=ChunkSize,rejectsPath=None,progress=None,tables=None,workers=1,storePath=None,cancel=None,rollup=None,delta=None,worklist=None):
+    """
+    Scores a caseload csv chunk by chunk, writing results as they are produced
+
+    :param inPath: Path of the input csv
+    :param outPath: Path of the output file, or "-" for standard output
+    :param fmt: "csv" or "jsonl". Default is taken from the output file extension, csv otherwise
+    :param chunksize: Number of rows to score at a time
+    :param rejectsPath: Optional path of a csv to record rejected rows and the reason
+    :param progress: Optional function called with the running totals after each chunk
+    :param tables: ModifierTables to score with. Default is IndLoss.Tables
+    :param workers: Number of processes each reading and scoring byte ranges of about chunksize rows. Default is 1, scoring in the current process.
+                    Files with line breaks inside quoted entries need workers=1
+    :param storePath: Optional path of a ResultStore database to also save the results to
+    :param cancel: Optional threading.Event; once set, scoring stops after the current chunk
+    :param rollup: Optional Rollup.RagRollup of the same modifier tables to add the scored rows to. Rows with contact months
+                   outside its window are counted as outside_rollup and written to the rejects file
+    :param delta: Optional Delta.DeltaTracker; rows unchanged since its previous run are carried forward rather than scored.
+                  Chunks are then scored in the current process
+    :param worklist: Optional Worklist.Worklist to add the scored rows to
+    Returns a dictionary of rows read, scored and rejected, scored rows per rag category, elapsed seconds, rows per second
+    and whether scoring was cancelled
+    """
+    version = (IndLoss.Tables if tables is None else tables).Version
+    if rollup is not None and rollup.Version!=version:
+        raise ValueError(f"The rollup is of tables {rollup.Version}, not the tables scored with ({version}).")
+    if fmt is None:
+        fmt = "jsonl" if str(outPath).endswith((".jsonl",".json")) else "csv"
+    stats = {"rows":0,"scored":0,"rejected":0,"Green":0,"Amber":0,"Red":0,"seconds":0.0,"rows_per_sec":0.0,"cancelled":False}
+    startTime = time.perf_counter()
+    fin = open(inPath,newline="",encoding="utf-8")
+    fout = sys.stdout if outPath=="-" else open(outPath,"w",newline="",encoding="utf-8")
+    frej = open(rejectsPath,"w",newline="",encoding="utf-8") if rejectsPath else None
+    store = ResultStore(storePath) if storePath else None
+    try:
+        writer = ResultWriter(fout,fmt)
+        if frej:
+            rejWriter = csv.writer(frej,lineterminator="\n")
+            rejWriter.writerow(RejectColumns)
+        if workers!=1 and delta is None:
+            #workers read, score and format their own byte ranges of the file, sending back only the text to write
+            header,ranges = csv_ranges(inPath,chunksize)
+            parts = []
+            if header is not None:
+                pos,width = _column_positions(header)
+                parts = ((str(inPath),start,end,pos,width,fmt) for start,end in ranges)
+            results = parallel_map(_score_range,parts,workers,tables)
+        else:
+            def score_chunks():
+                for start,rows in read_chunks(fin,chunksize):
+                    if delta is not None:
+                        batch,valid,rejects = delta.score_rows(rows,tables)
+                    else:
+                        batch,valid,rejects = IndLossBatch.score_rows(rows,tables)
+                    yield len(rows),batch,valid,[(i,reason,rows[i]) for i,reason in rejects],[rows[i] for i in valid] if rejects else rows
+            results = score_chunks()
+        start = 1
+        for count,batch,valid,rejects,out in results:
+            with Instrument.stage("csv_write",len(valid)):
+                if isinstance(out,str):
+                    fout.write(out)
+                else:
+                    writer.write(out,batch)
+                if frej:
+                    rejWriter.writerows([start+i,reason]+row for i,reason,row in rejects)
+            if store:
+                with Instrument.stage("store_write",len(valid)):
+                    store.add_batch(batch,tables)
+            if rollup is not None:
+                #rows scored but left out of the rollup are reported with the rejects, and still written to the output
+                outside = rollup.add(batch,version)
+                stats["outside_rollup"] = stats.get("outside_rollup",0)+len(outside)
+                if frej and len(outside):
+                    rejWriter.writerows([start+valid[i],f"Contact Date {batch.ContactDate[i]} outside the rollup window, scored but not rolled up"]+row
+                                        for i,row in zip(outside.tolist(),batch_entries(batch,outside)))
+            if worklist is not None:
+                worklist.add_batch(batch)
+            start += count
+            stats["rows"] += count
+            stats["scored"] += len(valid)
+            stats["rejected"] += len(rejects)
+            green = int((batch.Rag<=1).sum())
+            red = int((batch.Rag>3).sum())
+            stats["Green"] += green
+            stats["Amber"] += len(valid)-green-red
+            stats["Red"] += red
+            if delta is not None:
+                stats["unchanged"] = delta.counts["unchanged"]
+            stats["seconds"] = time.perf_counter()-startTime
+            stats["rows_per_sec"] = stats["rows"]/stats["seconds"] if stats["seconds"] else 0.0
+            if progress:
+                progress(dict(stats))
+            if cancel is not None and cancel.is_set():
+                stats["cancelled"] = True
+                break
+    finally:
+        fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+        if frej:
+            frej.close()
+        if store:
+            store.close()
+    stats["seconds"] = time.perf_counter()-startTime
+    stats["rows_per_sec"] = stats["rows"]/stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def format_stats(stats):
+    """
+    Returns a one line summary of scoring totals
+    """
+    return f"{stats['rows']} rows read, {stats['scored']} scored, {stats['rejected']} rejected in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)"
+
+#create the command line entry point
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a caseload csv file in chunks and stream the RAG results to csv or jsonl")
+    parser.add_argument("input",help="caseload csv with PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ columns")
+    parser.add_argument("output",help="output file, or - for standard output")
+    parser.add_argument("--format",choices=["csv","jsonl"],help="output format. Default is taken from the output file extension")
+    parser.add_argument("--chunk-size",type=int,default=ChunkSize,help=f"rows scored at a time. Default is {ChunkSize}")
+    parser.add_argument("--workers",type=int,default=1,help="processes reading and scoring byte ranges of the input in parallel. Default is 1")
+    parser.add_argument("--rejects",help="csv file to record rejected rows and the reason")
+    parser.add_argument("--store",help="sqlite results database to also save the results to")
+    parser.add_argument("--rollup",help=".npz rag rollup of the results, rebuilt on each run so rows are never counted twice")
+    parser.add_argument("--delta",help=".npz index of the previous run; only new or changed rows are scored, and the index is updated for the next run")
+    parser.add_argument("--worklist",help="csv file to write the highest rag contacts of each group to")
+    parser.add_argument("--top",type=int,default=20,help="contacts kept in each group of the worklist. Default is 20")
+    parser.add_argument("--group-by",choices=list(GroupColumns),default="Status",help="column grouping the worklist. Default is Status")
+    parser.add_argument("--metrics",help="json file to write timing counters for each scoring stage")
+    parser.add_argument("--quiet",action="store_true",help="do not report progress after each chunk")
+    args = parser.parse_args(argv)
+    progress = None if args.quiet else (lambda stats: print(format_stats(stats),file=sys.stderr))
+    rollup = None
+    if args.rollup:
+        rollup = RagRollup()
+    worklist = Worklist(args.top,args.group_by) if args.worklist else None
+    delta = None
+    if args.delta:
+        delta = DeltaTracker(DeltaIndex.load(args.delta) if os.path.exists(args.delta) else None)
+    if args.metrics:
+        Instrument.enable()
+    try:
+        stats = score_csv(args.input,args.output,args.format,args.chunk_size,args.rejects,progress,workers=args.workers,storePath=args.store,rollup=rollup,delta=delta,worklist=worklist)
+    finally:
+        if args.metrics:
+            Instrument.dump_json(args.metrics)
+            Instrument.disable()
+    if rollup is not None:
+        rollup.save(args.rollup)
+    if worklist is not None:
+        worklist.write_csv(args.worklist)
+    if delta is not None:
+        index,counts = delta.finish()
+        index.save(args.delta)
+        print(f"Delta: {counts['unchanged']} unchanged, {counts['inserted']} inserted, {counts['modified']} modified, {counts['removed']} removed",file=sys.stderr)
+    print(f"Finished: {format_stats(stats)}",file=sys.stderr)
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
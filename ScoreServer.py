@@ -0,0 +1,245 @@
+"""
+Local http/json scoring service for the IndLoss risk logic, using only the standard library http server
+
+Usage:
+    python ScoreServer.py [--host 127.0.0.1] [--port 8080] [--instrument]
+
+Endpoints:
+    POST /score        one record as a json object with PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ
+    POST /score/batch  a json list of records, or {"records": [...]}; invalid records are reported without failing the batch
+    GET  /health       status, modifier tables version and uptime
+    GET  /metrics      request counters, plus the Instrument timing counters when started with --instrument
+
+Connections are kept alive (HTTP/1.1) and each connection is handled on its own thread.
+"""
+#import key libraries
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import FrameColumns,ScoreColumns
+import IndLossBatch
+import Instrument
+
+#set the largest request body accepted, in bytes, and the endpoints counted in the metrics
+MaxBody = 64*2**20
+Endpoints = ["/score","/score/batch","/health","/metrics"]
+
+
+#create function to read a field from a json record, with numeric person ids converted to text
+def _field(record,col):
+    val = record[col]
+    if isinstance(val,(list,dict)):
+        raise ValueError(f"{col} must be a single value")
+    if col=="PersonId":
+        return "" if val is None else str(val)
+    return val
+
+#create function to score a single record
+def score_record(record,tables=None):
+    """
+    Scores one record given as a dictionary keyed by the FrameColumns
+    Returns a dictionary of PersonId, the factors, Rag and RagCategory
+
+    Error handling:
+        Missing or invalid entries generate a value error, as in AssessRev
+    """
+    missing = [col for col in FrameColumns if col not in record]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    personId = _field(record,"PersonId")
+    if not len(personId)>0:
+        raise ValueError("Please enter a person ID")
+    result = IndLoss.score(*(_field(record,col) for col in FrameColumns[1:]),tables)
+    out = {"PersonId":personId}
+    out.update({col:getattr(result,col) for col in ScoreColumns})
+    out["RagCategory"] = result.RagCategory
+    return out
+
+#create function to score a list of records
+def score_records(records,tables=None):
+    """
+    Scores a list of records given as dictionaries keyed by the FrameColumns
+    Returns a dictionary of results (with the index of each record in the list), rejected records with the reason, and counts
+    """
+    rows = []
+    positions = []
+    rejected = []
+    for i,record in enumerate(records):
+        if not isinstance(record,dict):
+            rejected.append({"index":i,"reason":"Record is not a json object"})
+            continue
+        missing = [col for col in FrameColumns if col not in record]
+        if missing:
+            rejected.append({"index":i,"reason":f"Missing {', '.join(missing)}"})
+            continue
+        try:
+            rows.append([_field(record,col) for col in FrameColumns])
+        except ValueError as err:
+            rejected.append({"index":i,"reason":str(err)})
+            continue
+        positions.append(i)
+    batch,valid,rejects = IndLossBatch.score_rows(rows,tables)
+    rejected.extend({"index":positions[i],"reason":reason} for i,reason in rejects)
+    rejected.sort(key=lambda r: r["index"])
+    names = ["index","PersonId"]+ScoreColumns+["RagCategory"]
+    columns = [[positions[i] for i in valid],batch.PersonId.tolist()]+[getattr(batch,col).tolist() for col in ScoreColumns]+[IndLoss.rag_categories(batch.Rag).tolist()]
+    results = [dict(zip(names,vals)) for vals in zip(*columns)]
+    return {"scored":len(results),"rejected_count":len(rejected),"results":results,"rejected":rejected}
+
+
+#create the request handler
+class ScoreHandler(BaseHTTPRequestHandler):
+    """
+    Handles the scoring, health and metrics endpoints. Responses are json with a Content-Length so connections can be reused
+    """
+    protocol_version = "HTTP/1.1"
+    server_version = "IndLossScore/1.0"
+    #send small responses straight away rather than waiting for the client to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def send_json(self,status,body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type","application/json")
+        self.send_header("Content-Length",str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(self.path if self.path in Endpoints else "other",status)
+
+    def read_json(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length<0:
+            raise ValueError("Content-Length must be a whole number of bytes")
+        if length>MaxBody:
+            raise OverflowError(f"Request body over {MaxBody} bytes")
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def do_GET(self):
+        if self.path=="/health":
+            self.send_json(200,{"status":"ok","version":self.server.tables.Version,"uptime_seconds":time.monotonic()-self.server.started})
+        elif self.path=="/metrics":
+            self.send_json(200,self.server.metrics())
+        else:
+            self.send_json(404,{"error":f"{self.path} not found"})
+
+    def do_POST(self):
+        if self.path not in ("/score","/score/batch"):
+            self.send_json(404,{"error":f"{self.path} not found"})
+            return
+        try:
+            body = self.read_json()
+        except OverflowError as err:
+            self.close_connection = True
+            self.send_json(413,{"error":str(err)})
+            return
+        except (json.JSONDecodeError,UnicodeDecodeError):
+            self.send_json(400,{"error":"Request body is not valid json"})
+            return
+        except ValueError as err:
+            #the body cannot be read without a valid length, so the connection cannot be reused
+            self.close_connection = True
+            self.send_json(400,{"error":str(err)})
+            return
+        if self.path=="/score":
+            if not isinstance(body,dict):
+                self.send_json(400,{"error":"Request body must be a json object"})
+                return
+            try:
+                result = score_record(body,self.server.tables)
+            except ValueError as err:
+                self.server.count_records(0,1)
+                self.send_json(400,{"error":str(err)})
+                return
+            self.server.count_records(1,0)
+            self.send_json(200,result)
+        else:
+            records = body.get("records") if isinstance(body,dict) else body
+            if not isinstance(records,list):
+                self.send_json(400,{"error":"Request body must be a json list of records, or an object with a records list"})
+                return
+            try:
+                result = score_records(records,self.server.tables)
+            except Exception as err:
+                #answer rather than dropping the connection if a batch fails in a way not reported per record
+                self.send_json(500,{"error":f"Batch could not be scored: {err}"})
+                return
+            self.server.count_records(result["scored"],result["rejected_count"])
+            self.send_json(200,result)
+
+    def log_message(self,format,*args):
+        if self.server.verbose:
+            super().log_message(format,*args)
+
+
+#create the server class holding the tables and counters
+class ScoreServer(ThreadingHTTPServer):
+    """
+    Threaded http server for the scoring endpoints
+
+    Attributes:
+        tables: ModifierTables used to score
+        verbose: Whether to log each request
+        started: Monotonic time the server was created
+
+    Methods:
+        count() - records a response by endpoint and status
+        count_records() - records scored and rejected records
+        metrics() - returns the counters
+    """
+    daemon_threads = True
+
+    def __init__(self,address=("127.0.0.1",8080),tables=None,verbose=False):
+        super().__init__(address,ScoreHandler)
+        self.tables = IndLoss.Tables if tables is None else tables
+        self.verbose = verbose
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._records = {"scored":0,"rejected":0}
+
+    def count(self,path,status):
+        with self._lock:
+            key = f"{path} {status}"
+            self._responses[key] = self._responses.get(key,0)+1
+
+    def count_records(self,scored,rejected):
+        with self._lock:
+            self._records["scored"] += scored
+            self._records["rejected"] += rejected
+
+    def metrics(self):
+        with self._lock:
+            out = {"uptime_seconds":time.monotonic()-self.started,"responses":dict(self._responses),"records":dict(self._records)}
+        if Instrument.is_enabled():
+            out["stages"] = Instrument.snapshot()
+        return out
+
+#create the command line entry point
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local http/json scoring service for the IndLoss risk logic")
+    parser.add_argument("--host",default="127.0.0.1")
+    parser.add_argument("--port",type=int,default=8080)
+    parser.add_argument("--instrument",action="store_true",help="collect stage timings, reported at /metrics")
+    parser.add_argument("--verbose",action="store_true",help="log each request")
+    args = parser.parse_args(argv)
+    if args.instrument:
+        Instrument.enable()
+    server = ScoreServer((args.host,args.port),verbose=args.verbose)
+    print(f"Scoring service on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Binary columnar snapshots of a caseload, written once and opened with numpy.memmap for scoring without parsing
+
+Usage:
+    python Snapshot.py write caseload.csv caseload.snap [--chunk-size 50000]
+    python Snapshot.py score caseload.snap [--workers 4] [--chunk-size 100000]
+
+A snapshot is a directory holding one raw array file per column, a string table for PersonId and a meta.json describing them:
+    ContactDate.bin, BirthDate.bin     datetime64[D]
+    Status.bin, CurrentServ.bin, NewServ.bin     int8 codes (positions in StatusRoute and ServType)
+    PersonCode.bin     int32 position of each row's person id in the string table
+    PersonIds.bin, PersonOffsets.bin     utf-8 text of each distinct person id, and the int64 offset of each in the text
+Once scored, AgeBand, ChangeBand, AgeFac, ServFac, ServChange, StatusFac and Rag columns are added in the same way.
+Opening a snapshot maps the files rather than reading them, so slices are scored straight from the operating system's page
+cache, and several processes scoring the same snapshot share those pages rather than each loading its own copy.
+"""
+#import key libraries
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLossBatch import AssessmentBatch,BatchColumns,PartitionSize,encode_rows,parallel_map
+import ScoreCSV
+
+#set the columns written for each row, with the type of each, and the calculated columns added when scored
+SnapshotColumns = {"PersonCode":np.int32,
+                   "ContactDate":"datetime64[D]",
+                   "BirthDate":"datetime64[D]",
+                   "Status":np.int8,
+                   "CurrentServ":np.int8,
+                   "NewServ":np.int8}
+ScoredColumns = ["AgeBand","ChangeBand","AgeFac","ServFac","ServChange","StatusFac","Rag"]
+SnapshotFormat = 1
+
+
+#create function to map one column file
+def _column(path,col,dtype,rows,mode="r"):
+    if rows==0:
+        return np.empty(0,dtype=dtype)
+    return np.memmap(os.path.join(path,f"{col}.bin"),dtype=dtype,mode=mode,shape=(rows,))
+
+def _write_meta(path,meta):
+    with open(os.path.join(path,"meta.json"),"w",encoding="utf-8") as f:
+        json.dump(meta,f,indent=2)
+
+#create a class to write a snapshot batch by batch
+class SnapshotWriter:
+    """
+    Writes a snapshot directory from encoded AssessmentBatches, appending each batch to the column files
+
+    Methods:
+        append() - adds the rows of a batch
+        close() - writes the person id string table and meta.json, completing the snapshot
+
+    Can be used as a context manager, closing the snapshot at the end of the block
+    """
+    def __init__(self,path):
+        self.path = str(path)
+        os.makedirs(self.path,exist_ok=True)
+        self.rows = 0
+        self.codes = {}
+        self.files = {col:open(os.path.join(self.path,f"{col}.bin"),"wb") for col in SnapshotColumns}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    def append(self,batch):
+        """
+        Adds the rows of an AssessmentBatch. Only the input columns are written
+        """
+        codes = self.codes
+        cols = {col:getattr(batch,col) for col in SnapshotColumns if col!="PersonCode"}
+        cols["PersonCode"] = np.fromiter((codes.setdefault(pid,len(codes)) for pid in batch.PersonId.astype(str).tolist()),dtype=np.int64,count=len(batch))
+        for col,dtype in SnapshotColumns.items():
+            self.files[col].write(np.ascontiguousarray(cols[col],dtype=dtype).tobytes())
+        self.rows += len(batch)
+
+    def close(self):
+        """
+        Writes the person id string table and meta.json
+        """
+        if self.files is None:
+            return
+        for f in self.files.values():
+            f.close()
+        self.files = None
+        text = [pid.encode("utf-8") for pid in self.codes]
+        offsets = np.zeros(len(text)+1,dtype=np.int64)
+        np.cumsum([len(t) for t in text],out=offsets[1:])
+        with open(os.path.join(self.path,"PersonIds.bin"),"wb") as f:
+            f.write(b"".join(text))
+        offsets.tofile(os.path.join(self.path,"PersonOffsets.bin"))
+        _write_meta(self.path,{"Format":SnapshotFormat,"Rows":self.rows,"Persons":len(text),
+                               "Columns":{col:np.dtype(dtype).str for col,dtype in SnapshotColumns.items()},"Version":None})
+
+#create functions to write a snapshot
+def write_snapshot(path,batch):
+    """
+    Writes an AssessmentBatch as a snapshot directory at path
+    """
+    with SnapshotWriter(path) as writer:
+        writer.append(batch)
+
+def snapshot_csv(inPath,path,chunksize=ScoreCSV.ChunkSize):
+    """
+    Reads a caseload csv chunk by chunk and writes the valid rows as a snapshot directory at path
+    Rows are validated as in ScoreCSV; invalid rows are counted and left out
+    Returns a dictionary of rows read, written and rejected
+    """
+    stats = {"rows":0,"written":0,"rejected":0}
+    with open(inPath,newline="",encoding="utf-8") as fin,SnapshotWriter(path) as writer:
+        for start,rows in ScoreCSV.read_chunks(fin,chunksize):
+            batch,valid,rejects = encode_rows(rows)
+            writer.append(batch)
+            stats["rows"] += len(rows)
+            stats["written"] += len(valid)
+            stats["rejected"] += len(rejects)
+    return stats
+
+#create a class to open a snapshot
+class Snapshot:
+    """
+    A snapshot directory opened with numpy.memmap. The column arrays are read from disk only as they are used
+
+    Attributes:
+        path: The snapshot directory
+        rows: Number of rows
+        Version: Version of the modifier tables the snapshot was scored with, or None if not scored
+        columns: Dictionary of the mapped column arrays, including the calculated columns once scored
+
+    Methods:
+        person_ids() - returns the distinct person ids, in the order of the PersonCode column
+        batch() - returns an AssessmentBatch of a slice of rows, mapped copy-on-write from the files
+        score() - calculates the factors and rag for a slice of rows
+
+    Error handling:
+        A directory that is not a snapshot, or is a different format, generates a value error
+    """
+    def __init__(self,path):
+        self.path = str(path)
+        try:
+            with open(os.path.join(self.path,"meta.json"),encoding="utf-8") as f:
+                self.meta = json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"{path} is not a snapshot.") from None
+        if self.meta.get("Format")!=SnapshotFormat:
+            raise ValueError(f"{path} is snapshot format {self.meta.get('Format')}, expected {SnapshotFormat}.")
+        self.rows = self.meta["Rows"]
+        self.Version = self.meta["Version"]
+        self.columns = {col:_column(self.path,col,dtype,self.rows) for col,dtype in self.meta["Columns"].items()}
+        self._personIds = None
+
+    def __len__(self):
+        return self.rows
+
+    def __repr__(self):
+        return f"Snapshot({self.path!r}, {self.rows} rows)"
+
+    def person_ids(self):
+        """
+        Returns an object array of the distinct person ids, decoded from the string table on first use
+        """
+        if self._personIds is None:
+            with open(os.path.join(self.path,"PersonIds.bin"),"rb") as f:
+                text = f.read()
+            offsets = np.fromfile(os.path.join(self.path,"PersonOffsets.bin"),dtype=np.int64).tolist()
+            ids = np.empty(self.meta["Persons"],dtype=object)
+            ids[:] = [text[a:b].decode("utf-8") for a,b in zip(offsets,offsets[1:])]
+            self._personIds = ids
+        return self._personIds
+
+    def batch(self,start=0,stop=None):
+        """
+        Returns an AssessmentBatch of rows start to stop. The date and code columns, and the calculated columns if
+        scored, are views of the mapped files rather than copies; only the person ids are built for the slice
+        The columns are mapped copy-on-write, so the batch can be rescored or edited in memory without changing the files
+        """
+        cols = {col:_column(self.path,col,val.dtype,self.rows,mode="c")[start:stop] for col,val in self.columns.items() if col in BatchColumns}
+        return AssessmentBatch(PersonId=self.person_ids()[self.columns["PersonCode"][start:stop]],**cols)
+
+    def score(self,start=0,stop=None,tables=None):
+        """
+        Returns a dictionary of AgeBand, ChangeBand, AgeFac, ServFac, ServChange, StatusFac and Rag arrays for rows start to stop,
+        calculated directly from the mapped columns
+        """
+        c = self.columns
+        return IndLoss.score_codes(c["BirthDate"][start:stop],c["ContactDate"][start:stop],c["Status"][start:stop],
+                                   c["CurrentServ"][start:stop],c["NewServ"][start:stop],tables)
+
+#create function to score a slice of a snapshot into its calculated column files
+def _score_slice(part,tables):
+    path,rows,start,stop = part
+    scores = Snapshot(path).score(start,stop,tables)
+    for col in ScoredColumns:
+        out = _column(path,col,BatchColumns[col],rows,mode="r+")
+        out[start:stop] = scores[col]
+        out.flush()
+    return stop-start
+
+#create function to score a whole snapshot
+def score_snapshot(path,workers=1,chunksize=PartitionSize,tables=None):
+    """
+    Scores every row of a snapshot, writing the calculated columns into the snapshot directory
+    Each slice of chunksize rows is scored from the mapped input files and written to the mapped output files,
+    so worker processes share the snapshot through the page cache and only slice positions are sent between them
+
+    :param path: The snapshot directory
+    :param workers: Number of worker processes. Default is 1, scoring in the current process
+    :param chunksize: Number of rows in each slice
+    :param tables: ModifierTables to score with. Default is IndLoss.Tables
+    Returns the scored Snapshot
+    """
+    tables = IndLoss.Tables if tables is None else tables
+    snap = Snapshot(path)
+    rows = len(snap)
+    for col in ScoredColumns:
+        #resize rather than recreate, so snapshots already open on a previous scoring stay valid
+        with open(os.path.join(snap.path,f"{col}.bin"),"ab") as f:
+            f.truncate(rows*np.dtype(BatchColumns[col]).itemsize)
+    #clear the version until every slice is scored, so an interrupted run is not taken as scored
+    _write_meta(snap.path,dict(snap.meta,Version=None))
+    parts = ((snap.path,rows,start,min(start+chunksize,rows)) for start in range(0,rows,chunksize))
+    for _ in parallel_map(_score_slice,parts,workers,tables):
+        pass
+    meta = dict(snap.meta)
+    meta["Columns"] = dict(meta["Columns"],**{col:np.dtype(BatchColumns[col]).str for col in ScoredColumns})
+    meta["Version"] = tables.Version
+    _write_meta(snap.path,meta)
+    return Snapshot(snap.path)
+
+#create the command line entry point
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write and score memory mapped caseload snapshots")
+    commands = parser.add_subparsers(dest="command",required=True)
+    write = commands.add_parser("write",help="write a caseload csv as a snapshot")
+    write.add_argument("input",help="caseload csv with PersonId, ContactDate, BirthDate, Status, CurrentServ and NewServ columns")
+    write.add_argument("snapshot",help="snapshot directory to write")
+    write.add_argument("--chunk-size",type=int,default=ScoreCSV.ChunkSize)
+    score = commands.add_parser("score",help="score a snapshot in place")
+    score.add_argument("snapshot",help="snapshot directory")
+    score.add_argument("--workers",type=int,default=1,help="processes scoring slices in parallel. Default is 1")
+    score.add_argument("--chunk-size",type=int,default=PartitionSize)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    if args.command=="write":
+        stats = snapshot_csv(args.input,args.snapshot,args.chunk_size)
+        print(f"{stats['rows']} rows read, {stats['written']} written, {stats['rejected']} rejected in {time.perf_counter()-start:.2f}s",file=sys.stderr)
+    else:
+        snap = score_snapshot(args.snapshot,args.workers,args.chunk_size)
+        print(f"{len(snap)} rows scored in {time.perf_counter()-start:.2f}s",file=sys.stderr)
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#import key libraries
+import itertools
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ModifierTables,ServType,StatusRoute,RagCategories
+from IndLossBatch import AssessmentBatch,PartitionSize
+
+
+#create a class to hold the caseload as counts of each distinct scoring input
+class CaseloadProfile:
+    """
+    The caseload reduced to the number of rows for each combination of age in whole years, Status, CurrentServ and NewServ
+    These are the only inputs the rag depends on, so any modifier tables can be scored against the profile
+    rather than the rows: a caseload of millions of rows reduces to at most a few thousand occupied cells
+
+    Attributes:
+        MinAge: Age of the first position on the age axis
+        Counts: int64 array of rows, indexed by [age-MinAge, status code, CurrentServ code, NewServ code]
+        Rows: Total number of rows
+
+    Methods:
+        add() - adds the rows of an AssessmentBatch
+        from_batch() - creates a profile from an AssessmentBatch, reading it in chunks
+        from_snapshot() - creates a profile from a Snapshot, reading it in chunks
+        cells() - returns the occupied cells and their counts
+    """
+    def __init__(self):
+        self.MinAge = 0
+        self.Counts = np.zeros((0,len(StatusRoute),len(ServType),len(ServType)),dtype=np.int64)
+
+    @property
+    def Rows(self):
+        return int(self.Counts.sum())
+
+    def add(self,batch):
+        """
+        Adds the rows of an AssessmentBatch, scored or not
+        """
+        if len(batch)==0:
+            return
+        ages = IndLoss.age_years_array(batch.BirthDate,batch.ContactDate)
+        lo = int(ages.min()) if len(self.Counts)==0 else min(int(ages.min()),self.MinAge)
+        hi = int(ages.max()) if len(self.Counts)==0 else max(int(ages.max()),self.MinAge+len(self.Counts)-1)
+        if len(self.Counts)==0 or lo!=self.MinAge or hi!=self.MinAge+len(self.Counts)-1:
+            before = 0 if len(self.Counts)==0 else self.MinAge-lo
+            self.Counts = np.pad(self.Counts,[(before,hi-lo+1-before-len(self.Counts)),(0,0),(0,0),(0,0)])
+            self.MinAge = lo
+        cell = np.ravel_multi_index((ages-self.MinAge,batch.Status,batch.CurrentServ,batch.NewServ),self.Counts.shape)
+        self.Counts += np.bincount(cell,minlength=self.Counts.size).reshape(self.Counts.shape)
+
+    @classmethod
+    def from_batch(cls,batch,chunksize=PartitionSize):
+        """
+        Returns the profile of an AssessmentBatch, reading chunksize rows at a time to bound memory
+        """
+        profile = cls()
+        for start in range(0,len(batch),chunksize):
+            profile.add(batch[start:start+chunksize])
+        return profile
+
+    @classmethod
+    def from_snapshot(cls,snap,chunksize=PartitionSize):
+        """
+        Returns the profile of a Snapshot, reading chunksize rows at a time from the mapped files
+        """
+        profile = cls()
+        for start in range(0,len(snap),chunksize):
+            profile.add(snap.batch(start,start+chunksize))
+        return profile
+
+    def cells(self):
+        """
+        Returns (ages, status codes, CurrentServ codes, NewServ codes, counts) arrays for every occupied cell
+        """
+        idx = np.flatnonzero(self.Counts)
+        age,status,curr,new = np.unravel_index(idx,self.Counts.shape)
+        return age+self.MinAge,status,curr,new,self.Counts.reshape(-1)[idx]
+
+#create function to build candidate tables from alternative lists
+def candidate_grid(base=None,**options):
+    """
+    Returns a list of ModifierTables for every combination of alternative modifier lists
+
+    :param base: ModifierTables whose lists are used where no alternatives are given. Default is IndLoss.Tables
+    :param options: For any ModifierTables list, e.g. ServModify, a list of alternative lists to try
+    e.g. candidate_grid(AgeModify=[[0.8,1,1.2,1.5],[0.9,1,1.1,1.3]],StatusModify=[[1.2,1.2,1.5,1],[1.1,1.2,1.6,1]]) gives 4 tables
+    """
+    base = (IndLoss.Tables if base is None else base).to_dict()
+    names = list(options)
+    return [ModifierTables(**dict(base,**dict(zip(names,combo)))) for combo in itertools.product(*(options[name] for name in names))]
+
+#create function to score many candidate tables against one caseload
+def sweep(caseload,candidates,baseline=None,chunksize=PartitionSize):
+    """
+    Scores a caseload with each of many candidate modifier tables and summarises the rag distribution for each
+    The caseload is read once, in chunks, into a CaseloadProfile; each candidate is then scored over the occupied cells
+    of the profile weighted by their counts, giving the same totals as rescoring every row
+
+    :param caseload: An AssessmentBatch, Snapshot or CaseloadProfile
+    :param candidates: List of ModifierTables, or of dictionaries of modifier lists for ModifierTables(**lists)
+    :param baseline: ModifierTables to compare categories against. Default is IndLoss.Tables
+    :param chunksize: Number of caseload rows read at a time
+    Returns a list with a dictionary for each candidate of its Version, Rows, Green, Amber and Red counts,
+    MeanRag, the 50th, 90th and 99th percentile rag, and Changed, the rows whose category differs from the baseline
+    """
+    if isinstance(caseload,CaseloadProfile):
+        profile = caseload
+    elif isinstance(caseload,AssessmentBatch):
+        profile = CaseloadProfile.from_batch(caseload,chunksize)
+    else:
+        profile = CaseloadProfile.from_snapshot(caseload,chunksize)
+    baseline = IndLoss.Tables if baseline is None else baseline
+    ages,status,curr,new,counts = profile.cells()
+    total = int(counts.sum())
+    def cell_rag(tables):
+        band = np.searchsorted(tables.AgeBreaks,ages,side="right")
+        return tables.RagCube[band,status,curr,new]
+    def category(rag):
+        return (rag>1).astype(np.int8)+(rag>3)
+    baseCategory = category(cell_rag(baseline))
+    results = []
+    for tables in candidates:
+        if not isinstance(tables,ModifierTables):
+            tables = ModifierTables(**tables)
+        rag = cell_rag(tables)
+        cat = category(rag)
+        out = {"Version":tables.Version,"Rows":total}
+        out.update({name:int(n) for name,n in zip(RagCategories,np.bincount(cat,weights=counts,minlength=len(RagCategories)).astype(np.int64))})
+        out["MeanRag"] = float(np.dot(rag,counts)/total) if total else float("nan")
+        order = np.argsort(rag,kind="stable")
+        cumulative = np.cumsum(counts[order])
+        for p in (50,90,99):
+            out[f"P{p}"] = float(rag[order][np.searchsorted(cumulative,p/100*total)]) if total else float("nan")
+        out["Changed"] = int(counts[cat!=baseCategory].sum())
+        results.append(out)
+    return results
@@ -0,0 +1,141 @@
+#import key libraries
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLossBatch import AssessmentBatch,AssessmentRow
+
+#set the offset added to day numbers so each person's dates fit in the low 32 bits of a search key
+_DayOffset = 2**31
+
+
+#create function to convert a date entry to a numpy day
+def _day(value):
+    if isinstance(value,np.datetime64):
+        return value.astype("datetime64[D]")
+    return np.datetime64(IndLoss.parse_date(value),"D")
+
+#create a class to index each person's assessments in date order
+class TimelineIndex:
+    """
+    An index of scored assessments keyed by PersonId, with each person's assessments held in contact date order
+    Rows are sorted by (PersonId, ContactDate), so a person's assessments are one contiguous run of rows, found by
+    binary search of the sorted person ids. Queries across every person use one vectorised binary search of a
+    combined (person, date) key rather than a loop over people.
+    Assessments with the same person and contact date keep the order they were added, the last added counting as latest
+
+    Attributes:
+        batch: The scored AssessmentBatch, sorted by PersonId then ContactDate
+        PersonIds: Sorted array of the distinct person ids
+        Starts: Position in batch of each person's first assessment, with len(batch) appended
+        Keys: Sorted int64 search key of each row, the person's position in PersonIds in the high bits and the contact date in the low bits
+
+    Methods:
+        add() - adds the assessments of another scored batch
+        person() - returns every assessment for a person in contact date order
+        latest() - returns a person's most recent assessment
+        as_of() - returns a person's most recent assessment on or before a date
+        latest_all() - returns the most recent assessment of every person
+        as_of_all() - returns the most recent assessment on or before a date of every person with one
+        moved_to_red() - returns the people whose category moved from Green/Amber to Red between two dates
+
+    Dates can be dates, numpy datetime64 or any entry accepted by IndLoss.parse_date
+    """
+    def __init__(self,batch=None):
+        self.batch = AssessmentBatch.from_records([]) if batch is None else batch
+        self._build()
+
+    def _build(self):
+        ids = self.batch.PersonId.astype(str)
+        self.PersonIds,codes = np.unique(ids,return_inverse=True)
+        days = self.batch.ContactDate.astype(np.int64)
+        order = np.lexsort((days,codes))
+        self.batch = self.batch[order]
+        codes = codes[order].astype(np.int64)
+        self.Keys = (codes<<32)|(days[order]+_DayOffset)
+        self.Starts = np.searchsorted(codes,np.arange(len(self.PersonIds)+1))
+
+    def add(self,batch):
+        """
+        Adds the assessments of a scored AssessmentBatch and re-sorts the index
+        """
+        self.batch = AssessmentBatch.concat([self.batch,batch])
+        self._build()
+
+    def __len__(self):
+        return len(self.batch)
+
+    def __contains__(self,PersonId):
+        return self._code(PersonId)>=0
+
+    #create methods to look up one person
+    def _code(self,PersonId):
+        code = int(np.searchsorted(self.PersonIds,str(PersonId)))
+        if code<len(self.PersonIds) and self.PersonIds[code]==str(PersonId):
+            return code
+        return -1
+
+    def person(self,PersonId):
+        """
+        Returns an AssessmentBatch of every assessment for a person in contact date order, empty if there are none
+        """
+        code = self._code(PersonId)
+        if code<0:
+            return self.batch[0:0]
+        return self.batch[self.Starts[code]:self.Starts[code+1]]
+
+    def latest(self,PersonId):
+        """
+        Returns the most recent assessment for a person as an AssessmentRow, or None if there are none
+        """
+        code = self._code(PersonId)
+        if code<0:
+            return None
+        return AssessmentRow(self.batch,int(self.Starts[code+1])-1)
+
+    def as_of(self,PersonId,date):
+        """
+        Returns the most recent assessment for a person on or before date as an AssessmentRow, or None if there are none
+        """
+        code = self._code(PersonId)
+        if code<0:
+            return None
+        start,end = self.Starts[code],self.Starts[code+1]
+        pos = start+int(np.searchsorted(self.batch.ContactDate[start:end],_day(date),side="right"))-1
+        return AssessmentRow(self.batch,pos) if pos>=start else None
+
+    #create methods to query every person at once
+    def _positions(self,date):
+        day = _day(date).astype(np.int64)+_DayOffset
+        pos = np.searchsorted(self.Keys,(np.arange(len(self.PersonIds),dtype=np.int64)<<32)|day,side="right")-1
+        return np.where(pos>=self.Starts[:-1],pos,-1)
+
+    def latest_all(self):
+        """
+        Returns an AssessmentBatch of the most recent assessment of every person, in PersonId order
+        """
+        return self.batch[self.Starts[1:]-1]
+
+    def as_of_all(self,date):
+        """
+        Returns an AssessmentBatch of each person's most recent assessment on or before date, in PersonId order
+        People with no assessment by that date are left out
+        """
+        pos = self._positions(date)
+        return self.batch[pos[pos>=0]]
+
+    def moved_to_red(self,start,end):
+        """
+        Finds the people whose most recent assessment as of start was Green or Amber and as of end is Red
+        People with no assessment by start are left out
+
+        :param start: The earlier date
+        :param end: The later date
+        Returns (before,after), AssessmentBatches of the assessments as of start and as of end for each person found, in PersonId order
+        """
+        before = self._positions(start)
+        after = self._positions(end)
+        rag = self.batch.Rag
+        moved = (before>=0)&(after>=0)
+        moved[moved] = (rag[before[moved]]<=3)&(rag[after[moved]]>3)
+        return self.batch[before[moved]],self.batch[after[moved]]
@@ -0,0 +1,174 @@
+#import key libraries
+import collections
+import csv
+import heapq
+import numpy as np
+
+#import the key elements from logic model
+import IndLoss
+from IndLoss import ServType,StatusRoute
+
+#set the columns that can group the worklist, with the entry of each code, and the columns of each worklist entry
+GroupColumns = {"Status":StatusRoute,"CurrentServ":ServType,"NewServ":ServType}
+WorklistColumns = ["Group","Rank","PersonId","ContactDate","Status","CurrentServ","NewServ","AgeFac","ServFac","ServChange","StatusFac","Rag","RagCategory"]
+AllGroup = "All"
+
+
+#create an immutable entry of a ranked worklist
+class WorklistEntry(collections.namedtuple("WorklistEntry",WorklistColumns)):
+    """
+    One person on a ranked worklist: the group and rank within it, the contact, each risk modifier, the rag and its category
+    """
+    __slots__ = ()
+
+#create a class to keep the highest rag contacts of each group as records are scored
+class Worklist:
+    """
+    A prioritised worklist of the k highest rag contacts in each group (Status, a service, or a team given with each record)
+    Each group keeps a heap of at most k contacts with the lowest rag at the top, so a contact is only kept if it beats
+    the lowest kept so far. Memory is bounded by groups x k whatever the number of records, and each record costs at most
+    one heap update of log k steps. Contacts with the same rag keep the order they were added, the first added ranking higher
+
+    Each record is one contact; where people have several contacts, add only the latest (e.g. TimelineIndex.latest_all())
+    so a person appears once
+
+    Attributes:
+        k: Most contacts kept in each group
+        by: Column grouping the worklist (Status, CurrentServ or NewServ), or None for one group, unless groups are given when adding
+        rows: Number of records added
+        heaps: Dictionary of the heap of (Rag, order added, contact) kept for each group
+
+    Methods:
+        add() - scores one record with IndLoss.score and adds it
+        add_batch() - adds the rows of a scored AssessmentBatch
+        ranked() - returns the ranked list of WorklistEntry for each group
+        to_frame() - returns every group's ranked list as one dataframe
+        write_csv() - writes every group's ranked list to a csv file
+
+    Error handling:
+        A k below 1 or an unknown by column generates a value error
+    """
+    def __init__(self,k=20,by="Status",tables=None):
+        """
+        Docstring for __init__
+
+        :param self: Defines instance of class
+        :param k: Most contacts kept in each group. Default is 20
+        :param by: Column grouping the worklist, one of GroupColumns, or None for a single group. Default is Status
+        :param tables: ModifierTables used by add. Default is IndLoss.Tables
+        """
+        if k<1:
+            raise ValueError("k must be at least 1.")
+        if by is not None and by not in GroupColumns:
+            raise ValueError(f"{by} is not a valid group column, use one of {', '.join(GroupColumns)}.")
+        self.k = int(k)
+        self.by = by
+        self.tables = tables
+        self.rows = 0
+        self.heaps = {}
+
+    def __len__(self):
+        return sum(len(heap) for heap in self.heaps.values())
+
+    #create methods to add contacts
+    def _push(self,group,rag,order,contact):
+        heap = self.heaps.setdefault(group,[])
+        item = (rag,-order,contact)
+        if len(heap)<self.k:
+            heapq.heappush(heap,item)
+        elif item>heap[0]:
+            heapq.heapreplace(heap,item)
+
+    def _threshold(self,group):
+        #lowest rag that can still enter a group's list
+        heap = self.heaps.get(group)
+        return heap[0][0] if heap is not None and len(heap)>=self.k else -np.inf
+
+    def add(self,PersonId,ContactDate,BirthDate,Status,CurrentServ,NewServ,group=None):
+        """
+        Scores one record and adds it to its group's list if it ranks in the top k
+        Returns the RagScore of the record
+
+        :param group: Optional group, e.g. a team. Default is the record's entry in the by column
+
+        Error handling:
+            Invalid entries generate the same value errors as AssessRev
+        """
+        if not len(PersonId)>0:
+            raise ValueError("Please enter a person ID")
+        res = IndLoss.score(ContactDate,BirthDate,Status,CurrentServ,NewServ,self.tables)
+        if group is None:
+            group = getattr(res,self.by) if self.by else AllGroup
+        self._push(group,res.Rag,self.rows,(PersonId,res.ContactDate,res.Status,res.CurrentServ,res.NewServ,
+                                            res.AgeFac,res.ServFac,res.ServChange,res.StatusFac,res.Rag,res.RagCategory))
+        self.rows += 1
+        return res
+
+    def add_batch(self,batch,groups=None):
+        """
+        Adds the rows of a scored AssessmentBatch
+        Rows that cannot beat the lowest kept rag of a full group are dropped with array operations, and only the top k
+        remaining rows of each group are pushed onto its heap, so large batches cost little more than one pass over the rags
+
+        :param batch: Scored AssessmentBatch
+        :param groups: Optional array of the group of each row, e.g. teams. Default is the by column
+        """
+        n = len(batch)
+        if n==0:
+            return
+        if groups is not None:
+            labels,codes = np.unique(np.asarray(groups),return_inverse=True)
+            labels = labels.tolist()
+        elif self.by is not None:
+            labels,codes = GroupColumns[self.by],getattr(batch,self.by)
+        else:
+            labels,codes = [AllGroup],np.zeros(n,dtype=np.int8)
+        codes = np.asarray(codes,dtype=np.intp).ravel()
+        if len(codes)!=n:
+            raise ValueError(f"groups has {len(codes)} entries, expected {n}.")
+        #keep rows that could enter their group's list, then the top k of each group by rag, earliest first on ties
+        threshold = np.array([self._threshold(label) for label in labels],dtype=np.float64)
+        rows = np.flatnonzero(batch.Rag>=threshold[codes])
+        order = rows[np.lexsort((rows,-batch.Rag[rows],codes[rows]))]
+        sortedCodes = codes[order]
+        rank = np.arange(len(order))-np.searchsorted(sortedCodes,sortedCodes)
+        keep = order[rank<self.k]
+        cols = [batch.PersonId[keep].tolist(),batch.ContactDate[keep].tolist()]
+        cols += [[GroupColumns[col][c] for c in getattr(batch,col)[keep].tolist()] for col in GroupColumns]
+        cols += [getattr(batch,col)[keep].tolist() for col in ("AgeFac","ServFac","ServChange","StatusFac","Rag")]
+        cols.append(IndLoss.rag_categories(batch.Rag[keep]).tolist())
+        for i,code,contact in zip(keep.tolist(),codes[keep].tolist(),zip(*cols)):
+            self._push(labels[code],contact[9],self.rows+i,contact)
+        self.rows += n
+
+    #create methods to read the worklist
+    def _groups(self):
+        #groups in the order of their entries in the by column, otherwise sorted
+        if self.by is not None:
+            known = GroupColumns[self.by]
+            return sorted(self.heaps,key=lambda g: (0,known.index(g),"") if g in known else (1,0,str(g)))
+        return sorted(self.heaps,key=str)
+
+    def ranked(self):
+        """
+        Returns a dictionary of the ranked list of WorklistEntry for each group, highest rag first
+        """
+        return {group:[WorklistEntry(group,rank,*contact) for rank,(rag,order,contact) in enumerate(sorted(self.heaps[group],reverse=True),1)]
+                for group in self._groups()}
+
+    def to_frame(self):
+        """
+        Returns a dataframe of every group's ranked list, with the WorklistColumns
+        """
+        import pandas as pd
+        return pd.DataFrame([entry for entries in self.ranked().values() for entry in entries],columns=WorklistColumns)
+
+    def write_csv(self,path):
+        """
+        Writes every group's ranked list to a csv file with a header of WorklistColumns, dates as dd/mm/yyyy
+        """
+        with open(path,"w",newline="",encoding="utf-8") as f:
+            writer = csv.writer(f,lineterminator="\n")
+            writer.writerow(WorklistColumns)
+            for entries in self.ranked().values():
+                writer.writerows(entry._replace(ContactDate=entry.ContactDate.strftime("%d/%m/%Y")) for entry in entries)
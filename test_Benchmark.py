@@ -0,0 +1,41 @@
+#import pytest library
+import pytest
+
+#import functions to test
+import IndLoss
+import Benchmark
+
+#test that the synthetic caseload is reproducible and valid
+def test_makeBatchSeeded():
+    a = Benchmark.make_batch(5000,seed=3)
+    b = Benchmark.make_batch(5000,seed=3)
+    assert a.PersonId.tolist() == b.PersonId.tolist()
+    assert (a.BirthDate == b.BirthDate).all()
+    assert not (Benchmark.make_batch(5000,seed=4).BirthDate == a.BirthDate).all()
+
+def test_makeCaseloadScores():
+    df = Benchmark.make_caseload(2000,seed=1)
+    scored = IndLoss.score_frame(df)
+    transition = scored["Status"]=="Transition"
+    ages = IndLoss.age_years_array(scored["BirthDate"].to_numpy(),scored["ContactDate"].to_numpy())
+    assert ((ages[transition.to_numpy()]>=17)&(ages[transition.to_numpy()]<=25)).all()
+    assert set(scored["RagCategory"]) == {"Green","Amber","Red"}
+
+#test that the suite runs and regressions are reported
+def test_runSuite(tmp_path):
+    res = Benchmark.run_suite(sizes=(1000,),singleRecords=200,output=tmp_path/"res.json")
+    assert (tmp_path/"res.json").exists()
+    assert res["batch"][0]["rows"] == 1000
+    assert Benchmark.compare_results(res,res) == []
+
+def test_compareResults():
+    old = {"single":{"construct_us":1.0},"batch":[{"rows":10,"score_rows_per_sec":100.0,"score_peak_mb":5.0}]}
+    new = {"single":{"construct_us":1.5},"batch":[{"rows":10,"score_rows_per_sec":70.0,"score_peak_mb":5.1}]}
+    messages = Benchmark.compare_results(old,new)
+    assert len(messages) == 2
+
+#test that parallel scaling is timed from a csv for each number of workers
+def test_benchParallel():
+    results = Benchmark.bench_parallel(rows=2000,workers=[1,2],chunksize=500)
+    assert [res["workers"] for res in results] == [1,2]
+    assert results[0]["speedup"] == 1 and results[1]["rows_per_sec"] > 0
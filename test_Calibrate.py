@@ -0,0 +1,54 @@
+#import pytest library
+import pytest
+import numpy as np
+
+#import functions to test
+from IndLoss import ModifierTables
+import Benchmark
+import Calibrate
+
+#test that fitting recovers the modifiers used to simulate the outcomes, relative to each reference level
+def test_fitRecoversModifiers():
+    batch = Benchmark.make_batch(200000,5)
+    truth = ModifierTables(StatusModify=[1.1,1.3,1.8,1],AgeModify=[0.7,1,1.3,1.9])
+    rag = batch.score(truth).Rag
+    outcome = np.random.default_rng(1).random(len(batch))<0.05*rag
+    fitted,report = Calibrate.fit_modifiers(batch,outcome)
+    assert report["Converged"]
+    status = np.array(fitted._lists["StatusModify"])
+    age = np.array(fitted._lists["AgeModify"])
+    assert status/status[3] == pytest.approx([1.1,1.3,1.8,1],rel=0.1)
+    assert age/age[1] == pytest.approx([0.7,1,1.3,1.9],rel=0.1)
+    assert report["After"]["AUC"] > report["Before"]["AUC"]
+    logistic,report = Calibrate.fit_modifiers(batch,outcome,method="logistic")
+    assert report["Converged"] and report["After"]["AUC"] > 0.5
+    with pytest.raises(ValueError):
+        Calibrate.fit_modifiers(batch,outcome,method="linear")
+
+#test the auc against counting every pair directly
+def test_discrimination():
+    rag = np.array([0.5,2,2,4,1,3.5])
+    outcome = np.array([False,True,False,True,False,False])
+    pairs = [(1 if p>n else 0.5 if p==n else 0) for p in rag[outcome] for n in rag[~outcome]]
+    res = Calibrate.discrimination(rag,outcome)
+    assert res["AUC"] == pytest.approx(np.mean(pairs))
+    assert (res["Rows"],res["Events"]) == (6,2)
+    assert res["EventRate"] == {"Green":0.0,"Amber":0.5,"Red":0.5}
+
+def test_outcomeCells():
+    batch = Benchmark.make_batch(1000,2)
+    levels,rows,events = Calibrate.outcome_cells(batch,np.arange(1000)%2==0)
+    assert rows.sum() == 1000 and events.sum() == 500
+    with pytest.raises(ValueError):
+        Calibrate.outcome_cells(batch,[True])
+
+#test that histories the modifiers cannot be fitted from are rejected with a value error
+def test_fitEmptyHistory():
+    from IndLossBatch import AssessmentBatch
+    with pytest.raises(ValueError,match="No contacts"):
+        Calibrate.fit_modifiers(AssessmentBatch.from_records([]),[])
+    batch = Benchmark.make_batch(1000,3)
+    with pytest.raises(ValueError,match="No contacts have the outcome"):
+        Calibrate.fit_modifiers(batch,np.zeros(1000,dtype=bool))
+    with pytest.raises(ValueError,match="Every contact"):
+        Calibrate.fit_modifiers(batch,np.ones(1000,dtype=bool),method="logistic")
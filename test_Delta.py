@@ -0,0 +1,76 @@
+#import pytest library
+import pytest
+import csv
+import numpy as np
+
+#import functions to test
+import IndLoss
+from IndLoss import ModifierTables
+import IndLossBatch
+from Delta import DeltaIndex,DeltaTracker,fingerprint_rows
+import ScoreCSV
+
+day1 = [["789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"],
+        ["100001","02/01/2024","01/03/1960","Community","None","Equipment"],
+        ["100002","15/08/2023","29/02/1944","Existing Service","Homecare: High","Day Support"],
+        ["100003","15/08/2023","29/02/1944","NotInList","None","None"]]
+#100001 is modified, 100002 removed, 100004 inserted
+day2 = [day1[0],["100004","16/08/2023","29/02/1944","Transition","None","Homecare: High"],
+        ["100001","02/01/2024","01/03/1960","Community","None","Homecare: Low"],day1[3]]
+
+def test_fingerprints():
+    fp = fingerprint_rows(day1+[list(day1[0])])
+    assert fp.dtype == np.uint64 and fp[0] == fp[4] and len(set(fp.tolist())) == 4
+
+#test that only new and changed rows are scored, and the results match scoring every row
+def test_deltaScoring(tmp_path):
+    tracker = DeltaTracker()
+    tracker.score_rows(day1)
+    index,counts = tracker.finish()
+    assert (counts["inserted"],counts["rejected"],len(index)) == (3,1,3)
+    index.save(tmp_path/"index.npz")
+    tracker = DeltaTracker(DeltaIndex.load(tmp_path/"index.npz"))
+    batch,valid,rejects = tracker.score_rows(day2)
+    full,fullValid,fullRejects = IndLossBatch.score_rows(day2)
+    assert (valid,rejects) == (fullValid,fullRejects)
+    assert batch.Rag.tolist() == full.Rag.tolist() and list(batch.PersonId) == list(full.PersonId)
+    index,counts = tracker.finish()
+    assert counts == {"unchanged":1,"inserted":1,"modified":1,"rejected":1,"removed":1}
+    assert len(index) == 3
+
+#test that carried rows are updated when the modifier tables change
+def test_deltaNewTables():
+    tracker = DeltaTracker()
+    tracker.score_rows(day1)
+    index,counts = tracker.finish()
+    newTables = ModifierTables(StatusModify=[1.2,1.2,2,1])
+    batch,valid,rejects = DeltaTracker(index).score_rows(day2,newTables)
+    assert batch.Rag.tolist() == IndLossBatch.score_rows(day2,newTables)[0].Rag.tolist()
+
+#test that the index records the tables the run was scored with, so the next run rescores carried rows
+def test_deltaIndexTables(tmp_path):
+    other = ModifierTables(StatusModify=[1,1,1,1])
+    tracker = DeltaTracker()
+    ScoreCSV.score_csv(write_rows(tmp_path,"day1.csv",day1),tmp_path/"out.csv",tables=other,delta=tracker)
+    index,counts = tracker.finish()
+    assert index.tables.Version == other.Version
+    with pytest.raises(ValueError):
+        tracker.score_rows(day1)
+    batch,valid,rejects = DeltaTracker(index).score_rows(day1)
+    assert batch.Rag[0] == 4.3875
+
+def write_rows(path,name,rows):
+    with open(path/name,"w",newline="") as f:
+        csv.writer(f).writerows([IndLoss.FrameColumns]+rows)
+    return path/name
+
+#test the csv tool's delta option gives the same output as a full run
+def test_scoreCsvDelta(tmp_path):
+    for name,rows in (("day1.csv",day1),("day2.csv",day2)):
+        with open(tmp_path/name,"w",newline="") as f:
+            csv.writer(f).writerows([IndLoss.FrameColumns]+rows)
+    args = ["--quiet","--delta",str(tmp_path/"index.npz")]
+    ScoreCSV.main(args+[str(tmp_path/"day1.csv"),str(tmp_path/"out1.csv")])
+    ScoreCSV.main(args+[str(tmp_path/"day2.csv"),str(tmp_path/"out2.csv")])
+    ScoreCSV.main(["--quiet",str(tmp_path/"day2.csv"),str(tmp_path/"full.csv")])
+    assert (tmp_path/"out2.csv").read_text() == (tmp_path/"full.csv").read_text()
@@ -79,4 +79,161 @@ def test_BirthDateException():
 
 def test_PersonIdException():
     with pytest.raises(ValueError):
-        AssessRev("","789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")
\ No newline at end of file
+        AssessRev("","789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")
+
+#test that batch scoring of a dataframe matches the per-object path for every status and service combination
+import itertools
+import pandas as pd
+
+def make_frame():
+    rows = []
+    dobs = ["13/07/1935","01/01/1950","29/02/1944","21/05/1960"]
+    for i,(stat,curr,new) in enumerate(itertools.product(StatusRoute,ServType,ServType)):
+        rows.append([str(i),"21/05/2025",dobs[i%len(dobs)],stat,curr,new])
+    return pd.DataFrame(rows,columns=IndLoss.FrameColumns)
+
+def test_scoreFrameMatchesAssessRev():
+    frame = make_frame()
+    scored = IndLoss.score_frame(frame)
+    for row in frame.itertuples(index=False):
+        contact = AssessRev(*row)
+        contact.update_AgeFac()
+        contact.update_ServFac()
+        contact.update_ServChange()
+        contact.update_StatusFac()
+        contact.update_Rag()
+        res = scored[scored["PersonId"]==row.PersonId].iloc[0]
+        assert res["AgeFac"]==float(contact.AgeFac)
+        assert res["ServFac"]==float(contact.ServFac)
+        assert res["ServChange"]==float(contact.ServChange)
+        assert res["StatusFac"]==float(contact.StatusFac)
+        assert res["Rag"]==contact.Rag
+        assert res["RagCategory"]==IndLoss.rag_category(contact.Rag)
+
+def test_scoreFrameValueError():
+    frame = make_frame()
+    frame.loc[3,"NewServ"] = "NotInList"
+    with pytest.raises(ValueError):
+        IndLoss.score_frame(frame)
+
+def test_scoreFrameMissingColumn():
+    with pytest.raises(ValueError):
+        IndLoss.score_frame(make_frame().drop(columns="Status"))
+
+#test that the compiled tables reproduce the original modifier ladders
+def test_tablesAgeBands():
+    tables = IndLoss.Tables
+    assert [float(tables.AgeModify[tables.age_band(a)]) for a in (65,66,75,76,85,86)] == [0.8,1,1,1.2,1.2,1.5]
+
+def test_tablesChangeBands():
+    tables = IndLoss.Tables
+    assert [float(tables.ChangeModify[tables.change_band(c)]) for c in range(-4,5)] == [0.25,0.25,0.5,0.75,1,1.5,1.75,2,2]
+
+def test_tablesRag():
+    assert IndLoss.Tables.rag(89,"Hospital Discharge","Homecare: Low","Homecare: Mid") == 4.3875
+
+def test_tablesValueError():
+    with pytest.raises(ValueError):
+        IndLoss.ModifierTables(AgeModify=[1,1])
+
+#test the date parsing and age calculation
+import datetime as dt
+import numpy as np
+
+def test_parseDate():
+    assert IndLoss.parse_date("21/05/2025") == dt.date(2025,5,21)
+    assert IndLoss.parse_date("2025-05-21") == dt.date(2025,5,21)
+    assert IndLoss.parse_date(dt.datetime(2025,5,21,9,30)) == dt.date(2025,5,21)
+
+def test_parseDateValueError():
+    with pytest.raises(ValueError):
+        IndLoss.parse_date("31/02/2025")
+
+def test_parseDates():
+    vals = ["21/05/2025","2025-05-21","31/02/2025","NotDate","1/5/2025",None,"21/05/20251"]
+    res = IndLoss.parse_dates(vals)
+    assert res.dtype == np.dtype("datetime64[D]")
+    assert res[0] == res[1] == np.datetime64("2025-05-21")
+    assert np.isnat(res[[2,3,5,6]]).all()
+    assert res[4] == np.datetime64("2025-05-01")
+
+def test_ageYearsLeapYears():
+    #floor(days/365) would give 86 here, 21 leap days before the 86th birthday
+    assert IndLoss.age_years(dt.date(1939,6,1),dt.date(2025,5,20)) == 85
+    assert IndLoss.age_years(dt.date(1944,2,29),dt.date(2025,2,28)) == 80
+    assert IndLoss.age_years(dt.date(1944,2,29),dt.date(2025,3,1)) == 81
+
+def test_ageYearsArray():
+    dobs = [dt.date(1939,6,1)+dt.timedelta(days=d) for d in range(0,3000,7)]
+    docs = [dt.date(2025,5,20)+dt.timedelta(days=d) for d in range(0,3000*3,21)]
+    res = IndLoss.age_years_array(np.array(dobs,dtype="datetime64[D]"),np.array(docs,dtype="datetime64[D]"))
+    assert res.tolist() == [IndLoss.age_years(b,c) for b,c in zip(dobs,docs)]
+
+#test that the single record core imports without pandas or numpy
+import os
+import subprocess
+import sys
+
+def test_importStdlibOnly():
+    script = "import sys,IndLoss;a=IndLoss.AssessRev('1','21/05/2025','13/07/1935','Community','None','Equipment');a.update_AgeFac();a.update_Rag();print('numpy' in sys.modules,'pandas' in sys.modules)"
+    out = subprocess.run([sys.executable,"-c",script],capture_output=True,text=True,check=True,cwd=os.path.dirname(os.path.abspath(IndLoss.__file__)))
+    assert out.stdout.split() == ["False","False"]
+
+def test_servInfoLazy():
+    assert IndLoss.ServInfo.at["Homecare: Mid","RiskModifier"] == 1.3
+    assert IndLoss.StatusInfo.at["Hospital Discharge","Modifier"] == 1.5
+
+#test that validation reports every invalid entry with the AssessRev reason
+import re
+
+def test_validateColumns():
+    cols = [["1","","3",None],["21/05/2025","NotDate","21/05/2025","31/02/2025"],["13/07/1935"]*4,
+            ["Community","Community",["Community"],"Transition"],["None","Nope","None","None"],["Equipment"]*4]
+    encoded,valid,errors = IndLoss.validate_columns(*cols)
+    assert valid.tolist() == [True,False,False,False]
+    assert errors["Row"].tolist() == [1,1,1,2,3,3]
+    assert errors["Field"].tolist() == ["PersonId","ContactDate","CurrentServ","Status","PersonId","ContactDate"]
+    assert errors["Reason"][2] == "Nope is not a valid service type."
+    for i in (1,2):
+        with pytest.raises(ValueError,match=re.escape(errors["Reason"][errors["Row"]==i][0])):
+            AssessRev(*(c[i] for c in cols))
+    assert encoded[3].tolist() == [1,1,-1,0]
+
+#test that the pure score function is repeatable, cached, immutable and safe across threads
+from concurrent.futures import ThreadPoolExecutor
+
+def test_scorePure():
+    entries = ("21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")
+    res = IndLoss.score(*entries)
+    assert (res.AgeFac,res.ServFac,res.ServChange,res.StatusFac,res.Rag,res.RagCategory) == (1.5,1.3,1.5,1.5,4.3875,"Red")
+    assert IndLoss.score(*entries) is res
+    with pytest.raises(AttributeError):
+        res.Rag = 1
+    with ThreadPoolExecutor(4) as pool:
+        assert set(pool.map(lambda _: IndLoss.score(*entries),range(100))) == {res}
+    tables = IndLoss.ModifierTables(StatusModify=[1,1,1,1])
+    assert IndLoss.score(*entries,tables=tables).Rag == pytest.approx(2.925)
+    with pytest.raises(ValueError,match="not a valid status"):
+        IndLoss.score("21/05/2025","13/07/1935",["Community"],"None","None")
+
+def test_updateRagIdempotent():
+    contact = AssessRev("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")
+    contact.update_AgeFac()
+    contact.update_ServFac()
+    contact.update_ServChange()
+    contact.update_StatusFac()
+    contact.update_Rag()
+    contact.update_Rag()
+    assert contact.Rag == 4.3875
+    assert contact.score() == IndLoss.score(contact.ContactDate,contact.BirthDate,contact.Status,contact.CurrentServ,contact.NewServ)
+
+#test that missing person ids in a pandas string column are reported per row
+def test_validateColumnsMissingIds():
+    import pandas as pd
+    df = pd.DataFrame({"PersonId":pd.array(["1",pd.NA,None],dtype="string"),"ContactDate":["21/05/2025"]*3,"BirthDate":["13/07/1935"]*3,
+                       "Status":["Community"]*3,"CurrentServ":["None"]*3,"NewServ":["None"]*3})
+    encoded,valid,errors = IndLoss.validate_columns(*(df[col] for col in IndLoss.FrameColumns))
+    assert valid.tolist() == [True,False,False]
+    assert errors["Reason"].tolist() == ["Please enter a person ID"]*2
+    with pytest.raises(ValueError,match="Please enter a person ID"):
+        IndLoss.score_frame(df)
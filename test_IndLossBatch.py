@@ -0,0 +1,127 @@
+#import pytest library
+import pytest
+import numpy as np
+
+#import class to test
+import IndLoss
+from IndLoss import AssessRev
+from IndLossBatch import AssessmentBatch,AssessmentRow
+
+records = [("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"),
+           ("100001","02/01/2024","01/03/1960","Community","None","Equipment"),
+           ("100002","15/08/2023","29/02/1944","Existing Service","Homecare: High","Day Support")]
+
+def scored_assessrev(record):
+    contact = AssessRev(*record)
+    contact.update_AgeFac()
+    contact.update_ServFac()
+    contact.update_ServChange()
+    contact.update_StatusFac()
+    contact.update_Rag()
+    return contact
+
+#test that the batch stores compact typed columns
+def test_batchTypes():
+    batch = AssessmentBatch.from_records(records)
+    assert len(batch) == 3
+    assert batch.ContactDate.dtype == np.dtype("datetime64[D]")
+    assert batch.Status.dtype == np.int8
+    assert batch.NewServ.tolist() == [5,1,2]
+    assert batch.Rag.tolist() == [1,1,1]
+
+#test that scoring matches the per-object path
+def test_batchScoreMatchesAssessRev():
+    batch = AssessmentBatch.from_records(records).score()
+    for row,record in zip(batch,records):
+        contact = scored_assessrev(record)
+        assert isinstance(row,AssessmentRow)
+        assert row.PersonId == contact.PersonId
+        assert row.ContactDate == contact.ContactDate
+        assert row.Status == contact.Status
+        assert (row.AgeFac,row.ServFac,row.ServChange,row.StatusFac,row.Rag) == (contact.AgeFac,contact.ServFac,contact.ServChange,contact.StatusFac,contact.Rag)
+
+#test that rows have no instance dictionary
+def test_rowSlots():
+    row = AssessmentBatch.from_records(records)[0]
+    with pytest.raises(AttributeError):
+        row.__dict__
+
+#test slicing, filtering and appending
+def test_batchSliceSharesMemory():
+    batch = AssessmentBatch.from_records(records)
+    part = batch[1:]
+    part.score()
+    assert batch.Rag[0] == 1 and batch.Rag[1] != 1
+
+def test_batchFilterAppend():
+    batch = AssessmentBatch.from_records(records).score()
+    red = batch.filter(batch.Rag>3)
+    assert [r.PersonId for r in red] == ["789231"]
+    red.append(batch[1:2])
+    assert red.PersonId.tolist() == ["789231","100001"]
+    assert len(AssessmentBatch.concat([batch,batch])) == 6
+
+def test_batchIndexError():
+    with pytest.raises(IndexError):
+        AssessmentBatch.from_records(records)[3]
+
+#test conversion to and from a dataframe
+def test_batchFrameRoundTrip():
+    batch = AssessmentBatch.from_records(records).score()
+    frame = batch.to_frame()
+    assert frame["Status"].tolist() == [r[3] for r in records]
+    back = AssessmentBatch.from_frame(frame)
+    assert back.Rag.tolist() == batch.Rag.tolist()
+    assert (back.BirthDate == batch.BirthDate).all()
+
+#test that invalid entries are handled as in AssessRev
+def test_batchValueError():
+    with pytest.raises(ValueError):
+        AssessmentBatch.from_records(records+[("1","21/05/2025","13/07/1935","NotInList","None","None")])
+
+#test that parallel scoring returns rows in input order with the same results
+import pandas as pd
+import IndLossBatch
+
+def test_scoreParallelMatchesBatch():
+    many = [(str(i),)+r[1:] for i in range(40) for r in records]
+    serial = AssessmentBatch.from_records(many).score()
+    frame = pd.DataFrame(many,columns=IndLoss.FrameColumns)
+    for data in (many,frame,AssessmentBatch.from_records(many)):
+        res = IndLossBatch.score_parallel(data,workers=2,chunksize=7)
+        assert res.PersonId.tolist() == serial.PersonId.tolist()
+        assert res.Rag.tolist() == serial.Rag.tolist()
+
+def test_scoreParallelLeavesInput():
+    batch = AssessmentBatch.from_records(records)
+    for workers in (1,2):
+        res = IndLossBatch.score_parallel(batch,workers=workers,chunksize=2)
+        assert batch.Rag.tolist() == [1,1,1] and batch.AgeBand.tolist() == [-1,-1,-1]
+        assert res.Rag.tolist() == [scored_assessrev(r).Rag for r in records]
+
+def test_scoreParallelTables():
+    tables = IndLoss.ModifierTables(StatusModify=[2,2,2,2])
+    res = IndLossBatch.score_parallel(records,workers=2,chunksize=1,tables=tables)
+    assert res.StatusFac.tolist() == [2,2,2]
+
+def test_scoreParallelValueError():
+    with pytest.raises(ValueError):
+        IndLossBatch.score_parallel(records+[("1","21/05/2025","13/07/1935","NotInList","None","None")],workers=2,chunksize=2)
+
+#test that invalid rows are reported and only the valid rows kept
+def test_validateRecords():
+    rows = [list(r) for r in records]+[["100003","NotDate","29/02/1944","NotInList","None","None"]]
+    batch,valid,errors = IndLossBatch.validate_records(rows)
+    assert len(batch) == 3 and valid.tolist() == [True,True,True,False]
+    assert list(zip(errors["Row"],errors["Field"])) == [(3,"ContactDate"),(3,"Status")]
+    batch,valid,rejects = IndLossBatch.score_rows(rows)
+    assert valid == [0,1,2] and rejects == [(3,"Contact Date is not valid")]
+    assert batch.Rag.tolist() == [scored_assessrev(r).Rag for r in records]
+
+#test that entries which are themselves lists are rejected rather than changing the shape of the columns
+def test_scoreRowsListEntries():
+    rows = [list(records[0]),[records[0][0],[1,2]]+list(records[0][2:]),[records[0][0],records[0][1],[3,4],["Community","x"]]+list(records[0][4:])]
+    batch,valid,rejects = IndLossBatch.score_rows(rows)
+    assert valid == [0] and rejects == [(1,"Contact Date is not valid"),(2,"Birth Date is not a valid date")]
+    batch,valid,rejects = IndLossBatch.score_rows([rows[1]])
+    assert valid == [] and rejects == [(0,"Contact Date is not valid")]
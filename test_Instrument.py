@@ -0,0 +1,102 @@
+#import pytest library
+import pytest
+import json
+
+#import functions to test
+import IndLoss
+from IndLoss import AssessRev
+import Instrument
+
+@pytest.fixture
+def instrumented():
+    Instrument.reset()
+    Instrument.enable()
+    yield
+    Instrument.disable()
+    Instrument.reset()
+
+def score(record):
+    contact = AssessRev(*record)
+    contact.update_AgeFac()
+    contact.update_ServFac()
+    contact.update_ServChange()
+    contact.update_StatusFac()
+    contact.update_Rag()
+    return contact
+
+record = ("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")
+
+#test that disabled mode leaves the original functions in place
+def test_disabledUnwrapped():
+    original = AssessRev.__dict__["update_AgeFac"]
+    Instrument.enable()
+    assert AssessRev.__dict__["update_AgeFac"] is not original
+    Instrument.disable()
+    assert AssessRev.__dict__["update_AgeFac"] is original
+    assert not Instrument.is_enabled()
+
+#test that calls, rejections and latencies are counted
+def test_countsAndRejections(instrumented):
+    for _ in range(5):
+        assert score(record).Rag == 4.3875
+    with pytest.raises(ValueError):
+        AssessRev("1","21/05/2025","13/07/1935","NotInList","None","None")
+    stats = Instrument.snapshot()
+    assert stats["construct"]["calls"] == 6
+    assert stats["construct"]["rejected"] == 1
+    assert stats["construct"]["reasons"] == {"NotInList not a valid status.":1}
+    assert stats["update_Rag"]["calls"] == 5
+    assert stats["update_AgeFac"]["p99_us"] >= stats["update_AgeFac"]["p50_us"] > 0
+
+def test_batchRows(instrumented):
+    import pandas as pd
+    IndLoss.score_frame(pd.DataFrame([record]*10,columns=IndLoss.FrameColumns))
+    stats = Instrument.snapshot()
+    assert stats["score_frame"]["rows"] == 10
+    assert stats["encode_columns"]["calls"] == 1
+
+#test that counters can be reset and dumped
+def test_resetDump(instrumented,tmp_path):
+    score(record)
+    data = json.loads(Instrument.dump_json(tmp_path/"m.json"))
+    assert data["enabled"] and data["stages"]["update_ServFac"]["calls"] == 1
+    assert json.loads((tmp_path/"m.json").read_text()) == data
+    Instrument.reset()
+    assert Instrument.snapshot() == {}
+
+def test_stageContext(instrumented):
+    with Instrument.stage("custom",rows=3):
+        pass
+    assert Instrument.snapshot()["custom"]["rows"] == 3
+
+#test that distinct rejection reasons are capped
+def test_reasonsCapped(instrumented):
+    for i in range(Instrument.MaxReasons+10):
+        with pytest.raises(ValueError):
+            AssessRev("1","21/05/2025","13/07/1935",f"Status{i}","None","None")
+    reasons = Instrument.snapshot()["construct"]["reasons"]
+    assert len(reasons) == Instrument.MaxReasons+1
+    assert reasons[Instrument.OtherReasons] == 10
+
+#test that delta scoring is counted once enabled
+def test_deltaScoreRows(instrumented):
+    import Delta
+    Delta.DeltaTracker().score_rows([list(record)])
+    assert Instrument.snapshot()["score_rows"]["calls"] == 1
+
+#test that rows rejected by the batch path are counted by field, without counting the per-row date fallback
+def test_batchRejections(tmp_path):
+    import ScoreCSV
+    rows = [record,("100001","31/02/2024","01/03/1960","Community","None","Equipment"),
+            ("100002","15/08/2023","29/02/1944","Community","Nothing","Elsewhere")]
+    with open(tmp_path/"in.csv","w") as f:
+        f.write(",".join(IndLoss.FrameColumns)+"\n")
+        f.writelines(",".join(r)+"\n" for r in rows)
+    Instrument.reset()
+    assert ScoreCSV.main([str(tmp_path/"in.csv"),str(tmp_path/"out.csv"),"--quiet","--metrics",str(tmp_path/"m.json")]) == 0
+    stages = json.loads((tmp_path/"m.json").read_text())["stages"]
+    Instrument.reset()
+    assert stages["validate_columns"]["rejected"] == 2
+    assert stages["validate_columns"]["fields"] == {"ContactDate":1,"CurrentServ":1,"NewServ":1}
+    assert stages["validate_columns"]["reasons"]["Contact Date is not valid"] == 1
+    assert "parse_date" not in stages
@@ -0,0 +1,57 @@
+#import pytest library
+import pytest
+import itertools
+
+#import functions to test
+import IndLoss
+from IndLoss import ModifierTables,ServType,StatusRoute
+from IndLossBatch import AssessmentBatch
+import Rescore
+
+def make_batch():
+    dobs = ["13/07/1935","01/06/1939","29/02/1944","21/05/1960"]
+    rows = [(str(i),"20/05/2025",dobs[i%len(dobs)],stat,curr,new) for i,(stat,curr,new) in enumerate(itertools.product(StatusRoute,ServType,ServType))]
+    return AssessmentBatch.from_records(rows).score()
+
+def assert_matches_full_rescore(batch,tables):
+    full = AssessmentBatch(*(getattr(batch,col) for col in IndLoss.FrameColumns)).score(tables)
+    for col in ["AgeBand","ChangeBand"]+IndLoss.ScoreColumns:
+        assert getattr(batch,col).tolist() == getattr(full,col).tolist()
+
+#test that changing each list only updates the rows using the changed entries
+def test_rescoreServModify():
+    batch = make_batch()
+    newTables = ModifierTables(ServModify=[0.2,0.6,0.8,1,1.1,1.4,1.5])
+    report = Rescore.rescore(batch,IndLoss.Tables,newTables)
+    assert report["ServFac"] == len(StatusRoute)*len(ServType)
+    assert report["StatusFac"] == report["ServChange"] == report["AgeFac"] == 0
+    assert_matches_full_rescore(batch,newTables)
+
+def test_rescoreStatusModify():
+    batch = make_batch()
+    newTables = ModifierTables(StatusModify=[1.2,1.2,1.6,1])
+    report = Rescore.rescore(batch,IndLoss.Tables,newTables)
+    assert report["StatusFac"] == report["Rag"] == len(ServType)**2
+    assert_matches_full_rescore(batch,newTables)
+
+def test_rescoreBands():
+    batch = make_batch()
+    newTables = ModifierTables(AgeBreaks=[66,76,85],ChangeBreaks=[-3,-1,0,1,2,3],ServIntens=[1,2,3,4,5,6,8])
+    report = Rescore.rescore(batch,IndLoss.Tables,newTables)
+    assert 0 < report["AgeFac"] < len(batch)
+    assert 0 < report["ServChange"] < len(batch)
+    assert_matches_full_rescore(batch,newTables)
+
+#test that scores are saved with their version and rescored from file
+def test_rescoreFile(tmp_path):
+    path = tmp_path/"scores.npz"
+    Rescore.save_scores(path,make_batch())
+    batch,tables = Rescore.load_scores(path)
+    assert tables.Version == IndLoss.Tables.Version
+    newTables = ModifierTables(AgeModify=[0.8,1,1.3,1.5])
+    report = Rescore.rescore_file(path,newTables)
+    assert report["AgeFac"] > 0
+    batch,tables = Rescore.load_scores(path)
+    assert tables.Version == newTables.Version != IndLoss.Tables.Version
+    assert batch.PersonId[0] == "0"
+    assert_matches_full_rescore(batch,newTables)
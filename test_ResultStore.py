@@ -0,0 +1,86 @@
+#import pytest library
+import pytest
+import datetime as dt
+
+#import class to test
+import IndLoss
+from IndLoss import AssessRev
+from IndLossBatch import AssessmentBatch
+from ResultStore import ResultStore
+import ScoreCSV
+
+records = [("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"),
+           ("789231","02/01/2024","13/07/1935","Community","None","Homecare: Low"),
+           ("100002","15/08/2023","29/02/1944","Existing Service","Homecare: High","Day Support")]
+
+#test that a single scored contact is stored with its factors and category
+def test_addContact():
+    contact = AssessRev(*records[0])
+    contact.update_AgeFac()
+    contact.update_ServFac()
+    contact.update_ServChange()
+    contact.update_StatusFac()
+    contact.update_Rag()
+    with ResultStore(":memory:") as store:
+        assert store.add(contact) == 1
+        res = store.latest("789231")
+    assert res["Rag"] == 4.3875 and res["RagCategory"] == "Red"
+    assert res["ContactDate"] == "2025-05-21"
+    assert res["TablesVersion"] == IndLoss.Tables.Version
+
+#test bulk inserts and lookups
+def test_addBatchLookups(tmp_path):
+    with ResultStore(tmp_path/"res.db") as store:
+        assert store.add_batch(AssessmentBatch.from_records(records).score()) == 3
+        assert store.count() == 3
+        assert [r["ContactDate"] for r in store.person("789231")] == ["2024-01-02","2025-05-21"]
+        assert store.latest("789231")["Status"] == "Hospital Discharge"
+        assert store.latest("nobody") is None
+        assert [r["PersonId"] for r in store.between("01/01/2023",dt.date(2024,12,31))] == ["100002","789231"]
+    with ResultStore(tmp_path/"res.db") as store:
+        assert store.count() == 3
+
+#test that the csv tool saves results to the store
+def test_scoreCsvStore(tmp_path):
+    with open(tmp_path/"in.csv","w") as f:
+        f.write(",".join(IndLoss.FrameColumns)+"\n")
+        f.writelines(",".join(r)+"\n" for r in records)
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",storePath=tmp_path/"res.db")
+    with ResultStore(tmp_path/"res.db") as store:
+        assert store.count() == 3
+    #storing the same caseload again replaces rather than duplicates its results
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",storePath=tmp_path/"res.db")
+    with ResultStore(tmp_path/"res.db") as store:
+        assert store.count() == 3
+    other = IndLoss.ModifierTables(StatusModify=[1,1,1,1])
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",storePath=tmp_path/"res.db",tables=other)
+    with ResultStore(tmp_path/"res.db") as store:
+        assert store.count() == 6
+
+#test that two contacts of a person on the same day are both kept, and latest only returns the asked tables version
+def test_sameDayContacts(tmp_path):
+    sameDay = records[:1]+[("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Direct Payment")]
+    with open(tmp_path/"in.csv","w") as f:
+        f.write(",".join(IndLoss.FrameColumns)+"\n")
+        f.writelines(",".join(r)+"\n" for r in sameDay)
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",storePath=tmp_path/"res.db")
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",storePath=tmp_path/"res.db")
+    other = IndLoss.ModifierTables(StatusModify=[1,1,1,1])
+    with ResultStore(tmp_path/"res.db") as store:
+        assert [r["NewServ"] for r in store.person("789231")] == ["Homecare: Mid","Direct Payment"]
+        assert store.latest("789231")["NewServ"] == "Direct Payment"
+        assert store.latest("789231",other) is None
+        store.add_batch(AssessmentBatch.from_records(sameDay[:1]).score(other),other)
+        assert store.latest("789231",other)["TablesVersion"] == other.Version
+        assert store.latest("789231")["TablesVersion"] == IndLoss.Tables.Version
+
+#test that a database keyed only on person, contact date and tables version is moved to the full key
+def test_keyMigration(tmp_path):
+    import sqlite3
+    import ResultStore as rs
+    conn = sqlite3.connect(tmp_path/"res.db")
+    conn.executescript(rs.Schema+"CREATE UNIQUE INDEX results_key ON results (PersonId, ContactDate, TablesVersion);")
+    conn.close()
+    with ResultStore(tmp_path/"res.db") as store:
+        store.add_batch(AssessmentBatch.from_records(records[:1]*2+[records[0][:5]+("Direct Payment",)]).score())
+        assert store.count() == 2
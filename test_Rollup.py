@@ -0,0 +1,91 @@
+#import pytest library
+import pytest
+import math
+import datetime as dt
+import numpy as np
+
+#import class to test
+import IndLoss
+from IndLossBatch import AssessmentBatch
+from Rollup import RagRollup,age_band_labels
+import ScoreCSV
+from test_ScoreCSV import write_input
+
+records = [("1","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"),
+           ("2","02/05/2025","01/03/1960","Community","None","Equipment"),
+           ("3","15/08/2023","29/02/1944","Community","None","Equipment"),
+           ("4","30/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid")]
+
+@pytest.fixture
+def batch():
+    return AssessmentBatch.from_records(records).score()
+
+def test_ageBandLabels():
+    assert age_band_labels() == ["<66","66-75","76-85","86+"]
+
+#test that queries match grouping the rows directly
+def test_query(batch):
+    rollup = RagRollup()
+    rollup.add(batch[:2])
+    rollup.add(batch[2:])
+    assert len(rollup.months()) == 22
+    res = rollup.query()
+    assert (res["Rows"],res["Green"],res["Amber"],res["Red"]) == (4,1,1,2)
+    assert res["MeanRag"] == pytest.approx(batch.Rag.mean())
+    res = rollup.query(Status="Hospital Discharge",start="01/05/2025",end="31/05/2025")
+    assert res["Rows"] == 2 and res["MeanRag"] == pytest.approx(4.3875)
+    assert rollup.query(Status="Community",start="01/01/2024")["Rows"] == 1
+    assert math.isnan(rollup.query(AgeBand="<66",Status="Transition")["MeanRag"])
+    with pytest.raises(ValueError):
+        rollup.query(Status="NotInList")
+
+#test grouping, removing rows and saving
+def test_frameSubtractSave(batch,tmp_path):
+    rollup = RagRollup()
+    rollup.add(batch)
+    df = rollup.to_frame(by=["Month","Status"])
+    assert df[["Month","Status","Rows"]].values.tolist() == [["2023-08","Community",1],["2025-05","Community",1],["2025-05","Hospital Discharge",2]]
+    df = rollup.to_frame(by=["NewServ","AgeBand"],Status=["Community"])
+    assert df[["NewServ","AgeBand","Rows"]].values.tolist() == [["Equipment","<66",1],["Equipment","76-85",1]]
+    rollup.subtract(batch[3:])
+    rollup.save(tmp_path/"rollup.npz")
+    loaded = RagRollup.load(tmp_path/"rollup.npz")
+    assert loaded.query()["Rows"] == 3
+    assert np.array_equal(loaded.months(),rollup.months())
+
+#test that the csv tool updates a rollup as chunks are scored
+def test_scoreCsvRollup(tmp_path):
+    write_input(tmp_path/"in.csv")
+    rollup = RagRollup()
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",chunksize=2,rollup=rollup)
+    assert rollup.query()["Rows"] == 3
+    ScoreCSV.main(["--quiet","--rollup",str(tmp_path/"rollup.npz"),str(tmp_path/"in.csv"),str(tmp_path/"out.csv")])
+    ScoreCSV.main(["--quiet","--rollup",str(tmp_path/"rollup.npz"),str(tmp_path/"in.csv"),str(tmp_path/"out.csv")])
+    assert RagRollup.load(tmp_path/"rollup.npz").query()["Rows"] == 3
+    other = IndLoss.ModifierTables(StatusModify=[1,1,1,1])
+    with pytest.raises(ValueError):
+        ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",rollup=rollup,tables=other)
+    with pytest.raises(ValueError):
+        rollup.add(AssessmentBatch.from_records(records).score(other),other.Version)
+
+#test that contact months outside the window are left out and reported rather than growing the month axis
+def test_window(tmp_path):
+    typo = records[:1]+[("5","21/05/0025","13/07/1935","Community","None","Equipment")]
+    rollup = RagRollup()
+    assert rollup.add(AssessmentBatch.from_records(typo).score()).tolist() == [1]
+    assert len(rollup.months()) == 1 and rollup.Outside == 1
+    assert rollup.subtract(AssessmentBatch.from_records(typo).score()).tolist() == [1]
+    assert rollup.query()["Rows"] == 0 and rollup.Outside == 0
+    rollup = RagRollup(start="01/01/2024",end=dt.date(2025,12,31))
+    assert rollup.add(AssessmentBatch.from_records(records).score()).tolist() == [2]
+    rollup.save(tmp_path/"rollup.npz")
+    loaded = RagRollup.load(tmp_path/"rollup.npz")
+    assert loaded.Outside == 1 and str(loaded.Window[0]) == "2024-01" and loaded.query()["Rows"] == 3
+    with pytest.raises(ValueError):
+        RagRollup(start="01/01/2025",end="01/01/2024")
+    with open(tmp_path/"in.csv","w") as f:
+        f.write(",".join(IndLoss.FrameColumns)+"\n")
+        f.writelines(",".join(r)+"\n" for r in typo)
+    stats = ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",rejectsPath=tmp_path/"rej.csv",rollup=RagRollup())
+    assert (stats["scored"],stats["rejected"],stats["outside_rollup"]) == (2,0,1)
+    assert "outside the rollup window" in (tmp_path/"rej.csv").read_text()
@@ -0,0 +1,92 @@
+#import pytest library
+import pytest
+import csv
+import json
+import threading
+
+#import functions to test
+import ScoreCSV
+from IndLoss import FrameColumns
+
+rows = [["789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"],
+        ["100001","02/01/2024","01/03/1960","Community","None","Equipment"],
+        ["100002","NotDate","29/02/1944","Existing Service","Homecare: High","Day Support"],
+        ["100003","15/08/2023","29/02/1944","NotInList","Homecare: High","Day Support"],
+        ["100004","15/08/2023","29/02/1944","Transition","None","Homecare: High"]]
+
+def write_input(path):
+    with open(path,"w",newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Extra"]+FrameColumns)
+        writer.writerows(["x"]+r for r in rows)
+
+#test that a csv is scored in chunks with invalid rows rejected
+def test_scoreCsv(tmp_path):
+    write_input(tmp_path/"in.csv")
+    stats = ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",chunksize=2,rejectsPath=tmp_path/"rej.csv")
+    assert (stats["rows"],stats["scored"],stats["rejected"]) == (5,3,2)
+    with open(tmp_path/"out.csv",newline="") as f:
+        out = list(csv.DictReader(f))
+    assert [r["PersonId"] for r in out] == ["789231","100001","100004"]
+    assert float(out[0]["Rag"]) == 4.3875
+    assert out[0]["RagCategory"] == "Red"
+    with open(tmp_path/"rej.csv",newline="") as f:
+        rej = list(csv.DictReader(f))
+    assert [r["Row"] for r in rej] == ["3","4"]
+    assert rej[0]["Reason"] == "Contact Date is not valid"
+
+def test_scoreJsonl(tmp_path):
+    write_input(tmp_path/"in.csv")
+    ScoreCSV.main(["--quiet",str(tmp_path/"in.csv"),str(tmp_path/"out.jsonl")])
+    with open(tmp_path/"out.jsonl") as f:
+        out = [json.loads(line) for line in f]
+    assert len(out) == 3
+    assert out[0]["Rag"] == 4.3875
+
+def test_missingColumn(tmp_path):
+    with open(tmp_path/"in.csv","w") as f:
+        f.write("PersonId,ContactDate\n1,21/05/2025\n")
+    with pytest.raises(ValueError):
+        ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv")
+
+def test_scoreCsvWorkers(tmp_path):
+    write_input(tmp_path/"in.csv")
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"one.csv",chunksize=2)
+    stats = ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"two.csv",chunksize=2,workers=2)
+    assert stats["scored"] == 3
+    assert (tmp_path/"one.csv").read_text() == (tmp_path/"two.csv").read_text()
+
+#test the rag counts and that scoring stops after the current chunk once cancelled
+def test_scoreCsvCancel(tmp_path):
+    write_input(tmp_path/"in.csv")
+    cancel = threading.Event()
+    stats = ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",chunksize=2,progress=lambda stats: cancel.set(),cancel=cancel)
+    assert stats["cancelled"] and stats["rows"] == 2
+    stats = ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",chunksize=2)
+    assert not stats["cancelled"]
+    assert (stats["Green"],stats["Amber"],stats["Red"]) == (1,0,2)
+
+#test that byte ranges cover every line once, and that workers scoring them report the same rejects as one process
+def test_csvRanges(tmp_path):
+    write_input(tmp_path/"in.csv")
+    header,ranges = ScoreCSV.csv_ranges(tmp_path/"in.csv",chunksize=2)
+    data = (tmp_path/"in.csv").read_bytes()
+    assert header == ["Extra"]+FrameColumns and len(ranges) >= 2
+    assert b"".join(data[start:end] for start,end in ranges) == data[data.index(b"\n")+1:]
+    assert all(data[end-1:end] == b"\n" for start,end in ranges)
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"one.csv",chunksize=2,rejectsPath=tmp_path/"rej1.csv")
+    ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"two.jsonl",chunksize=1,workers=2,rejectsPath=tmp_path/"rej2.csv")
+    assert (tmp_path/"rej1.csv").read_text() == (tmp_path/"rej2.csv").read_text()
+    assert len((tmp_path/"two.jsonl").read_text().splitlines()) == 3
+    (tmp_path/"empty.csv").write_text("")
+    assert ScoreCSV.csv_ranges(tmp_path/"empty.csv") == (None,[])
+    assert ScoreCSV.score_csv(tmp_path/"empty.csv",tmp_path/"out.csv",workers=2)["rows"] == 0
+
+#test that a quoted entry split across ranges is caught rather than misread
+def test_csvRangesQuoted(tmp_path):
+    with open(tmp_path/"in.csv","w",newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FrameColumns)
+        writer.writerows([r if i!=2 else ["line\nbreak"]+r[1:] for i,r in enumerate(rows)])
+    with pytest.raises(ValueError):
+        ScoreCSV.score_csv(tmp_path/"in.csv",tmp_path/"out.csv",chunksize=1,workers=2)
@@ -0,0 +1,88 @@
+#import pytest library
+import pytest
+import http.client
+import json
+import threading
+
+#import functions to test
+import ScoreServer
+
+record = {"PersonId":"789231","ContactDate":"21/05/2025","BirthDate":"13/07/1935","Status":"Hospital Discharge","CurrentServ":"Homecare: Low","NewServ":"Homecare: Mid"}
+
+@pytest.fixture(scope="module")
+def server():
+    srv = ScoreServer.ScoreServer(("127.0.0.1",0))
+    thread = threading.Thread(target=srv.serve_forever,daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def request(conn,method,path,body=None):
+    conn.request(method,path,body=None if body is None else json.dumps(body),headers={"Content-Type":"application/json"})
+    resp = conn.getresponse()
+    return resp.status,json.loads(resp.read())
+
+#test the single record endpoint, reusing one connection
+def test_scoreSingle(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    status,body = request(conn,"POST","/score",record)
+    assert status == 200
+    assert body["Rag"] == 4.3875 and body["RagCategory"] == "Red"
+    status,body = request(conn,"POST","/score",dict(record,Status="NotInList"))
+    assert status == 400
+    assert body["error"] == "NotInList not a valid status."
+    conn.close()
+
+#test the batch endpoint reports invalid records without failing the batch
+def test_scoreBatch(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    records = [record]*1000+[dict(record,ContactDate="NotDate"),{"PersonId":1},dict(record,PersonId=12)]
+    status,body = request(conn,"POST","/score/batch",{"records":records})
+    assert status == 200
+    assert body["scored"] == 1001
+    assert [r["index"] for r in body["rejected"]] == [1000,1001]
+    assert body["results"][-1] == {"index":1002,"PersonId":"12","AgeFac":1.5,"ServFac":1.3,"ServChange":1.5,"StatusFac":1.5,"Rag":4.3875,"RagCategory":"Red"}
+    conn.close()
+
+#test that list valued entries are rejected per record rather than failing the request
+def test_listValues(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    records = [dict(record,ContactDate=[1,2]),record,dict(record,Status=["Community"]),dict(record,ContactDate=[3,4])]
+    status,body = request(conn,"POST","/score/batch",{"records":records})
+    assert status == 200
+    assert body["scored"] == 1 and body["results"][0]["index"] == 1
+    assert body["rejected"] == [{"index":0,"reason":"ContactDate must be a single value"},{"index":2,"reason":"Status must be a single value"},
+                                {"index":3,"reason":"ContactDate must be a single value"}]
+    status,body = request(conn,"POST","/score",dict(record,BirthDate=[1,2]))
+    assert status == 400 and body["error"] == "BirthDate must be a single value"
+    conn.close()
+
+#test the health and metrics endpoints
+def test_healthMetrics(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    status,body = request(conn,"GET","/health")
+    assert status == 200 and body["status"] == "ok"
+    status,body = request(conn,"GET","/metrics")
+    assert body["records"]["scored"] >= 1
+    status,body = request(conn,"GET","/nothing")
+    assert status == 404
+    conn.close()
+
+def test_badJson(server):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request("POST","/score/batch",body=b"{not json")
+    assert conn.getresponse().status == 400
+    conn.close()
+
+#test that a negative or non-numeric Content-Length is rejected rather than read
+@pytest.mark.parametrize("length",["-5","abc"])
+def test_badLength(server,length):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.putrequest("POST","/score")
+    conn.putheader("Content-Length",length)
+    conn.endheaders()
+    resp = conn.getresponse()
+    assert resp.status == 400
+    assert "Content-Length" in json.loads(resp.read())["error"]
+    conn.close()
@@ -0,0 +1,61 @@
+#import pytest library
+import pytest
+import numpy as np
+
+#import functions to test
+import IndLoss
+from IndLossBatch import AssessmentBatch
+import Snapshot
+from test_ScoreCSV import write_input
+
+records = [("789231","21/05/2025","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"),
+           ("100001","02/01/2024","01/03/1960","Community","None","Equipment"),
+           ("789231","15/08/2023","13/07/1935","Existing Service","Homecare: High","Day Support"),
+           ("100004","15/08/2023","29/02/1944","Transition","None","Homecare: High")]
+
+#test that a snapshot reads back the same rows without copying the mapped columns
+def test_writeOpen(tmp_path):
+    batch = AssessmentBatch.from_records(records)
+    Snapshot.write_snapshot(tmp_path/"snap",batch)
+    snap = Snapshot.Snapshot(tmp_path/"snap")
+    assert len(snap) == 4 and snap.Version is None
+    assert list(snap.person_ids()) == ["789231","100001","100004"]
+    part = snap.batch(1,3)
+    assert list(part.PersonId) == ["100001","789231"]
+    assert np.array_equal(part.ContactDate,batch.ContactDate[1:3])
+    assert part.Status.flags.writeable and not snap.columns["Status"].flags.writeable
+    assert np.array_equal(snap.score()["Rag"],AssessmentBatch.from_records(records).score().Rag)
+
+#test scoring a snapshot in place, in one process and across two
+@pytest.mark.parametrize("workers",[1,2])
+def test_scoreSnapshot(tmp_path,workers):
+    Snapshot.write_snapshot(tmp_path/"snap",AssessmentBatch.from_records(records))
+    snap = Snapshot.score_snapshot(tmp_path/"snap",workers=workers,chunksize=3)
+    assert snap.Version == IndLoss.Tables.Version
+    expected = AssessmentBatch.from_records(records).score()
+    scored = snap.batch()
+    for col in ["AgeBand","ChangeBand"]+IndLoss.ScoreColumns:
+        assert getattr(scored,col).tolist() == getattr(expected,col).tolist()
+
+#test that a scored snapshot can be rescored in memory without changing its files
+def test_rescoreSnapshot(tmp_path):
+    import Rescore
+    Snapshot.write_snapshot(tmp_path/"snap",AssessmentBatch.from_records(records))
+    snap = Snapshot.score_snapshot(tmp_path/"snap")
+    newTables = IndLoss.ModifierTables(StatusModify=[1.2,1.2,1.6,1])
+    expected = AssessmentBatch.from_records(records).score(newTables)
+    rescored = snap.batch()
+    Rescore.rescore(rescored,IndLoss.Tables,newTables)
+    assert rescored.Rag.tolist() == expected.Rag.tolist()
+    assert snap.batch().score(newTables).Rag.tolist() == expected.Rag.tolist()
+    assert Snapshot.Snapshot(tmp_path/"snap").batch().Rag.tolist() == AssessmentBatch.from_records(records).score().Rag.tolist()
+
+#test writing from a csv with invalid rows left out
+def test_snapshotCsv(tmp_path):
+    write_input(tmp_path/"in.csv")
+    stats = Snapshot.snapshot_csv(tmp_path/"in.csv",tmp_path/"snap",chunksize=2)
+    assert (stats["rows"],stats["written"],stats["rejected"]) == (5,3,2)
+    assert Snapshot.main(["score",str(tmp_path/"snap")]) == 0
+    assert Snapshot.Snapshot(tmp_path/"snap").batch().Rag[0] == 4.3875
+    with pytest.raises(ValueError):
+        Snapshot.Snapshot(tmp_path)
@@ -0,0 +1,38 @@
+#import pytest library
+import pytest
+import numpy as np
+
+#import functions to test
+import IndLoss
+from IndLoss import ModifierTables
+import Benchmark
+import Snapshot
+import Sweep
+
+@pytest.fixture
+def batch():
+    return Benchmark.make_batch(5000,3)
+
+#test that the sweep gives the same totals as rescoring every row with each candidate
+def test_sweepMatchesRescore(batch):
+    candidates = Sweep.candidate_grid(AgeModify=[[0.8,1,1.2,1.5],[0.5,1,2,3]],AgeBreaks=[[66,76,86],[70,80,90]],StatusModify=[[1.2,1.2,1.5,1],[2,1,1,1]])
+    assert len(candidates) == 8
+    results = Sweep.sweep(batch,candidates+[{"AgeBreaks":[80],"AgeModify":[1,4]}],chunksize=1000)
+    assert len(results) == 9
+    for tables,res in zip(candidates+[ModifierTables(AgeBreaks=[80],AgeModify=[1,4])],results):
+        rag = batch.score(tables).Rag
+        cats = IndLoss.rag_categories(rag)
+        assert res["Version"] == tables.Version
+        assert (res["Rows"],res["Green"],res["Amber"],res["Red"]) == (5000,(cats=="Green").sum(),(cats=="Amber").sum(),(cats=="Red").sum())
+        assert res["MeanRag"] == pytest.approx(rag.mean())
+        assert res["P50"] == np.sort(rag)[2499]
+        assert res["Changed"] == (cats!=IndLoss.rag_categories(batch.score().Rag)).sum()
+    assert results[0]["Changed"] == 0
+
+#test that a snapshot and a profile give the same sweep as the batch
+def test_sweepSources(batch,tmp_path):
+    Snapshot.write_snapshot(tmp_path/"snap",batch)
+    profile = Sweep.CaseloadProfile.from_batch(batch)
+    assert profile.Rows == 5000
+    candidates = [IndLoss.Tables,ModifierTables(ServModify=[1]*7)]
+    assert Sweep.sweep(Snapshot.Snapshot(tmp_path/"snap"),candidates,chunksize=999) == Sweep.sweep(profile,candidates)
@@ -0,0 +1,43 @@
+#import pytest library
+import pytest
+import datetime as dt
+
+#import class to test
+from IndLossBatch import AssessmentBatch
+from Timeline import TimelineIndex
+
+#person 1 moves from Amber to Red, person 2 stays Red, person 3 is Green then has no later review
+records = [("1","01/06/2024","13/07/1940","Community","None","Homecare: Low"),
+           ("2","01/01/2024","13/07/1935","Hospital Discharge","Homecare: Low","Homecare: Mid"),
+           ("1","01/01/2024","13/07/1940","Community","None","Equipment"),
+           ("3","01/03/2024","01/03/1960","Community","None","Equipment"),
+           ("2","01/07/2024","13/07/1935","Hospital Discharge","Homecare: Mid","Homecare: High"),
+           ("1","01/09/2024","13/07/1940","Hospital Discharge","Homecare: Low","Homecare: High")]
+
+@pytest.fixture
+def index():
+    return TimelineIndex(AssessmentBatch.from_records(records).score())
+
+#test lookups for one person
+def test_personLookups(index):
+    assert [str(d) for d in index.person("1").ContactDate] == ["2024-01-01","2024-06-01","2024-09-01"]
+    assert index.latest("1").ContactDate == dt.date(2024,9,1)
+    assert index.as_of("1","15/06/2024").ContactDate == dt.date(2024,6,1)
+    assert index.as_of("1","01/06/2024").ContactDate == dt.date(2024,6,1)
+    assert index.as_of("1","31/12/2023") is None
+    assert index.latest("9") is None and len(index.person("9")) == 0 and "9" not in index
+
+#test queries across every person
+def test_allPeople(index):
+    assert list(index.latest_all().PersonId) == ["1","2","3"]
+    assert [str(d) for d in index.as_of_all("01/02/2024").ContactDate] == ["2024-01-01","2024-01-01"]
+    before,after = index.moved_to_red("01/02/2024","01/10/2024")
+    assert list(after.PersonId) == ["1"]
+    assert before.Rag[0] <= 3 < after.Rag[0]
+
+#test adding more assessments keeps each person in date order
+def test_add(index):
+    index.add(AssessmentBatch.from_records([("3","01/01/2025","01/03/1960","Hospital Discharge","None","Homecare: High")]).score())
+    assert len(index) == 7
+    assert index.latest("3").ContactDate == dt.date(2025,1,1)
+    assert list(index.moved_to_red("01/04/2024","01/02/2025")[1].PersonId) == ["1","3"]
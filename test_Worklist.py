@@ -0,0 +1,80 @@
+#import pytest library
+import pytest
+import csv
+import random
+import numpy as np
+
+#import class to test
+from IndLoss import ServType,StatusRoute,FrameColumns
+from IndLossBatch import AssessmentBatch
+from Worklist import Worklist,WorklistColumns
+import ScoreCSV
+
+def make_records(n,seed=1):
+    rng = random.Random(seed)
+    return [(str(i),"21/05/2025",f"13/07/{rng.randint(1925,1975)}",rng.choice(StatusRoute),rng.choice(ServType),rng.choice(ServType)) for i in range(n)]
+
+def expected(batch,k,groups):
+    #top k of each group from a full sort, highest rag first and earliest first on ties
+    out = {}
+    for group in sorted(set(groups),key=str):
+        rows = [i for i in range(len(batch)) if groups[i]==group]
+        out[group] = [batch.PersonId[i] for i in sorted(rows,key=lambda i: (-batch.Rag[i],i))[:k]]
+    return out
+
+#test that records added one at a time and in batches give the same lists as sorting everything
+def test_matchesFullSort():
+    records = make_records(500)
+    batch = AssessmentBatch.from_records(records).score()
+    single = Worklist(5)
+    for record in records:
+        single.add(*record)
+    batched = Worklist(5)
+    for start in range(0,len(batch),64):
+        batched.add_batch(batch[start:start+64])
+    statuses = [StatusRoute[c] for c in batch.Status]
+    want = expected(batch,5,statuses)
+    for worklist in (single,batched):
+        ranked = worklist.ranked()
+        assert list(ranked) == [s for s in StatusRoute if s in want]
+        assert {g:[e.PersonId for e in entries] for g,entries in ranked.items()} == want
+        assert len(worklist) == sum(len(v) for v in want.values())
+    assert single.ranked() == batched.ranked()
+    top = single.ranked()["Hospital Discharge"][0]
+    assert top.Rank == 1 and top.Rag == pytest.approx(top.AgeFac*top.ServFac*top.ServChange*top.StatusFac)
+
+#test grouping by team and a single group
+def test_groups():
+    records = make_records(200,seed=2)
+    batch = AssessmentBatch.from_records(records).score()
+    teams = np.array([f"Team {i%3}" for i in range(len(batch))])
+    worklist = Worklist(3)
+    worklist.add_batch(batch,groups=teams)
+    assert {g:[e.PersonId for e in entries] for g,entries in worklist.ranked().items()} == expected(batch,3,teams.tolist())
+    whole = Worklist(4,by=None)
+    whole.add_batch(batch)
+    assert [e.PersonId for e in whole.ranked()["All"]] == expected(batch,4,["All"]*len(batch))["All"]
+    with pytest.raises(ValueError):
+        Worklist(0)
+    with pytest.raises(ValueError):
+        Worklist(by="PersonId")
+    with pytest.raises(ValueError):
+        worklist.add("","21/05/2025","13/07/1935","Community","None","None")
+
+#test the worklist written by ScoreCSV
+def test_scoreCsvWorklist(tmp_path):
+    records = make_records(300,seed=3)
+    inPath = tmp_path/"in.csv"
+    with open(inPath,"w",newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FrameColumns)
+        writer.writerows(records)
+    outPath = tmp_path/"worklist.csv"
+    ScoreCSV.main([str(inPath),str(tmp_path/"out.csv"),"--quiet","--chunk-size","50","--worklist",str(outPath),"--top","2","--group-by","NewServ"])
+    with open(outPath,newline="",encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == WorklistColumns
+    batch = AssessmentBatch.from_records(records).score()
+    want = expected(batch,2,[ServType[c] for c in batch.NewServ])
+    assert [r[2] for r in rows[1:]] == [pid for s in ServType if s in want for pid in want[s]]
+    assert rows[1][3] == "21/05/2025"